@@ -0,0 +1,247 @@
+"""Read-only JSON API for projects, suppliers, events and meetings.
+
+``/api/<resource>/`` lists rows in primary-key order and ``/api/<resource>/<pk>/``
+returns one. Rows are fetched with ``values_list`` over just the selected
+columns (``?fields=id,title,budget``; each resource has a default set), so no
+model instances are built. Lists are paged with an opaque ``?cursor=``
+(``next`` in the response) and ``?limit=`` up to ``MAX_LIMIT``; a page is one
+indexed range scan however deep it is.
+
+Every response carries a strong ``ETag`` and a ``Last-Modified``. Columns
+read from other models (council or category names) fold those models' cache
+versions (see ``caching.model_version``) into the ETag, so renaming a council
+changes it too. ``Last-Modified`` is the latest of the rows' ``updated_at``
+(and the financial summary's, when its columns are selected) and the last
+version bump of the resource's model and of those other models, so a rename
+or a deleted row also moves it. Clients revalidating with
+``If-None-Match`` / ``If-Modified-Since`` get a 304 without the body being
+serialized.
+"""
+import base64
+import binascii
+import hashlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .caching import model_version, version_time
+from .filters import filter_date_range, filter_projects, parse_date_param
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class Resource:
+    """One API collection: its columns, the defaults and how query parameters filter it.
+
+    ``fields`` maps each column name to its ``values_list`` lookup. ``stamps``
+    lists extra ``updated_at`` lookups that go into the validators when the
+    named column is selected, and ``versions`` the model whose cache version
+    does.
+    """
+
+    def __init__(self, model, fields, default, stamps=None, versions=None, filter=None):
+        self.model = model
+        self.fields = fields
+        self.default = default
+        self.stamps = stamps or {}
+        self.versions = versions or {}
+        self.filter = filter
+
+    def queryset(self, params):
+        from django.apps import apps
+
+        qs = apps.get_model(self.model).objects.all()
+        if self.filter:
+            qs = self.filter(qs, params)
+        return qs.order_by('pk')
+
+
+def _filter_by_council_and_date(qs, params):
+    if str(params.get('council') or '').isdigit():
+        qs = qs.filter(council_id=int(params['council']))
+    return filter_date_range(qs, 'date', parse_date_param(params.get('from')), parse_date_param(params.get('to')))
+
+
+def _filter_projects(qs, params):
+    if str(params.get('council') or '').isdigit():
+        qs = qs.filter(council_id=int(params['council']))
+    return filter_projects(qs, params)
+
+
+SUMMARY_STAMP = 'financial_summary__updated_at'
+
+RESOURCES = {
+    'projects': Resource(
+        'supply_chain.project',
+        fields={
+            'id': 'pk',
+            'title': 'title',
+            'description': 'description',
+            'council_id': 'council_id',
+            'council': 'council__name',
+            'category_id': 'category_id',
+            'category': 'category__name',
+            'budget': 'budget',
+            'committed_total': 'financial_summary__committed_total',
+            'remaining_budget': 'financial_summary__remaining_budget',
+            'utilisation': 'financial_summary__utilisation',
+            'supplier_count': 'financial_summary__supplier_count',
+            'location': 'location',
+            'project_manager': 'project_manager',
+            'end_date': 'end_date',
+            'image': 'image',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        default=('id', 'title', 'council', 'category', 'budget', 'committed_total', 'end_date', 'updated_at'),
+        stamps={
+            'committed_total': SUMMARY_STAMP, 'remaining_budget': SUMMARY_STAMP,
+            'utilisation': SUMMARY_STAMP, 'supplier_count': SUMMARY_STAMP,
+        },
+        versions={'council': 'supply_chain.council', 'category': 'supply_chain.category'},
+        filter=_filter_projects,
+    ),
+    'suppliers': Resource(
+        'supply_chain.supplier',
+        fields={
+            'id': 'pk',
+            'name': 'name',
+            'specialty': 'specialty',
+            'contact_person': 'contact_person',
+            'contact_email': 'contact_email',
+            'phone': 'phone',
+            'address': 'address',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        default=('id', 'name', 'specialty', 'contact_person', 'contact_email', 'phone', 'updated_at'),
+    ),
+    'events': Resource(
+        'supply_chain.event',
+        fields={
+            'id': 'pk',
+            'title': 'title',
+            'description': 'description',
+            'date': 'date',
+            'time': 'time',
+            'location': 'location',
+            'image': 'image',
+            'council_id': 'council_id',
+            'council': 'council__name',
+            'project_id': 'project_id',
+            'project': 'project__title',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        default=('id', 'title', 'date', 'time', 'location', 'council', 'project_id', 'updated_at'),
+        versions={'council': 'supply_chain.council', 'project': 'supply_chain.project'},
+        filter=_filter_by_council_and_date,
+    ),
+    'meetings': Resource(
+        'supply_chain.councilmeeting',
+        fields={
+            'id': 'pk',
+            'council_id': 'council_id',
+            'council': 'council__name',
+            'date': 'date',
+            'time': 'time',
+            'location': 'location',
+            'agenda': 'agenda',
+            'archived': 'archived',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        default=('id', 'council', 'date', 'time', 'location', 'archived', 'updated_at'),
+        versions={'council': 'supply_chain.council'},
+        filter=_filter_by_council_and_date,
+    ),
+}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """The primary key a cursor points after, or None for a malformed token."""
+    try:
+        return int(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def selected_fields(resource, params):
+    """The columns named in ``?fields=`` (in the order given), or the resource's defaults."""
+    raw = params.get('fields')
+    if not raw:
+        return list(resource.default)
+    names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in names if name not in resource.fields]
+    if unknown or not names:
+        raise BadRequest(f'Unknown field(s) {", ".join(unknown)}; choose from {", ".join(resource.fields)}')
+    return names
+
+
+def fetch(resource, names, qs):
+    """``(rows, validators)``: rows as dicts of ``names``, validators as ``(pk, stamps...)`` tuples."""
+    stamps = ['updated_at', *sorted({resource.stamps[n] for n in names if n in resource.stamps})]
+    lookups = [resource.fields[name] for name in names]
+    rows, validators = [], []
+    for values in qs.values_list(*lookups, 'pk', *stamps):
+        rows.append(dict(zip(names, values)))
+        validators.append(values[len(names):])
+    return rows, validators
+
+
+def validators_for(resource, names, validators, extra=''):
+    """A strong ETag and the Last-Modified datetime for rows with these ``validators``."""
+    labels = sorted({resource.versions[n] for n in names if n in resource.versions})
+    raw = '|'.join([','.join(names), model_version(*labels) if labels else '', extra])
+    digest = hashlib.md5(raw.encode())
+    for row in validators:
+        digest.update(repr(row).encode())
+    # row timestamps miss deletions and renamed related rows; the version bumps catch both
+    stamps = [stamp for row in validators for stamp in row[1:] if stamp is not None]
+    stamps.append(version_time(resource.model, *labels))
+    return f'"{digest.hexdigest()}"', max(stamps)
+
+
+def respond(request, payload, etag, last_modified):
+    """``payload`` as JSON with validators, or a 304 if the client's copy is current."""
+    # HTTP dates have whole-second resolution
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = JsonResponse(payload, encoder=DjangoJSONEncoder, json_dumps_params={'ensure_ascii': False})
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # clients may keep a copy but must revalidate it
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def list_page(resource, params):
+    """``(names, rows, validators, next_cursor)`` for one page of ``resource``."""
+    names = selected_fields(resource, params)
+    try:
+        limit = min(max(int(params.get('limit') or DEFAULT_LIMIT), 1), MAX_LIMIT)
+    except ValueError:
+        raise BadRequest('limit must be a number')
+    qs = resource.queryset(params)
+    cursor = params.get('cursor')
+    if cursor:
+        after = decode_cursor(cursor)
+        if after is None:
+            raise BadRequest('Invalid cursor')
+        qs = qs.filter(pk__gt=after)
+    rows, validators = fetch(resource, names, qs[:limit + 1])
+    next_cursor = encode_cursor(validators[limit - 1][0]) if len(rows) > limit else None
+    return names, rows[:limit], validators[:limit], next_cursor
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class SupplyChainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'supply_chain'
+
+    def ready(self):
+        # register signal handlers (search index sync, cache invalidation)
+        from . import signals  # noqa: F401
+
+        if 'supply_chain.instrumentation.InstrumentationMiddleware' in settings.MIDDLEWARE:
+            # hook connections as they open, including those the async ORM opens on its own thread
+            from . import instrumentation
+            instrumentation.instrument_queries()
@@ -0,0 +1,177 @@
+"""Per-URL latency and query-count benchmarks.
+
+``url_cases`` turns every named route in ``urls.py`` into a request, with
+path arguments taken from rows in the current database (plus a few extra
+query strings for the heavy listings); ``measure`` requests each case once
+with an empty cache ("cold") and then ``repeat`` times ("warm"), recording
+latency percentiles and query counts. ``compare`` checks a run against a
+baseline. ``manage.py bench_urls`` seeds a throwaway database at each scale
+with ``seed_data --scale`` and ties these together.
+
+Timings only compare on the machine that recorded them, so the baseline
+(``benchmarks/url_baseline.json``, git-ignored) is local: record it with
+``bench_urls --save`` on the commit you start from, then run ``bench_urls``
+after a change. CI should record and compare within one job.
+"""
+import json
+import platform
+import time
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .instrumentation import quantiles
+
+DEFAULT_SCALES = (1000, 10000, 100000)
+DEFAULT_REPEAT = 20
+# warm requests stop after this many seconds per case (but never before MIN_WARM of them)
+DEFAULT_BUDGET = 5.0
+MIN_WARM = 3
+# a warm p50 this much slower than the baseline (and by at least MIN_DELTA_MS) is a regression
+DEFAULT_THRESHOLD = 0.25
+MIN_DELTA_MS = 2.0
+
+# routes that need a staff login
+STAFF_ONLY = {'export', 'metrics'}
+
+# extra query strings timed alongside the bare URL, keyed by URL name
+VARIANTS = {
+    'projects-list': ['?q=bridge', '?min_budget=500000&sort=-budget', '?page=last', '?cursor=', '?sort=-utilisation'],
+    'supplier-list': ['?q=a', '?sort=-projects'],
+    'calendar': ['?start_date=2000-01-01'],
+    'api-list': ['?limit=500'],
+}
+
+
+def _middle_pk(model):
+    pks = model.objects.order_by('pk').values_list('pk', flat=True)
+    count = pks.count()
+    return pks[count // 2] if count else None
+
+
+def sample_kwargs():
+    """Path arguments for the parameterised routes, from rows near the middle of each table."""
+    from .models import CouncilMeeting, Event, Project, Supplier
+
+    return {
+        'project': {'pk': _middle_pk(Project)},
+        'supplier': {'pk': _middle_pk(Supplier)},
+        'event': {'pk': _middle_pk(Event)},
+        'meeting': {'pk': _middle_pk(CouncilMeeting)},
+        'api-list': {'resource': 'projects'},
+        'api-detail': {'resource': 'projects', 'pk': _middle_pk(Project)},
+        'export': {'kind': 'links', 'fmt': 'csv'},
+    }
+
+
+def url_cases():
+    """``[(case name, url name, path)]`` for every named route of the app."""
+    from django.urls import reverse
+
+    from . import urls
+
+    samples = sample_kwargs()
+    cases = []
+    for pattern in urls.urlpatterns:
+        name = pattern.name
+        if not name:
+            continue
+        converters = pattern.pattern.converters
+        kwargs = {}
+        if converters:
+            kwargs = samples.get(name) or samples.get(name.split('-')[0], {})
+            if set(kwargs) != set(converters) or None in kwargs.values():
+                continue  # no row to point at
+        path = reverse(name, kwargs=kwargs)
+        query = ''
+        if name == 'export':
+            # a single project's links, so the export times the streaming path, not the table size
+            query = f'?project={samples["project"]["pk"]}'
+        cases.append((name, name, path + query))
+        for variant in VARIANTS.get(name, []):
+            cases.append((f'{name}{variant}', name, path + variant))
+    return cases
+
+
+def _request(client, path):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - started
+    return response.status_code, elapsed * 1000, len(queries)
+
+
+def measure(client, cases, repeat=DEFAULT_REPEAT, staff_client=None, budget=DEFAULT_BUDGET):
+    """``{case: {...}}`` with cold latency and queries, warm p50/p95/p99 and warm queries.
+
+    ``client`` should be anonymous so cached pages are served as visitors get
+    them; ``staff_client`` is used for the ``STAFF_ONLY`` routes. Each case
+    gets up to ``repeat`` warm requests within ``budget`` seconds, so one
+    pathological page cannot stall the whole run.
+    """
+    results = {}
+    for case, name, path in cases:
+        session = staff_client if name in STAFF_ONLY and staff_client else client
+        cache.clear()
+        status, cold_ms, cold_queries = _request(session, path)
+        warm, deadline = [], time.perf_counter() + budget
+        while len(warm) < repeat and (len(warm) < min(MIN_WARM, repeat) or time.perf_counter() < deadline):
+            warm.append(_request(session, path))
+        latencies = [ms for _, ms, _ in warm]
+        percentiles = quantiles(latencies)
+        results[case] = {
+            'status': status,
+            'cold_ms': round(cold_ms, 3),
+            'cold_queries': cold_queries,
+            'warm_queries': max((count for _, _, count in warm), default=0),
+            'warm_samples': len(warm),
+            **{f'warm_p{round(q * 100)}_ms': round(value, 3) for q, value in percentiles.items()},
+        }
+    return results
+
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    """Regressions of ``results`` against ``baseline`` (both ``{scale: {case: {...}}}``).
+
+    A case regresses when its warm p50 is more than ``threshold`` (a fraction)
+    and ``min_delta_ms`` slower than the baseline, or when it makes more
+    queries cold or warm. Scales and cases missing from either side are
+    ignored. Returns a list of human-readable lines.
+    """
+    problems = []
+    for scale, cases in results.items():
+        for case, now in cases.items():
+            before = baseline.get(str(scale), {}).get(case)
+            if not before:
+                continue
+            old, new = before.get('warm_p50_ms'), now.get('warm_p50_ms')
+            if old is not None and new is not None and new > old * (1 + threshold) and new - old > min_delta_ms:
+                problems.append(f'{scale} rows, {case}: warm p50 {old:.1f} -> {new:.1f} ms (+{(new / old - 1) * 100:.0f}%)')
+            for key in ('cold_queries', 'warm_queries'):
+                if key in before and now.get(key, 0) > before[key]:
+                    problems.append(f'{scale} rows, {case}: {key.replace("_", " ")} {before[key]} -> {now[key]}')
+    return problems
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('results', {})
+
+
+def save_baseline(path, results, repeat):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'repeat': repeat, 'results': results}, f, indent=1, sort_keys=True)
+        f.write('\n')
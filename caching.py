@@ -0,0 +1,176 @@
+"""Page and fragment caching with model-change invalidation.
+
+Each cached view declares the models its output depends on. Every model has
+a version token in the cache that the signal handlers in ``signals.py``
+replace whenever a row is saved or deleted; the tokens of a view's models
+are part of its cache keys, so a change makes the old entries unreachable
+rather than having to find and delete them. Entries also expire after
+``SUPPLY_CHAIN_CACHE_TIMEOUT`` seconds as a backstop for bulk writes
+(``bulk_create``, ``update()``), which do not send signals.
+
+Fragment caching (``{% cache cache_timeout name cache_version %}`` in the
+template) is used for pages that extend ``base.html``: the footer form
+carries a per-visitor CSRF token, so only the expensive blocks can be shared
+between visitors. ``cache_response`` stores whole responses for pages with no
+per-visitor content. The ASGI-only async views (``home_view_async``,
+``calendar_view_async``) do their fragment caching in Python instead
+(``acached_fragment``), so the lookup goes through the cache's async API and
+no template ever touches the ORM from the event loop.
+"""
+import datetime
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+# models whose changes invalidate a cached view, keyed by URL name
+VIEW_DEPENDENCIES = {
+    'design-home': ['supply_chain.project', 'supply_chain.council', 'supply_chain.category', 'supply_chain.councilmeeting'],
+    'calendar': ['supply_chain.event', 'supply_chain.councilmeeting', 'supply_chain.council', 'supply_chain.project'],
+    'councils-list': ['supply_chain.council'],
+    'project-detail': [
+        'supply_chain.project', 'supply_chain.council', 'supply_chain.category',
+        'supply_chain.projectsupplier', 'supply_chain.supplier',
+    ],
+}
+
+# every model that appears above, plus those whose cached list counts
+# (pagination.cached_count) must stay exact; signals.py bumps these on save/delete
+TRACKED_MODELS = sorted(
+    {label for labels in VIEW_DEPENDENCIES.values() for label in labels} | {'supply_chain.supplier'}
+)
+
+
+def cache_timeout():
+    return getattr(settings, 'SUPPLY_CHAIN_CACHE_TIMEOUT', 300)
+
+
+def _version_key(label):
+    return f'cache-version:{label}'
+
+
+def bump_version(label):
+    """Invalidate everything cached for views that depend on model ``label``."""
+    cache.set(_version_key(label), time.time_ns(), None)
+
+
+def _versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # first use, or evicted: start a fresh version (entries keyed on an
+            # older one just miss, which is always safe)
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def model_version(*labels):
+    """A short token that changes whenever any of the given models changes."""
+    keys = [_version_key(label) for label in labels]
+    return _digest(keys, _versions(keys))
+
+
+def version_time(*labels):
+    """When any of the given models last changed (saved, deleted or bumped), as an aware datetime.
+
+    A version that had to be started afresh counts as a change now, which
+    errs on the side of "modified".
+    """
+    versions = _versions([_version_key(label) for label in labels])
+    return datetime.datetime.fromtimestamp(max(versions.values()) / 1e9, tz=datetime.timezone.utc)
+
+
+async def amodel_version(*labels):
+    """``model_version`` for async views."""
+    keys = [_version_key(label) for label in labels]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, time.time_ns(), None)
+            versions[key] = await cache.aget(key)
+    return _digest(keys, versions)
+
+
+def _digest(keys, versions):
+    raw = '|'.join(str(versions[key]) for key in keys)
+    return hashlib.md5(raw.encode()).hexdigest()[:12]
+
+
+def view_version(url_name):
+    return model_version(*VIEW_DEPENDENCIES[url_name])
+
+
+def cache_context(url_name, *extra):
+    """Template context for ``{% cache cache_timeout <name> cache_version %}``.
+
+    ``extra`` values (e.g. today's date, query parameters) are folded into the
+    version so fragments also vary on them.
+    """
+    version = view_version(url_name)
+    if extra:
+        version = f'{version}:' + ':'.join(str(e) for e in extra)
+    return {'cache_timeout': cache_timeout(), 'cache_version': version}
+
+
+async def acached_fragment(url_name, template_name, fetch, *extra):
+    """``template_name`` rendered with the context ``await fetch()`` returns, cached like ``{% cache %}``.
+
+    The entry is keyed on the view's model versions and ``extra``, so
+    ``fetch`` (and its queries) only runs on a miss.
+    """
+    version = await amodel_version(*VIEW_DEPENDENCIES[url_name])
+    key = ':'.join(['fragment', url_name, version, *map(str, extra)])
+    html = await cache.aget(key)
+    if html is None:
+        html = render_to_string(template_name, await fetch())
+        await cache.aset(key, html, cache_timeout())
+    return mark_safe(html)
+
+
+def _cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if getattr(request, 'user', None) is not None and request.user.is_authenticated:
+        return False
+    # pending flash messages are rendered into the page
+    return not len(messages.get_messages(request))
+
+
+def cache_response(url_name, timeout=None):
+    """Cache a view's full response for anonymous GETs.
+
+    Responses that set cookies or rendered a CSRF token are never stored, as
+    they are specific to one visitor.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+            key = 'response:{}:{}:{}'.format(
+                url_name, view_version(url_name),
+                hashlib.md5(request.get_full_path().encode()).hexdigest(),
+            )
+            response = cache.get(key)
+            if response is not None:
+                return response
+            response = view_func(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            if (
+                response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            ):
+                cache.set(key, response, cache_timeout() if timeout is None else timeout)
+            return response
+        return wrapper
+    return decorator
+
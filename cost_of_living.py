@@ -0,0 +1,161 @@
+"""In-memory table of the cost-of-living rent data.
+
+``data/cost_of_living_rents.csv`` is parsed once into typed columns (one
+``array`` per numeric field) and kept until the file's mtime changes, so
+requests only read from memory. ``RentTable`` offers the sort, filter and
+aggregate operations the page (or an API) needs.
+
+Blank or malformed cells are stored as NaN and mean "unknown": they are
+shown as blank, sorted last, never match a filter and are left out of the
+cheapest-area and mean figures.
+"""
+import csv
+import math
+import os
+import threading
+from array import array
+from pathlib import Path
+
+DATA_FILE = Path(__file__).resolve().parent / 'data' / 'cost_of_living_rents.csv'
+
+# column name -> type of its values; every column is stored as an array('d') so NaN can mark unknown cells
+NUMERIC_COLUMNS = {
+    'avg_rent_1br_gbp': int,
+    'avg_rent_2br_gbp': int,
+    'supermarket_index': float,
+}
+MISSING = math.nan
+
+
+def _empty_columns():
+    return {name: array('d') for name in NUMERIC_COLUMNS}
+
+
+def _parse(cast, cell):
+    try:
+        value = float(cast(cell))
+    except (TypeError, ValueError, OverflowError):
+        return MISSING
+    return value if math.isfinite(value) else MISSING
+
+
+class RentTable:
+    """Column-oriented rent data: ``areas`` plus one typed array per numeric column."""
+
+    def __init__(self, areas, columns):
+        self.areas = tuple(areas)
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.areas)
+
+    def __bool__(self):
+        return bool(self.areas)
+
+    @classmethod
+    def from_csv(cls, fh):
+        areas = []
+        columns = _empty_columns()
+        for row in csv.DictReader(fh):
+            areas.append(row.get('area') or '')
+            for name, cast in NUMERIC_COLUMNS.items():
+                columns[name].append(_parse(cast, row.get(name)))
+        return cls(areas, columns)
+
+    def row(self, i):
+        """Row ``i`` as a dict; unknown cells are None."""
+        row = {'area': self.areas[i]}
+        for name, values in self.columns.items():
+            value = values[i]
+            row[name] = None if math.isnan(value) else NUMERIC_COLUMNS[name](value)
+        return row
+
+    def rows(self, indices=None):
+        """Rows as dicts (the shape the templates use), optionally a subset/order."""
+        if indices is None:
+            indices = range(len(self.areas))
+        return [self.row(i) for i in indices]
+
+    def known_indices(self, column):
+        """Indices of the rows with a value in ``column``."""
+        values = self.columns[column]
+        return [i for i in range(len(values)) if not math.isnan(values[i])]
+
+    def sorted_indices(self, column, reverse=False, indices=None):
+        """``indices`` (default: every row) ordered by ``column``; unknown values last either way.
+
+        ``column`` is ``area``, a numeric column or ``rent_to_index`` (see ``rent_to_index_ratios``).
+        """
+        if indices is None:
+            indices = range(len(self.areas))
+        if column == 'area':
+            return sorted(indices, key=self.areas.__getitem__, reverse=reverse)
+        values = self.rent_to_index_ratios() if column == 'rent_to_index' else self.columns[column]
+        known = [i for i in indices if values[i] is not None and not math.isnan(values[i])]
+        unknown = [i for i in indices if values[i] is None or math.isnan(values[i])]
+        return sorted(known, key=values.__getitem__, reverse=reverse) + unknown
+
+    def filter_indices(self, max_rent_1br=None, max_rent_2br=None, max_index=None):
+        """Indices of the rows within every given limit; a row with an unknown value fails that limit."""
+        limits = (
+            ('avg_rent_1br_gbp', max_rent_1br),
+            ('avg_rent_2br_gbp', max_rent_2br),
+            ('supermarket_index', max_index),
+        )
+        indices = range(len(self.areas))
+        for name, limit in limits:
+            if limit is not None:
+                values = self.columns[name]
+                indices = [i for i in indices if values[i] <= limit]  # NaN compares false
+        return list(indices)
+
+    def cheapest(self, column='avg_rent_1br_gbp'):
+        """The row with the lowest known value in ``column``, or None when there is none."""
+        values = self.columns[column]
+        known = self.known_indices(column)
+        return self.row(min(known, key=values.__getitem__)) if known else None
+
+    def mean(self, column):
+        """Mean of the known values in ``column``, or None when there are none."""
+        values = self.columns[column]
+        known = [values[i] for i in self.known_indices(column)]
+        return sum(known) / len(known) if known else None
+
+    def rent_to_index_ratios(self, column='avg_rent_1br_gbp'):
+        """Rent divided by the supermarket index for each row (lower means better value overall).
+
+        A list aligned with ``areas``; None where either figure is unknown or the index is 0.
+        """
+        ratios = []
+        for rent, index in zip(self.columns[column], self.columns['supermarket_index']):
+            ratio = rent / index if index else MISSING  # NaN in either gives NaN
+            ratios.append(None if math.isnan(ratio) else ratio)
+        return ratios
+
+
+_lock = threading.Lock()
+_loaded = {}  # path -> (mtime_ns, RentTable)
+
+
+def load_rent_table(path=DATA_FILE):
+    """Return the parsed table for ``path``, re-reading it only after it changes.
+
+    A missing file gives an empty table.
+    """
+    path = str(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        _loaded.pop(path, None)
+        return RentTable([], _empty_columns())
+
+    cached = _loaded.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _lock:
+        cached = _loaded.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, newline='', encoding='utf-8') as fh:
+                cached = (mtime, RentTable.from_csv(fh))
+            _loaded[path] = cached
+    return cached[1]
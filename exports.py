@@ -0,0 +1,135 @@
+"""Streaming CSV / JSON Lines exports of projects, suppliers and supplier links.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` (a server-side
+cursor on PostgreSQL, chunked fetches elsewhere), so neither model instances
+nor the whole result set are ever held in memory; encoded rows are grouped
+into chunks of roughly ``FLUSH_BYTES`` for the response or file. Projects
+accept the same filters as the project list (see ``filters.filter_projects``).
+"""
+import csv
+import datetime
+import json
+from decimal import Decimal
+
+from .filters import filter_projects
+
+CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# (column name, values_list lookup) per export
+COLUMNS = {
+    'projects': (
+        ('id', 'pk'),
+        ('title', 'title'),
+        ('council', 'council__name'),
+        ('category', 'category__name'),
+        ('budget', 'budget'),
+        ('committed_total', 'financial_summary__committed_total'),
+        ('utilisation', 'financial_summary__utilisation'),
+        ('supplier_count', 'financial_summary__supplier_count'),
+        ('location', 'location'),
+        ('project_manager', 'project_manager'),
+        ('end_date', 'end_date'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ),
+    'suppliers': (
+        ('id', 'pk'),
+        ('name', 'name'),
+        ('specialty', 'specialty'),
+        ('contact_person', 'contact_person'),
+        ('contact_email', 'contact_email'),
+        ('phone', 'phone'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ),
+    'links': (
+        ('id', 'pk'),
+        ('project_id', 'project_id'),
+        ('project', 'project__title'),
+        ('council', 'project__council__name'),
+        ('supplier_id', 'supplier_id'),
+        ('supplier', 'supplier__name'),
+        ('contract_value', 'contract_value'),
+        ('created_at', 'created_at'),
+    ),
+}
+
+
+def export_queryset(kind, params=None):
+    """The rows to export for ``kind``, in primary-key order.
+
+    ``params`` (a QueryDict or plain dict) filters projects like the project
+    list does; links can be narrowed with ``project`` / ``supplier`` ids.
+    """
+    from .models import Project, ProjectSupplier, Supplier
+
+    params = params or {}
+    if kind == 'projects':
+        qs = filter_projects(Project.objects.all(), params)
+    elif kind == 'suppliers':
+        qs = Supplier.objects.all()
+    elif kind == 'links':
+        qs = ProjectSupplier.objects.all()
+        for param in ('project', 'supplier'):
+            if str(params.get(param) or '').isdigit():
+                qs = qs.filter(**{f'{param}_id': int(params[param])})
+    else:
+        raise ValueError(f'Unknown export {kind!r}; expected one of {", ".join(COLUMNS)}')
+    return qs.order_by('pk')
+
+
+def _plain(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class _Line:
+    """File-like target for csv.writer that hands back what was written."""
+
+    def write(self, value):
+        return value
+
+
+def encode_rows(kind, rows, fmt):
+    """Yield ``str`` chunks (header first for CSV) encoding ``rows`` of values_list tuples."""
+    names = [name for name, _ in COLUMNS[kind]]
+    buffer, size = [], 0
+    if fmt == 'csv':
+        writer = csv.writer(_Line())
+        buffer.append(writer.writerow(names))
+
+        def encode(row):
+            return writer.writerow(['' if value is None else _plain(value) for value in row])
+    else:
+        def encode(row):
+            return json.dumps(dict(zip(names, map(_plain, row))), ensure_ascii=False) + '\n'
+
+    for row in rows:
+        line = encode(row)
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_export(kind, fmt='csv', params=None, chunk_size=CHUNK_SIZE):
+    """Yield the encoded export of ``kind`` in chunks, reading ``chunk_size`` rows at a time.
+
+    Raises ValueError straight away for an unknown ``kind`` or ``fmt``.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt!r}; expected one of {", ".join(FORMATS)}')
+    qs = export_queryset(kind, params)
+    rows = qs.values_list(*[lookup for _, lookup in COLUMNS[kind]]).iterator(chunk_size=chunk_size)
+    return encode_rows(kind, rows, fmt)
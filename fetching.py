@@ -0,0 +1,161 @@
+"""Concurrent HTTP downloads for the image management commands.
+
+``Fetcher.run`` spreads jobs over a thread pool, limits how many requests go
+to the same host at once, applies a timeout to every request and retries
+transient failures (connection errors, timeouts, bodies cut short, 429 and 5xx
+responses) with exponential backoff. Each job's handler receives the open
+response and can stream it wherever it likes; since a job may be retried after
+the handler has read part of a body, a handler must not leave partial output
+behind (write to a temporary file and move it into place once complete).
+Only the standard library is used, so it works against any HTTP server
+including a local ``http.server`` in tests.
+"""
+import http.client
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+USER_AGENT = 'supply-chain-fetcher/1.0'
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class CountingReader:
+    """File-like wrapper around a response that counts the bytes read.
+
+    Reaching the end of a body shorter than its ``Content-Length`` raises
+    ``http.client.IncompleteRead`` (which the fetcher retries); a bare
+    ``HTTPResponse`` just returns the short body.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.response.read(None if size is None or size < 0 else size)
+        self.bytes_read += len(data)
+        if not data and size != 0:
+            self._check_complete()
+        return data
+
+    def _check_complete(self):
+        expected = self.response.headers.get('Content-Length', '')
+        if expected.isdigit() and self.bytes_read < int(expected):
+            raise http.client.IncompleteRead(b'', int(expected) - self.bytes_read)
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+class FetchResult:
+    def __init__(self, key, url):
+        self.key = key
+        self.url = url
+        self.ok = False
+        self.value = None
+        self.error = None
+        self.status = None
+        self.attempts = 0
+        self.bytes = 0
+
+    def __repr__(self):
+        state = 'ok' if self.ok else f'failed: {self.error}'
+        return f'<FetchResult {self.key} {self.url} {state}>'
+
+
+class FetchSummary:
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+        self.succeeded = [r for r in results if r.ok]
+        self.failed = [r for r in results if not r.ok]
+        self.bytes = sum(r.bytes for r in results)
+
+    def __str__(self):
+        elapsed = self.elapsed or 1e-9
+        return (
+            f'{len(self.succeeded)} ok, {len(self.failed)} failed in {self.elapsed:.2f}s '
+            f'({len(self.results) / elapsed:.1f} files/s, {self.bytes / elapsed / 1024:.0f} KiB/s)'
+        )
+
+
+class Fetcher:
+    def __init__(self, concurrency=8, per_host=4, timeout=15, retries=3, backoff=0.5, headers=None):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.headers = {'User-Agent': USER_AGENT, **(headers or {})}
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _sleep_before_retry(self, attempt):
+        # exponential backoff with jitter so retries from many workers spread out
+        time.sleep(self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+
+    def fetch(self, key, url, handler, headers=None):
+        """Download one URL, passing the response to ``handler(key, response)``.
+
+        The handler's return value ends up in ``FetchResult.value``. Error
+        responses fail the job, unless their status is listed in the handler's
+        optional ``accept_statuses`` attribute (e.g. 304 for conditional
+        requests), in which case the handler gets the ``HTTPError`` instead.
+        """
+        result = FetchResult(key, url)
+        request = urllib.request.Request(url, headers={**self.headers, **(headers or {})})
+        for attempt in range(1, self.retries + 2):
+            result.attempts = attempt
+            try:
+                with self._slot(url):
+                    with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                        result.status = response.status
+                        reader = CountingReader(response)
+                        result.value = handler(key, reader)
+                        result.bytes = reader.bytes_read
+                result.ok = True
+                return result
+            except urllib.error.HTTPError as exc:
+                result.status = exc.code
+                result.error = f'HTTP {exc.code}'
+                if exc.code in getattr(handler, 'accept_statuses', ()):
+                    result.value = handler(key, exc)
+                    result.ok = True
+                    return result
+                if exc.code not in RETRY_STATUSES:
+                    return result
+            except (urllib.error.URLError, TimeoutError, ConnectionError, OSError, http.client.IncompleteRead) as exc:
+                result.error = str(getattr(exc, 'reason', exc))
+            except Exception as exc:
+                # a bug or bad data in the handler: retrying won't help
+                result.error = f'{type(exc).__name__}: {exc}'
+                return result
+            if attempt <= self.retries:
+                self._sleep_before_retry(attempt)
+        return result
+
+    def run(self, jobs, handler):
+        """Fetch ``(key, url)`` or ``(key, url, headers)`` jobs concurrently.
+
+        Returns a ``FetchSummary``; results keep the order of ``jobs``.
+        """
+        jobs = [tuple(job) for job in jobs]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            futures = [
+                pool.submit(self.fetch, job[0], job[1], handler, job[2] if len(job) > 2 else None)
+                for job in jobs
+            ]
+            results = [f.result() for f in futures]
+        return FetchSummary(results, time.perf_counter() - started)
@@ -0,0 +1,121 @@
+"""Shared query-string filters for the listing views.
+
+Date ranges are inclusive of both days. For ``DateTimeField`` columns the
+days are turned into timezone-aware ``[start 00:00, day after end 00:00)``
+bounds so the comparison runs on the raw column and can use its index,
+instead of ``__date`` lookups which wrap the column in a cast.
+"""
+import datetime
+
+from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import search
+
+
+def parse_date_param(value):
+    """Parse a YYYY-MM-DD query parameter, returning None if blank or invalid."""
+    if not value:
+        return None
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def day_start(day):
+    """Aware datetime for midnight at the start of ``day`` in the current timezone."""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def filter_date_range(qs, field_name, start=None, end=None):
+    """Restrict ``qs`` to rows whose ``field_name`` falls on ``start``..``end``."""
+    field = qs.model._meta.get_field(field_name)
+    if isinstance(field, models.DateTimeField):
+        if start:
+            qs = qs.filter(**{f'{field_name}__gte': day_start(start)})
+        if end and end < datetime.date.max:  # no day after date.max, and nothing to exclude
+            qs = qs.filter(**{f'{field_name}__lt': day_start(end + datetime.timedelta(days=1))})
+    else:
+        if start:
+            qs = qs.filter(**{f'{field_name}__gte': start})
+        if end:
+            qs = qs.filter(**{f'{field_name}__lte': end})
+    return qs
+
+
+def prefix_search(qs, field_names, q):
+    """Case-insensitive prefix match of ``q`` against any of ``field_names``.
+
+    Written as a range on ``LOWER(field)`` rather than ``istartswith`` so it
+    can be answered from a ``Lower(field)`` expression index (``LIKE ... ESCAPE``
+    cannot use an index on SQLite). SQLite's ``LOWER()`` only folds ASCII, so
+    any other input goes through ``istartswith`` as typed instead.
+    """
+    q = (q or '').strip()
+    if not q:
+        return qs
+    condition = models.Q()
+    if not q.isascii():
+        for name in field_names:
+            condition |= models.Q(**{f'{name}__istartswith': q})
+        return qs.filter(condition)
+    prefix = q.lower()
+    # the last character is ASCII, so the next code point always exists
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    for name in field_names:
+        alias = f'{name}_lower'
+        qs = qs.alias(**{alias: Lower(name)})
+        condition |= models.Q(**{f'{alias}__gte': prefix, f'{alias}__lt': upper})
+    return qs.filter(condition)
+
+
+def filter_projects(qs, params):
+    """Apply the project list's query-string filters (``q``, budgets, dates, utilisation) to ``qs``.
+
+    Shared by the project list and the exports so the same URL parameters
+    select the same projects everywhere.
+    """
+    # text search (full-text index, ranked; icontains fallback when absent)
+    q = params.get('q')
+    if q:
+        qs = search.search_projects(qs, q)
+
+    # budget filters
+    min_budget = params.get('min_budget')
+    max_budget = params.get('max_budget')
+    try:
+        if min_budget:
+            qs = qs.filter(budget__gte=int(min_budget))
+    except (ValueError, TypeError):
+        pass
+    try:
+        if max_budget:
+            qs = qs.filter(budget__lte=int(max_budget))
+    except (ValueError, TypeError):
+        pass
+
+    # created_at date range filters (dates in YYYY-MM-DD)
+    qs = filter_date_range(
+        qs, 'created_at',
+        parse_date_param(params.get('start_date')),
+        parse_date_param(params.get('end_date')),
+    )
+
+    # expected completion (Project.end_date) range filters
+    qs = filter_date_range(
+        qs, 'end_date',
+        parse_date_param(params.get('due_from')),
+        parse_date_param(params.get('due_to')),
+    )
+
+    # committed spend as a percentage of budget
+    for param, lookup in (('min_utilisation', 'gte'), ('max_utilisation', 'lte')):
+        try:
+            value = float(params.get(param) or '')
+        except ValueError:
+            continue
+        qs = qs.filter(**{f'financial_summary__utilisation__{lookup}': value / 100})
+    return qs
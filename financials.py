@@ -0,0 +1,152 @@
+"""Per-project committed spend, persisted in ``ProjectFinancialSummary``.
+
+The signal handlers in ``signals.py`` turn every ``ProjectSupplier`` save or
+delete into a delta (``apply_link_change``) applied with a single ``UPDATE``
+of the project's summary row, so keeping the summary current costs no
+aggregation. ``refresh_summaries`` recomputes rows from the link table in
+batches (new projects, budget changes, and ``manage.py
+rebuild_project_summaries`` after bulk writes, which send no signals);
+``check_summaries`` reports rows that have drifted from the link table.
+Neither path sends signals, so both bump the summary model's cache version
+themselves (cached list counts filter on the summary).
+"""
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, NullIf
+from django.utils import timezone
+
+from . import caching
+
+BATCH_SIZE = 2000
+CENTS = Decimal('0.01')
+SUMMARY_FIELDS = ('committed_total', 'supplier_count', 'remaining_budget', 'utilisation')
+
+
+def money(value):
+    """``value`` (Decimal, float, str or None) as a Decimal; None counts as zero."""
+    return Decimal(str(value)) if value is not None else Decimal('0')
+
+
+def _utilisation(committed, budget):
+    return float(committed) / budget if budget else None
+
+
+def _id_batches(project_ids, batch_size):
+    from .models import Project
+
+    if project_ids is not None:
+        project_ids = sorted(set(project_ids))
+        for start in range(0, len(project_ids), batch_size):
+            yield project_ids[start:start + batch_size]
+        return
+    last = 0
+    while True:
+        ids = list(Project.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def compute_summaries(project_ids):
+    """Unsaved summaries for ``project_ids``, aggregated from the link table (two queries)."""
+    from .models import Project, ProjectFinancialSummary, ProjectSupplier
+
+    budgets = dict(Project.objects.filter(pk__in=project_ids).values_list('pk', 'budget'))
+    totals = {
+        row['project']: row
+        for row in ProjectSupplier.objects.filter(project_id__in=list(budgets))
+        .values('project').annotate(total=Sum('contract_value'), links=Count('pk')).order_by()
+    }
+    summaries = []
+    for pk, budget in budgets.items():
+        row = totals.get(pk, {})
+        committed = (row.get('total') or Decimal('0')).quantize(CENTS)
+        summaries.append(ProjectFinancialSummary(
+            project_id=pk,
+            committed_total=committed,
+            supplier_count=row.get('links', 0),
+            remaining_budget=Decimal(budget) - committed,
+            utilisation=_utilisation(committed, budget),
+        ))
+    return summaries
+
+
+def refresh_summaries(project_ids=None, batch_size=BATCH_SIZE):
+    """Recompute and upsert the summaries of ``project_ids`` (default: every project).
+
+    Returns the number of rows written.
+    """
+    from .models import ProjectFinancialSummary
+
+    written = 0
+    for ids in _id_batches(project_ids, batch_size):
+        summaries = compute_summaries(ids)
+        ProjectFinancialSummary.objects.bulk_create(
+            summaries, batch_size=batch_size,
+            update_conflicts=True, unique_fields=['project'], update_fields=[*SUMMARY_FIELDS, 'updated_at'],
+        )
+        written += len(summaries)
+    if written:
+        caching.bump_version(ProjectFinancialSummary._meta.label_lower)
+    return written
+
+
+def apply_link_change(project_id, amount=Decimal('0'), links=0):
+    """Add ``amount`` committed spend and ``links`` suppliers to a project's summary in one UPDATE.
+
+    Falls back to recomputing the row if the project has no summary yet.
+    """
+    from .models import Project, ProjectFinancialSummary
+
+    amount = money(amount)
+    budget = Subquery(Project.objects.filter(pk=OuterRef('project_id')).values('budget')[:1])
+    # every right-hand side sees the row as it was before the UPDATE
+    committed = F('committed_total') + amount
+    updated = ProjectFinancialSummary.objects.filter(project_id=project_id).update(
+        committed_total=committed,
+        supplier_count=F('supplier_count') + links,
+        remaining_budget=ExpressionWrapper(budget - committed, output_field=DecimalField(max_digits=14, decimal_places=2)),
+        utilisation=Cast(committed, FloatField()) / NullIf(Cast(budget, FloatField()), 0.0),
+        updated_at=timezone.now(),
+    )
+    if updated:
+        caching.bump_version(ProjectFinancialSummary._meta.label_lower)
+    else:
+        refresh_summaries([project_id])
+
+
+def check_summaries(batch_size=BATCH_SIZE):
+    """Compare every stored summary with a fresh aggregate.
+
+    Returns ``[(project_id, stored, expected)]`` for each mismatch, where
+    ``stored``/``expected`` are dicts of the summary fields (``stored`` is
+    None when the row is missing).
+    """
+    from .models import ProjectFinancialSummary
+
+    problems = []
+    for ids in _id_batches(None, batch_size):
+        stored = {
+            row['project_id']: row
+            for row in ProjectFinancialSummary.objects.filter(project_id__in=ids).values('project_id', *SUMMARY_FIELDS)
+        }
+        for summary in compute_summaries(ids):
+            expected = {field: getattr(summary, field) for field in SUMMARY_FIELDS}
+            row = stored.get(summary.project_id)
+            actual = None if row is None else {field: row[field] for field in SUMMARY_FIELDS}
+            if actual is None or not _same(actual, expected):
+                problems.append((summary.project_id, actual, expected))
+    return problems
+
+
+def _same(actual, expected):
+    for field in ('committed_total', 'remaining_budget'):
+        if Decimal(actual[field]).quantize(CENTS) != expected[field]:
+            return False
+    if actual['supplier_count'] != expected['supplier_count']:
+        return False
+    if (actual['utilisation'] is None) != (expected['utilisation'] is None):
+        return False
+    return actual['utilisation'] is None or abs(actual['utilisation'] - expected['utilisation']) < 1e-9
@@ -0,0 +1,219 @@
+"""Resized, modern-format variants of the site's images.
+
+For each source image we write downscaled copies at ``WIDTHS`` in AVIF and
+WebP (when the installed Pillow supports them) plus a JPEG/PNG fallback, under
+``derivatives/<content hash>/`` in default storage. Storing by content hash
+means an image referenced from several places, or re-uploaded unchanged, is
+processed once. ``derivatives/index.json`` maps each source URL (as used in
+templates) to its variants; the ``responsive_images`` template tags read it
+to emit ``srcset``/``sizes`` markup.
+
+Built by ``manage.py build_image_derivatives`` after deploys. Uploaded event
+images are also queued from a ``post_save`` hook once the transaction
+commits and encoded on a background thread, so saving an event never waits
+for AVIF/WebP; until the variants exist the plain image is served.
+``build_image_derivatives --uploads`` catches any upload the worker missed
+(e.g. the process exited first).
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+WIDTHS = (320, 640, 960, 1440)
+QUALITY = {'avif': 50, 'webp': 75, 'jpeg': 80}
+DERIVATIVES_DIR = 'derivatives'
+INDEX_NAME = f'{DERIVATIVES_DIR}/index.json'
+APP_STATIC_DIR = Path(__file__).resolve().parent / 'static'
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg', 'png': 'png'}
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_index_cache = {'mtime': None, 'data': {}}
+_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-derivatives')
+_pending = set()
+
+
+def modern_formats():
+    """AVIF/WebP encoders available in this Pillow build, best first."""
+    from PIL import features
+    return [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+
+
+def source_path(url):
+    """Local file behind a ``/static/...`` or media URL, or None for remote/unknown URLs."""
+    if not url:
+        return None
+    static_url = '/' + settings.STATIC_URL.strip('/') + '/'
+    media_url = '/' + settings.MEDIA_URL.strip('/') + '/'
+    if url.startswith(static_url):
+        path = APP_STATIC_DIR / unquote(url[len(static_url):])
+    elif url.startswith(media_url):
+        path = Path(settings.MEDIA_ROOT) / unquote(url[len(media_url):])
+    else:
+        return None
+    return path if path.is_file() else None
+
+
+def load_index():
+    """The URL -> variants index, re-read only when the file changes."""
+    try:
+        mtime = os.stat(default_storage.path(INDEX_NAME)).st_mtime_ns
+    except (FileNotFoundError, NotImplementedError):
+        return {}
+    if _index_cache['mtime'] != mtime:
+        with default_storage.open(INDEX_NAME) as fh:
+            _index_cache['data'] = json.load(fh)
+        _index_cache['mtime'] = mtime
+    return _index_cache['data']
+
+
+def _save_index(index):
+    """Replace the index in one step, so readers (and other processes) always see a whole file."""
+    data = json.dumps(index, indent=1, sort_keys=True).encode()
+    try:
+        path = default_storage.path(INDEX_NAME)
+    except NotImplementedError:
+        # remote storage: overwrite in place (the key is replaced whole by the backend)
+        if default_storage.exists(INDEX_NAME):
+            default_storage.delete(INDEX_NAME)
+        default_storage.save(INDEX_NAME, ContentFile(data))
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.index-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _encode(image, fmt):
+    buf = io.BytesIO()
+    options = {'quality': QUALITY.get(fmt, 80)}
+    if fmt == 'avif':
+        options['speed'] = 8  # encoder default (6) is several times slower for little gain at these sizes
+    elif fmt == 'jpeg':
+        options.update(optimize=True, progressive=True)
+        image = image.convert('RGB')
+    elif fmt == 'png':
+        options = {'optimize': True}
+    image.save(buf, format=fmt.upper(), **options)
+    return buf.getvalue()
+
+
+def build_variants(data):
+    """Write the variants for one image's bytes; returns the index entry.
+
+    Skips the work if variants for identical content already exist.
+    """
+    from PIL import Image, ImageOps
+
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    folder = f'{DERIVATIVES_DIR}/{digest}'
+    manifest_name = f'{folder}/variants.json'
+    if default_storage.exists(manifest_name):
+        with default_storage.open(manifest_name) as fh:
+            return json.load(fh)
+
+    with Image.open(io.BytesIO(data)) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    fallback = 'png' if has_alpha else 'jpeg'
+
+    # never upscale; always include the original width when it is below the largest step
+    widths = sorted({w for w in WIDTHS if w < image.width} | {min(image.width, WIDTHS[-1])})
+    entry = {'hash': digest, 'width': image.width, 'height': image.height, 'fallback': fallback, 'variants': {}}
+    for fmt in modern_formats() + [fallback]:
+        entry['variants'][fmt] = {}
+        for width in widths:
+            resized = image
+            if width < image.width:
+                resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            name = f'{folder}/{width}.{EXTENSIONS[fmt]}'
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(_encode(resized, fmt)))
+            entry['variants'][fmt][str(width)] = default_storage.url(name)
+
+    default_storage.save(manifest_name, ContentFile(json.dumps(entry).encode()))
+    return entry
+
+
+def register(url, data=None):
+    """Build (or reuse) variants for the image at ``url`` and record them in the index.
+
+    ``data`` defaults to the bytes of the local file behind ``url``. Returns
+    the index entry, or None if there is no local file to read.
+    """
+    if data is None:
+        path = source_path(url)
+        if path is None:
+            return None
+        data = path.read_bytes()
+    entry = build_variants(data)
+    update_index({url: entry})
+    return entry
+
+
+def update_index(entries):
+    """Merge ``{url: entry}`` into the index, writing it once; returns the URLs that changed."""
+    with _lock:
+        index = dict(load_index())
+        changed = {url: entry for url, entry in entries.items() if index.get(url) != entry}
+        if changed:
+            index.update(changed)
+            _save_index(index)
+    return set(changed)
+
+
+def register_upload(url, name):
+    """Queue variants for the stored file ``name`` (served at ``url``) on the background worker.
+
+    Returns the Future. The cached event markup is invalidated once the
+    variants are indexed, so pages switch to ``srcset`` on their next render.
+    """
+    future = _worker.submit(_register_upload, url, name)
+    _pending.add(future)
+    future.add_done_callback(_pending.discard)
+    return future
+
+
+def _register_upload(url, name):
+    from . import caching
+
+    try:
+        with default_storage.open(name, 'rb') as fh:
+            data = fh.read()
+        entry = build_variants(data)
+    except Exception:
+        # a bad upload must not break anything; the plain image is still served
+        logger.exception('Could not build image variants for %s', url)
+        return None
+    if update_index({url: entry}):
+        caching.bump_version('supply_chain.event')
+    return entry
+
+
+def wait_for_uploads(timeout=None):
+    """Block until queued uploads are encoded (for tests and management commands)."""
+    wait(list(_pending), timeout)
+
+
+def variants_for(url):
+    return load_index().get(url)
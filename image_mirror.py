@@ -0,0 +1,182 @@
+"""Content-addressed local mirror of remote images.
+
+Files are named after the SHA-256 of their content, so identical images
+fetched from different URLs are stored once. A JSON manifest next to the files
+remembers each URL's ETag/Last-Modified and the file it produced; the next run
+sends conditional requests and a ``304 Not Modified`` reuses the existing file
+without downloading it again. Each distinct URL is fetched once per run, however
+many rows point at it, and the downloads run concurrently (see fetching.py).
+
+``mirror_project_images`` points ``Project.main_image`` at the local copy and
+records the remote URL it came from in ``project_sources.json`` (by project
+pk), so later runs still revalidate against the source.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from urllib.parse import urlparse
+
+from .fetching import Fetcher
+
+MANIFEST_NAME = 'manifest.json'
+SOURCES_NAME = 'project_sources.json'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif')
+CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/avif': '.avif',
+}
+CHUNK_SIZE = 64 * 1024
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(data, fh, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class ImageMirror:
+    def __init__(self, directory, url_prefix, fetcher=None):
+        self.directory = directory
+        self.url_prefix = url_prefix.rstrip('/') + '/'
+        self.fetcher = fetcher or Fetcher()
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        return _read_json(self.manifest_path)
+
+    def _save_manifest(self):
+        _write_json(self.manifest_path, self.manifest)
+
+    def _extension(self, url, content_type):
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+        if ext in IMAGE_EXTENSIONS:
+            return ext
+        return CONTENT_TYPE_EXTENSIONS.get((content_type or '').split(';')[0].strip(), '.jpg')
+
+    def _conditional_headers(self, url):
+        entry = self.manifest.get(url)
+        if not entry or not os.path.exists(os.path.join(self.directory, entry['file'])):
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _store(self, url, response):
+        """Stream one response to disk under its content hash. Runs in a worker thread."""
+        if getattr(response, 'code', None) == 304:
+            return self.manifest[url]['file'], False
+
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+            filename = digest.hexdigest()[:32] + self._extension(url, response.headers.get('Content-Type'))
+            target = os.path.join(self.directory, filename)
+            if os.path.exists(target):
+                # same bytes already mirrored from another URL (or an earlier run)
+                os.remove(tmp)
+            else:
+                os.replace(tmp, target)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        with self._lock:
+            self.manifest[url] = {
+                'file': filename,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+        return filename, True
+
+    def mirror(self, urls):
+        """Mirror ``urls`` and return ``(url_map, summary)``.
+
+        ``url_map`` maps each successfully mirrored URL to its local URL
+        (``url_prefix`` + file name).
+        """
+        unique = sorted(set(urls))
+        jobs = [(url, url, self._conditional_headers(url)) for url in unique]
+
+        def handler(url, response):
+            return self._store(url, response)
+        handler.accept_statuses = (304,)
+
+        summary = self.fetcher.run(jobs, handler)
+        self._save_manifest()
+        url_map = {r.key: self.url_prefix + r.value[0] for r in summary.succeeded}
+        summary.downloaded = sum(1 for r in summary.succeeded if r.value[1])
+        summary.not_modified = len(summary.succeeded) - summary.downloaded
+        summary.files = len({r.value[0] for r in summary.succeeded})
+        return url_map, summary
+
+
+def mirror_project_images(directory, url_prefix, projects=None, fetcher=None):
+    """Mirror every remote ``Project.main_image`` (or ``image``) and point the projects at the copies.
+
+    A project already pointing at its mirrored copy is revalidated against the
+    remote URL recorded for it, so a changed source is picked up. All changed
+    projects are written with a single ``bulk_update``. Returns
+    ``(updated_count, summary)``.
+    """
+    from . import caching
+    from .models import Project
+
+    if projects is None:
+        projects = Project.objects.only('pk', 'main_image', 'image').order_by('pk')
+    url_prefix = url_prefix.rstrip('/') + '/'
+    sources_path = os.path.join(directory, SOURCES_NAME)
+    known = _read_json(sources_path)  # project pk (as a string) -> remote URL its image was mirrored from
+    sources = {}
+    for project in projects:
+        src = project.main_image or project.image
+        if src and src.startswith(url_prefix):
+            src = known.get(str(project.pk))
+        if src and urlparse(src).scheme in ('http', 'https'):
+            sources[project] = src
+
+    mirror = ImageMirror(directory, url_prefix, fetcher=fetcher)
+    url_map, summary = mirror.mirror(sources.values())
+
+    changed = []
+    for project, src in sources.items():
+        local = url_map.get(src)
+        if not local:
+            continue
+        known[str(project.pk)] = src
+        if project.main_image != local:
+            project.main_image = local
+            changed.append(project)
+    _write_json(sources_path, known)
+    if changed:
+        Project.objects.bulk_update(changed, ['main_image'], batch_size=500)
+        # bulk_update sends no signals
+        caching.bump_version(Project._meta.label_lower)
+    return len(changed), summary
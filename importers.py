@@ -0,0 +1,350 @@
+"""Streaming bulk import of councils, suppliers and projects from CSV or JSON Lines.
+
+Input is read one row at a time and handled in batches of ``batch_size``:
+each row is validated against the model field definitions (``Field.clean``,
+so max lengths, e-mail and date formats match the admin), foreign keys are
+resolved through in-memory maps loaded once per import, the batch's existing
+rows are matched in one query, and the batch is written with ``bulk_create``
+/ ``bulk_update`` inside its own transaction. Importing the same file twice
+is a no-op the second time: rows are matched on a natural key and only rows
+whose values differ are updated.
+
+Natural keys: councils by ``slug`` (derived from the name if absent),
+suppliers by ``name``, projects by ``id`` when given, else by (council,
+title). Projects name their council by slug or name and their category by
+name; unknown categories are created, unknown councils reject the row.
+
+bulk writes send no signals, so each batch refreshes the search index and
+financial summaries of the projects it touched, flags council rollups as
+stale, and the run ends by bumping the page-cache version of the imported
+model.
+"""
+import csv
+import json
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Category, Council, Project, Supplier
+
+BATCH_SIZE = 1000
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(path):
+    ext = os.path.splitext(str(path))[1].lower()
+    return 'jsonl' if ext in ('.jsonl', '.ndjson', '.json') else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line_number, dict)`` from a text stream without reading it all."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, exc
+                continue
+            yield number, row if isinstance(row, dict) else ValueError('expected a JSON object')
+    else:
+        raise ValueError(f'Unknown format {fmt!r}; expected one of {", ".join(FORMATS)}')
+
+
+class ImportResult:
+    def __init__(self, kind):
+        self.kind = kind
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.rejected = []  # (line number, row, reason)
+        self.elapsed = 0.0
+
+    @property
+    def rows(self):
+        return self.created + self.updated + self.unchanged + len(self.rejected)
+
+    def __str__(self):
+        elapsed = self.elapsed or 1e-9
+        return (
+            f'{self.kind}: {self.rows} rows in {self.elapsed:.2f}s ({self.rows / elapsed:,.0f} rows/sec) - '
+            f'{self.created} created, {self.updated} updated, {self.unchanged} unchanged, {len(self.rejected)} rejected'
+        )
+
+
+class Importer:
+    """Batch-upserts one model; subclasses say how rows are cleaned and matched."""
+    model = None
+    # columns read from the input, cleaned with the model field of the same name
+    fields = ()
+    required = ()
+
+    def __init__(self, batch_size=BATCH_SIZE, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.result = ImportResult(self.kind)
+        self.touch_field = next(
+            (f.name for f in self.model._meta.concrete_fields if getattr(f, 'auto_now', False)), None
+        )
+
+    @property
+    def kind(self):
+        return self.model._meta.verbose_name_plural
+
+    def load_maps(self):
+        """Build the FK lookup maps once, before the first batch."""
+
+    def clean_value(self, name, value):
+        field = self.model._meta.get_field(name)
+        if isinstance(value, str):
+            value = value.strip()
+        if value in (None, ''):
+            if name in self.required:
+                raise ValidationError('This field is required.')
+            return None if field.null else ''
+        return field.clean(value, None)
+
+    def clean(self, row):
+        """Return a dict of model field values for ``row`` or raise ValidationError/ValueError."""
+        return {name: self.clean_value(name, row.get(name)) for name in self.fields if name in row or name in self.required}
+
+    def key(self, values):
+        raise NotImplementedError
+
+    def existing(self, keys):
+        """``{key: instance}`` for the rows of this batch that are already in the database."""
+        raise NotImplementedError
+
+    def after_batch(self, instances):
+        """Bring derived data up to date for the rows just written.
+
+        Updated instances carry their values from before the import in
+        ``_import_previous`` (changed fields only).
+        """
+
+    def run(self, rows):
+        """Import ``(line_number, dict)`` rows; returns the ``ImportResult``."""
+        started = time.perf_counter()
+        self.load_maps()
+        batch = []
+        for number, row in rows:
+            batch.append((number, row))
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+        self.finish()
+        self.result.elapsed = time.perf_counter() - started
+        return self.result
+
+    def finish(self):
+        """Invalidate the cached pages that show this model (bulk writes send no signals)."""
+        from . import caching
+        if not self.dry_run and (self.result.created or self.result.updated):
+            caching.bump_version(self.model._meta.label_lower)
+
+    def _import_batch(self, batch):
+        cleaned = {}
+        for number, row in batch:
+            if isinstance(row, Exception):
+                self.result.rejected.append((number, None, str(row)))
+                continue
+            try:
+                values = self.clean(row)
+                key = self.key(values)
+            except (ValidationError, ValueError) as exc:
+                reason = '; '.join(exc.messages) if isinstance(exc, ValidationError) else str(exc)
+                self.result.rejected.append((number, row, reason))
+                continue
+            # a later row for the same key wins, as it would in a one-by-one import
+            cleaned[key] = (number, row, values)
+
+        existing = self.existing(list(cleaned))
+        now = timezone.now()
+        to_create, to_update, changed_fields = [], [], set()
+        for key, (number, row, values) in cleaned.items():
+            instance = existing.get(key)
+            if instance is None:
+                to_create.append(self.model(**values))
+                continue
+            changed = {name for name, value in values.items() if getattr(instance, name) != value}
+            if not changed:
+                self.result.unchanged += 1
+                continue
+            instance._import_previous = {name: getattr(instance, name) for name in changed}
+            for name in changed:
+                setattr(instance, name, values[name])
+            changed_fields |= changed
+            if self.touch_field:
+                # bulk_update skips auto_now, and updated_at drives API Last-Modified/ETags
+                setattr(instance, self.touch_field, now)
+            to_update.append(instance)
+
+        if not self.dry_run:
+            with transaction.atomic():
+                self.model.objects.bulk_create(to_create, batch_size=self.batch_size)
+                if to_update:
+                    fields = sorted(changed_fields | ({self.touch_field} if self.touch_field else set()))
+                    self.model.objects.bulk_update(to_update, fields, batch_size=self.batch_size)
+                self.after_batch(to_create + to_update)
+        self.result.created += len(to_create)
+        self.result.updated += len(to_update)
+
+
+class CouncilImporter(Importer):
+    model = Council
+    fields = ('name', 'slug', 'contact', 'contact_email')
+    required = ('name',)
+
+    def clean(self, row):
+        values = super().clean(row)
+        values['slug'] = values.get('slug') or slugify(values['name'])
+        if not values['slug']:
+            raise ValueError('name has no characters usable in a slug')
+        return values
+
+    def key(self, values):
+        return values['slug']
+
+    def existing(self, keys):
+        found = {}
+        for council in self.model.objects.filter(slug__in=keys).order_by('pk'):
+            found.setdefault(council.slug, council)
+        return found
+
+    def after_batch(self, instances):
+        from . import rollups
+        rollups.ensure_rollups()
+
+
+class SupplierImporter(Importer):
+    model = Supplier
+    fields = ('name', 'contact_person', 'contact_email', 'phone', 'address', 'specialty')
+    required = ('name',)
+
+    def key(self, values):
+        return values['name']
+
+    def existing(self, keys):
+        return {s.name: s for s in self.model.objects.filter(name__in=keys)}
+
+
+class ProjectImporter(Importer):
+    model = Project
+    fields = (
+        'title', 'description', 'budget', 'location', 'project_manager', 'end_date', 'image', 'main_image',
+    )
+    required = ('title', 'budget')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.touched_councils = set()
+
+    def load_maps(self):
+        self.councils = {}
+        for pk, name, slug in Council.objects.order_by('-pk').values_list('pk', 'name', 'slug'):
+            # ordered so the oldest council wins when names collide
+            self.councils[name.lower()] = pk
+            if slug:
+                self.councils[slug.lower()] = pk
+        self.categories = {name.lower(): pk for pk, name in Category.objects.order_by('-pk').values_list('pk', 'name')}
+
+    def clean_value(self, name, value):
+        if name == 'budget' and isinstance(value, str):
+            # accept "£1,200,000" / "$890,500" as well as plain numbers
+            value = value.replace(',', '').replace('£', '').replace('$', '')
+        return super().clean_value(name, value)
+
+    def clean(self, row):
+        values = super().clean(row)
+        council = str(row.get('council') or '').strip().lower()
+        if council not in self.councils:
+            raise ValueError(f'unknown council {row.get("council")!r}')
+        values['council_id'] = self.councils[council]
+        if 'category' in row:
+            values['category_id'] = self.category_id(str(row.get('category') or '').strip())
+        if str(row.get('id') or '').strip():
+            try:
+                values['id'] = int(row['id'])
+            except (TypeError, ValueError):
+                raise ValueError(f'invalid id {row["id"]!r}')
+        return values
+
+    def category_id(self, name):
+        if not name:
+            return None
+        if name.lower() not in self.categories:
+            if self.dry_run:
+                return None
+            category, _ = Category.objects.get_or_create(name=name)
+            self.categories[name.lower()] = category.pk
+        return self.categories[name.lower()]
+
+    def key(self, values):
+        if 'id' in values:
+            return ('id', values['id'])
+        return ('title', values['council_id'], values['title'])
+
+    def existing(self, keys):
+        condition = Q(pk__in=[key[1] for key in keys if key[0] == 'id'])
+        titled = [key for key in keys if key[0] == 'title']
+        if titled:
+            condition |= Q(council_id__in={key[1] for key in titled}, title__in={key[2] for key in titled})
+        found = {}
+        for project in self.model.objects.filter(condition).order_by('pk'):
+            found.setdefault(('id', project.pk), project)
+            found.setdefault(('title', project.council_id, project.title), project)
+        return {key: found[key] for key in keys if key in found}
+
+    def after_batch(self, instances):
+        from . import financials, rollups, search
+
+        ids = [p.pk for p in instances]
+        search.index_projects(ids)
+        financials.refresh_summaries(ids)
+        councils = set()
+        for project in instances:
+            councils.add(project.council_id)
+            # a project moved to another council changes both councils' rollups
+            councils.add(getattr(project, '_import_previous', {}).get('council_id'))
+        councils.discard(None)
+        self.touched_councils |= councils
+        rollups.mark_stale(councils)
+
+
+IMPORTERS = {
+    'councils': CouncilImporter,
+    'suppliers': SupplierImporter,
+    'projects': ProjectImporter,
+}
+
+
+def import_stream(kind, stream, fmt='csv', batch_size=BATCH_SIZE, dry_run=False):
+    """Import rows of ``kind`` from a text stream; returns the ``ImportResult``."""
+    if kind not in IMPORTERS:
+        raise ValueError(f'Unknown import {kind!r}; expected one of {", ".join(IMPORTERS)}')
+    importer = IMPORTERS[kind](batch_size=batch_size, dry_run=dry_run)
+    return importer.run(read_rows(stream, fmt))
+
+
+def import_file(kind, path, fmt=None, **kwargs):
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        return import_stream(kind, stream, fmt or detect_format(path), **kwargs)
+
+
+def write_rejects(result, stream):
+    """Write rejected rows as JSON Lines (line number, reason and the original row)."""
+    for number, row, reason in result.rejected:
+        stream.write(json.dumps({'line': number, 'reason': reason, 'row': row}, ensure_ascii=False, default=str) + '\n')
+
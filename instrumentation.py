@@ -0,0 +1,300 @@
+"""Per-request timing and query counts, aggregated by URL name.
+
+``InstrumentationMiddleware`` measures every request: total latency, the
+number of SQL queries and the time spent in them (through a query hook
+installed on every database connection), and the time spent rendering
+templates (when ``TEMPLATES`` uses the ``InstrumentedDjangoTemplates``
+backend). It works for sync and async views alike: the request being
+measured is found through a context variable, which ``sync_to_async``
+carries over to the threads the ORM runs on.
+Measurements are kept per URL name (``projects-list``, ``calendar``, ...)
+in ``REGISTRY``, which holds counters plus the last ``SAMPLE_SIZE``
+samples of each view for the p50/p95/p99 figures. Requests slower than
+``SUPPLY_CHAIN_SLOW_REQUEST_MS`` are logged as warnings, and with
+``SUPPLY_CHAIN_SERVER_TIMING`` (on under DEBUG) each response carries a
+``Server-Timing`` header that browser dev tools display.
+
+``/__metrics__/`` (staff, or a scraper sending ``SUPPLY_CHAIN_METRICS_TOKEN``
+as a bearer token) serves the aggregates in the Prometheus text format, or
+as JSON with ``?format=json``. Figures are
+per process: a server with several workers is scraped once per worker.
+Streaming responses are timed up to the point the view returns them.
+"""
+import contextvars
+import hmac
+import logging
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SIZE = 1000
+QUANTILES = (0.5, 0.95, 0.99)
+UNRESOLVED = '<unresolved>'
+
+_current = contextvars.ContextVar('supply_chain_request_metrics', default=None)
+
+
+def slow_request_ms():
+    return getattr(settings, 'SUPPLY_CHAIN_SLOW_REQUEST_MS', 500)
+
+
+def server_timing_enabled():
+    return getattr(settings, 'SUPPLY_CHAIN_SERVER_TIMING', settings.DEBUG)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_seconds', 'template_seconds', 'template_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _install_query_hook(connection, **kwargs):
+    # first in line, so execute_wrapper() blocks (which pop the last one) stay balanced
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def instrument_queries():
+    """Time every query on every connection into the current request, whichever thread runs it.
+
+    Called from ``AppConfig.ready`` (before any connection opens) and again by
+    the middleware; installing twice is harmless.
+    """
+    connection_created.connect(_install_query_hook, dispatch_uid='supply_chain_instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _install_query_hook(connection)
+
+
+class ViewStats:
+    """Counters and a window of recent samples for one URL name."""
+
+    def __init__(self, sample_size=SAMPLE_SIZE):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.samples = deque(maxlen=sample_size)  # (seconds, queries, db seconds, template seconds)
+
+    def add(self, seconds, metrics, status):
+        self.count += 1
+        self.errors += status >= 500
+        self.seconds += seconds
+        self.db_seconds += metrics.db_seconds
+        self.template_seconds += metrics.template_seconds
+        self.queries += metrics.queries
+        self.max_queries = max(self.max_queries, metrics.queries)
+        self.samples.append((seconds, metrics.queries, metrics.db_seconds, metrics.template_seconds))
+
+
+def quantiles(values, qs=QUANTILES):
+    """Nearest-rank quantiles of ``values`` (``{q: value}``, empty for no values)."""
+    values = sorted(values)
+    if not values:
+        return {}
+    return {q: values[min(len(values) - 1, max(0, round(q * len(values)) - 1))] for q in qs}
+
+
+class Registry:
+    def __init__(self, sample_size=SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view, seconds, metrics, status):
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = ViewStats(self.sample_size)
+            stats.add(seconds, metrics, status)
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+    def snapshot(self):
+        """``{view: {...}}`` of counters and p50/p95/p99 of latency, queries, DB and template time (ms)."""
+        with self.lock:
+            views = {name: (stats, list(stats.samples)) for name, stats in self.views.items()}
+        report = {}
+        for name, (stats, samples) in sorted(views.items()):
+            columns = list(zip(*samples)) or [(), (), (), ()]
+            entry = {
+                'count': stats.count,
+                'errors': stats.errors,
+                'mean_ms': round(stats.seconds / stats.count * 1000, 3),
+                'db_queries_total': stats.queries,
+                'db_queries_max': stats.max_queries,
+                'db_ms_total': round(stats.db_seconds * 1000, 3),
+                'template_ms_total': round(stats.template_seconds * 1000, 3),
+            }
+            for metric, values, scale in (
+                ('latency_ms', columns[0], 1000), ('db_queries', columns[1], 1),
+                ('db_ms', columns[2], 1000), ('template_ms', columns[3], 1000),
+            ):
+                for q, value in quantiles(values).items():
+                    entry[f'{metric}_p{round(q * 100)}'] = round(value * scale, 3)
+            report[name] = entry
+        return report
+
+    def prometheus(self):
+        """The aggregates in the Prometheus text exposition format."""
+        with self.lock:
+            views = {name: (stats, list(stats.samples)) for name, stats in self.views.items()}
+        metrics = (
+            # (name, help, sample column, total attribute)
+            ('supply_chain_request_duration_seconds', 'Request latency by URL name.', 0, 'seconds'),
+            ('supply_chain_request_db_queries', 'SQL queries per request by URL name.', 1, 'queries'),
+            ('supply_chain_request_db_seconds', 'Time in SQL queries per request by URL name.', 2, 'db_seconds'),
+            ('supply_chain_request_template_seconds', 'Template rendering time per request by URL name.', 3, 'template_seconds'),
+        )
+        lines = []
+        for metric, help_text, column, total in metrics:
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} summary']
+            for name, (stats, samples) in sorted(views.items()):
+                label = _label(name)
+                for q, value in quantiles([sample[column] for sample in samples]).items():
+                    lines.append(f'{metric}{{view="{label}",quantile="{q}"}} {value:.6g}')
+                lines.append(f'{metric}_sum{{view="{label}"}} {getattr(stats, total):.6g}')
+                lines.append(f'{metric}_count{{view="{label}"}} {stats.count}')
+        lines += ['# HELP supply_chain_request_errors_total Responses with a 5xx status by URL name.',
+                  '# TYPE supply_chain_request_errors_total counter']
+        for name, (stats, _) in sorted(views.items()):
+            lines.append(f'supply_chain_request_errors_total{{view="{_label(name)}"}} {stats.errors}')
+        return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = Registry()
+
+
+class InstrumentedTemplate:
+    """A ``DjangoTemplates`` template whose top-level renders are timed into the current request."""
+
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                # a template rendered from inside another is already counted
+                metrics.template_seconds += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing ``render()`` and ``TemplateResponse`` per request.
+
+    Opt-in through ``TEMPLATES['BACKEND']``, so only templates loaded through
+    this engine are measured and nothing else in the process is patched.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+def metrics_token_matches(request):
+    """Whether ``request`` carries ``Authorization: Bearer <SUPPLY_CHAIN_METRICS_TOKEN>``."""
+    expected = getattr(settings, 'SUPPLY_CHAIN_METRICS_TOKEN', '')
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return bool(expected) and scheme.lower() == 'bearer' and hmac.compare_digest(token.strip(), expected)
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        instrument_queries()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    def finish(self, request, response, metrics, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or UNRESOLVED
+        REGISTRY.record(view, elapsed, metrics, response.status_code)
+
+        if elapsed * 1000 >= slow_request_ms():
+            logger.warning(
+                'Slow request: %s %s (%s) took %.0f ms, %d queries in %.0f ms, templates %.0f ms',
+                request.method, request.path, view, elapsed * 1000,
+                metrics.queries, metrics.db_seconds * 1000, metrics.template_seconds * 1000,
+            )
+        if server_timing_enabled():
+            response['Server-Timing'] = ', '.join([
+                f'db;desc="{metrics.queries} queries";dur={metrics.db_seconds * 1000:.1f}',
+                f'tpl;dur={metrics.template_seconds * 1000:.1f}',
+                f'total;dur={elapsed * 1000:.1f}',
+            ])
+        return response
@@ -0,0 +1,393 @@
+"""Concurrent load generator for the site, built on asyncio and the standard library.
+
+Each virtual user owns one keep-alive HTTP/1.1 connection (as a browser
+would) and repeatedly walks a randomly chosen journey from ``JOURNEYS`` -
+a scripted sequence of URL names such as project list, search, project
+detail - pausing for a "think time" between steps. The number of active
+users follows a ramp profile (``PROFILES``) over the run. Every response is
+recorded per step label, and the report gives throughput, error rate,
+latency percentiles and a histogram, plus a per-interval timeline of users
+and requests per second.
+
+Paths are built with ``reverse()`` and point at rows sampled from the
+database (``sample_targets``), so run it with the settings of the server
+under test. ``manage.py loadtest`` is the front end; it can also start the
+site's WSGI application in-process (``serve``).
+"""
+import asyncio
+import random
+import ssl
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from .instrumentation import quantiles
+
+USER_AGENT = 'supply-chain-loadtest'
+# upper bounds (ms) of the latency histogram buckets
+HISTOGRAM_MS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+TIMELINE_SECONDS = 5
+
+# journey name -> steps of (label, URL name, path argument source, query builder)
+JOURNEYS = {
+    'browse': [
+        ('home', 'design-home', None, None),
+        ('projects', 'projects-list', None, None),
+        ('projects sorted', 'projects-list', None,
+         lambda t, rng: {'sort': rng.choice(['-budget', '-utilisation', '-remaining'])}),
+        ('project', 'project-detail', 'projects', None),
+    ],
+    'search': [
+        ('search', 'projects-list', None, lambda t, rng: {'q': rng.choice(t['terms'])}),
+        ('search filtered', 'projects-list', None,
+         lambda t, rng: {'q': rng.choice(t['terms']), 'min_budget': rng.choice([50000, 250000, 750000])}),
+        ('project', 'project-detail', 'projects', None),
+    ],
+    'calendar': [
+        ('calendar', 'calendar', None, None),
+        ('event', 'event-detail', 'events', None),
+        ('meeting', 'meeting-detail', 'meetings', None),
+    ],
+    'suppliers': [
+        ('suppliers', 'supplier-list', None, None),
+        ('supplier', 'supplier-detail', 'suppliers', None),
+    ],
+    'councils': [
+        ('councils', 'councils-list', None, None),
+        ('council dashboard', 'council-dashboard', None, None),
+    ],
+    'api': [
+        ('api projects', 'api-list', None, lambda t, rng: {'limit': 100}),
+        ('api project', 'api-detail', 'projects', None),
+    ],
+}
+DEFAULT_MIX = {'browse': 3, 'search': 3, 'calendar': 2, 'suppliers': 1, 'councils': 1}
+
+
+def _linear(users, ramp, duration, t):
+    return users if ramp <= 0 or t >= ramp else max(1, round(users * t / ramp))
+
+
+def _step(users, ramp, duration, t):
+    # a quarter of the users at a time, one step every quarter of the ramp
+    if ramp <= 0 or t >= ramp:
+        return users
+    return max(1, round(users * (int(t / ramp * 4) + 1) / 4))
+
+
+def _spike(users, ramp, duration, t):
+    # a fifth of the users, all of them through the middle third of the run
+    return users if duration / 3 <= t < 2 * duration / 3 else max(1, users // 5)
+
+
+PROFILES = {
+    'constant': lambda users, ramp, duration, t: users,
+    'linear': _linear,
+    'step': _step,
+    'spike': _spike,
+}
+
+
+def parse_mix(value):
+    """``"browse:3,search:2"`` (weights optional) as ``{journey: weight}``."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.strip().partition(':')
+        if not name:
+            continue
+        if name not in JOURNEYS:
+            raise ValueError(f'Unknown journey {name!r}; expected one of {", ".join(JOURNEYS)}')
+        mix[name] = float(weight or 1)
+    if not mix or not any(mix.values()):
+        raise ValueError('No journeys selected')
+    return mix
+
+
+def sample_targets(limit=500, rng=None):
+    """Primary keys to visit and search terms, sampled from the database."""
+    from .models import CouncilMeeting, Event, Project, Supplier
+
+    rng = rng or random.Random()
+
+    def pks(model):
+        ids = list(model.objects.order_by('pk').values_list('pk', flat=True)[:limit * 20])
+        return rng.sample(ids, min(limit, len(ids)))
+
+    projects = pks(Project)
+    titles = Project.objects.filter(pk__in=projects[:100]).values_list('title', flat=True)
+    terms = sorted({word.lower() for title in titles for word in title.split() if len(word) > 3 and word.isalpha()})
+    return {
+        'projects': projects,
+        'events': pks(Event),
+        'meetings': pks(CouncilMeeting),
+        'suppliers': pks(Supplier),
+        'terms': terms or ['project'],
+    }
+
+
+def journey_paths(journey, targets, rng):
+    """``[(label, path)]`` for one walk of ``journey``; steps with no row to point at are skipped."""
+    from django.urls import reverse
+
+    paths = []
+    for label, url_name, source, query in JOURNEYS[journey]:
+        kwargs = {}
+        if url_name.startswith('api-'):
+            kwargs['resource'] = 'projects'
+        if source:
+            if not targets[source]:
+                continue
+            kwargs['pk'] = rng.choice(targets[source])
+        path = reverse(url_name, kwargs=kwargs)
+        if query:
+            path += '?' + urlencode(query(targets, rng))
+        paths.append((label, path))
+    return paths
+
+
+class HttpConnection:
+    """A minimal keep-alive HTTP/1.1 client connection (GET only, bodies are read and discarded)."""
+
+    def __init__(self, base_url, timeout=30):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if url.scheme == 'https' else None
+        self.host_header = url.netloc
+        self.prefix = url.path.rstrip('/')
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        """``(status, body bytes)``; retries once if a reused connection turns out to be closed."""
+        for attempt in range(2):
+            reused = self.writer is not None
+            try:
+                return await asyncio.wait_for(self._get(path), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if not reused or attempt:
+                    raise
+            except BaseException:
+                self.close()
+                raise
+
+    async def _get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        self.writer.write(
+            f'GET {self.prefix}{path} HTTP/1.1\r\nHost: {self.host_header}\r\n'
+            f'User-Agent: {USER_AGENT}\r\nAccept-Encoding: identity\r\n\r\n'.encode('latin-1')
+        )
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed before the response')
+        version, status = status_line.split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        size = 0
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                chunk = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(chunk + 2)
+                size += chunk
+                if not chunk:
+                    break
+        elif 'content-length' in headers:
+            size = int(headers['content-length'])
+            await self.reader.readexactly(size)
+        elif int(status) not in (204, 304):
+            size = len(await self.reader.read())
+            headers['connection'] = 'close'
+        connection = headers.get('connection', '').lower()
+        if connection == 'close' or (version == b'HTTP/1.0' and connection != 'keep-alive'):
+            self.close()
+        return int(status), size
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Stats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps = {}  # label -> [latencies ms], [error count], bytes
+        self.timeline = {}  # interval -> [requests, errors, max users]
+
+    def record(self, label, ms, size, error, users):
+        latencies, counters = self.steps.setdefault(label, ([], [0, 0]))
+        latencies.append(ms)
+        counters[0] += error
+        counters[1] += size
+        interval = int((time.perf_counter() - self.started) // TIMELINE_SECONDS)
+        slot = self.timeline.setdefault(interval, [0, 0, 0])
+        slot[0] += 1
+        slot[1] += error
+        slot[2] = max(slot[2], users)
+
+    def report(self, elapsed):
+        """The results as a dict (totals, per-step rows, histogram and timeline)."""
+        everything = [ms for latencies, _ in self.steps.values() for ms in latencies]
+        errors = sum(counters[0] for _, counters in self.steps.values())
+
+        def summary(latencies, errors, size):
+            return {
+                'requests': len(latencies),
+                'errors': errors,
+                'error_rate': errors / len(latencies) if latencies else 0.0,
+                'rps': len(latencies) / elapsed if elapsed else 0.0,
+                'bytes': size,
+                'mean_ms': sum(latencies) / len(latencies) if latencies else None,
+                'max_ms': max(latencies, default=None),
+                **{f'p{round(q * 100)}_ms': value for q, value in quantiles(latencies).items()},
+            }
+
+        if not everything:
+            return {'elapsed': elapsed, 'total': summary([], 0, 0), 'steps': {}, 'histogram': [], 'timeline': []}
+        histogram, previous = [], 0
+        for bound in (*HISTOGRAM_MS, None):
+            count = sum(1 for ms in everything if ms > previous and (bound is None or ms <= bound))
+            histogram.append({'le_ms': bound, 'count': count})
+            previous = bound
+        return {
+            'elapsed': elapsed,
+            'total': summary(everything, errors, sum(counters[1] for _, counters in self.steps.values())),
+            'steps': {label: summary(lat, c[0], c[1]) for label, (lat, c) in sorted(self.steps.items())},
+            'histogram': histogram,
+            'timeline': [
+                {'second': i * TIMELINE_SECONDS, 'users': users, 'rps': requests / TIMELINE_SECONDS, 'errors': errs}
+                for i, (requests, errs, users) in sorted(self.timeline.items())
+            ],
+        }
+
+
+class LoadTest:
+    """Drive ``users`` virtual users against ``base_url`` for ``duration`` seconds."""
+
+    def __init__(self, base_url, targets, users=10, duration=30, ramp=0, profile='linear',
+                 mix=None, think=1.0, timeout=30, seed=None):
+        if profile not in PROFILES:
+            raise ValueError(f'Unknown profile {profile!r}; expected one of {", ".join(PROFILES)}')
+        self.base_url = base_url
+        self.targets = targets
+        self.users = users
+        self.duration = duration
+        self.ramp = ramp
+        self.profile = PROFILES[profile]
+        self.mix = mix or DEFAULT_MIX
+        self.think = think
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.stats = Stats()
+        self.active = 0
+
+    async def user(self, stop, rng):
+        connection = HttpConnection(self.base_url, self.timeout)
+        names, weights = list(self.mix), list(self.mix.values())
+        self.active += 1
+        try:
+            while not stop.is_set():
+                for label, path in journey_paths(rng.choices(names, weights)[0], self.targets, rng):
+                    if stop.is_set():
+                        break
+                    started = time.perf_counter()
+                    try:
+                        status, size = await connection.get(path)
+                        error = status >= 400
+                    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                        size, error = 0, True
+                    self.stats.record(label, (time.perf_counter() - started) * 1000, size, error, self.active)
+                    if self.think:
+                        # uniform on [0.5, 1.5] x think time, so users drift out of lockstep
+                        try:
+                            await asyncio.wait_for(stop.wait(), self.think * (0.5 + rng.random()))
+                        except asyncio.TimeoutError:
+                            pass
+        finally:
+            self.active -= 1
+            connection.close()
+
+    async def run(self):
+        """Run the test and return the report dict."""
+        running = []  # (task, stop event), newest last
+        started = time.perf_counter()
+        self.stats = Stats()
+        while (now := time.perf_counter() - started) < self.duration:
+            wanted = self.profile(self.users, self.ramp, self.duration, now)
+            while len(running) < wanted:
+                stop = asyncio.Event()
+                rng = random.Random(self.rng.random())
+                running.append((asyncio.create_task(self.user(stop, rng)), stop))
+            while len(running) > wanted:
+                running.pop()[1].set()  # finishes its current request, then leaves
+            await asyncio.sleep(min(0.25, self.duration - now))
+        for _, stop in running:
+            stop.set()
+        await asyncio.gather(*(task for task, _ in running), return_exceptions=True)
+        return self.stats.report(time.perf_counter() - started)
+
+
+def run(base_url, **kwargs):
+    """Synchronous wrapper: build targets from the database and run a ``LoadTest``."""
+    targets = kwargs.pop('targets', None) or sample_targets(rng=random.Random(kwargs.get('seed')))
+    return asyncio.run(LoadTest(base_url, targets, **kwargs).run())
+
+
+def serve(host='127.0.0.1', port=0):
+    """Start the site's WSGI app on a threaded server in the background; returns ``(server, base_url)``.
+
+    The load generator then shares the process (and the GIL) with the site,
+    so figures are lower than against a separate server.
+    """
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer((host, port), QuietHandler, allow_reuse_address=False)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def format_report(report):
+    """The report as plain-text tables."""
+    total = report['total']
+    lines = [
+        f'{total["requests"]} requests in {report["elapsed"]:.1f}s: {total["rps"]:.1f} req/s, '
+        f'{total["errors"]} errors ({total["error_rate"] * 100:.2f}%), {total["bytes"] / 1048576:.1f} MiB',
+        '',
+        f'{"step":<20} {"requests":>9} {"errors":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}',
+    ]
+    for label, row in (*report['steps'].items(), ('all', total)):
+        if not row['requests']:
+            continue
+        lines.append(
+            f'{label[:20]:<20} {row["requests"]:>9} {row["errors"]:>7} {row["rps"]:>8.1f} {row["p50_ms"]:>8.1f} '
+            f'{row["p95_ms"]:>8.1f} {row["p99_ms"]:>8.1f} {row["max_ms"]:>8.1f}'
+        )
+    if report['histogram']:
+        lines += ['', 'Latency histogram']
+        peak = max(bucket['count'] for bucket in report['histogram']) or 1
+        previous = 0
+        for bucket in report['histogram']:
+            bound = f'<= {bucket["le_ms"]} ms' if bucket['le_ms'] is not None else f'>  {previous} ms'
+            share = bucket['count'] / total['requests'] * 100
+            lines.append(f'  {bound:>12} {"#" * round(40 * bucket["count"] / peak):<40} {bucket["count"]:>7} ({share:5.1f}%)')
+            previous = bucket['le_ms']
+    if report['timeline']:
+        lines += ['', f'{"second":>8} {"users":>6} {"req/s":>8} {"errors":>7}']
+        for slot in report['timeline']:
+            lines.append(f'{slot["second"]:>8} {slot["users"]:>6} {slot["rps"]:>8.1f} {slot["errors"]:>7}')
+    return '\n'.join(lines)
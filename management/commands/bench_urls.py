@@ -0,0 +1,95 @@
+import io
+import os
+import random
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from supply_chain import benchmarking
+
+# local to each machine and git-ignored; see benchmarking.py
+DEFAULT_BASELINE = os.path.join(os.path.dirname(benchmarking.__file__), 'benchmarks', 'url_baseline.json')
+
+
+class Command(BaseCommand):
+    help = ('Time every named URL (cold and warm) against freshly seeded databases of each scale '
+            'and compare with a JSON baseline; fails on regressions.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default=','.join(map(str, benchmarking.DEFAULT_SCALES)),
+                            help='Comma-separated numbers of synthetic projects (default: %(default)s)')
+        parser.add_argument('--repeat', type=int, default=benchmarking.DEFAULT_REPEAT, help='Warm requests per URL')
+        parser.add_argument('--budget', type=float, default=benchmarking.DEFAULT_BUDGET,
+                            help='Seconds of warm requests per URL at most (default: %(default)g)')
+        parser.add_argument('--urls', help='Only these comma-separated URL names')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file (default: %(default)s)')
+        parser.add_argument('--save', action='store_true', help='Write the results as the new baseline instead of comparing')
+        parser.add_argument('--threshold', type=float, default=benchmarking.DEFAULT_THRESHOLD * 100,
+                            help='Allowed warm p50 slowdown in percent (default: %(default)g)')
+        parser.add_argument('--min-delta-ms', type=float, default=benchmarking.MIN_DELTA_MS,
+                            help='Ignore slowdowns smaller than this many ms (default: %(default)g)')
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(s) for s in options['scales'].split(',') if s.strip()]
+        except ValueError:
+            raise CommandError('--scales takes comma-separated integers')
+        only = {name.strip() for name in (options['urls'] or '').split(',') if name.strip()}
+
+        results = {}
+        setup_test_environment()
+        try:
+            for scale in scales:
+                results[str(scale)] = self.bench_scale(scale, only, options['repeat'], options['budget'])
+        finally:
+            teardown_test_environment()
+
+        errors = [
+            f'{scale} rows, {case}: HTTP {row["status"]}'
+            for scale, cases in results.items() for case, row in cases.items() if row['status'] >= 400
+        ]
+        if options['save']:
+            os.makedirs(os.path.dirname(os.path.abspath(options['baseline'])), exist_ok=True)
+            benchmarking.save_baseline(options['baseline'], results, options['repeat'])
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {options["baseline"]}.'))
+        elif os.path.exists(options['baseline']):
+            errors += benchmarking.compare(
+                benchmarking.load_baseline(options['baseline']), results,
+                threshold=options['threshold'] / 100, min_delta_ms=options['min_delta_ms'],
+            )
+        else:
+            self.stdout.write(f'No baseline at {options["baseline"]}; run with --save to record one.')
+        if errors:
+            for line in errors:
+                self.stderr.write(line)
+            raise CommandError(f'{len(errors)} regression(s) or failing URL(s).')
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
+
+    def bench_scale(self, scale, only, repeat, budget):
+        """Seed a throwaway database with ``scale`` synthetic projects and time every URL against it."""
+        from django.contrib.auth.models import User
+
+        self.stdout.write(f'Seeding {scale} projects...')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            random.seed(scale)
+            call_command('seed_data', scale=scale, stdout=io.StringIO())
+            staff = Client()
+            staff.force_login(User.objects.create_user('bench-staff', is_staff=True))
+            cases = [case for case in benchmarking.url_cases() if not only or case[1] in only]
+            results = benchmarking.measure(Client(), cases, repeat, staff_client=staff, budget=budget)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stdout.write(f'{"URL":<48} {"status":>6} {"cold ms":>9} {"p50":>8} {"p95":>8} {"p99":>8} {"queries":>9}')
+        for case, row in results.items():
+            self.stdout.write(
+                f'{case[:48]:<48} {row["status"]:>6} {row["cold_ms"]:>9.1f} {row.get("warm_p50_ms", 0):>8.1f} '
+                f'{row.get("warm_p95_ms", 0):>8.1f} {row.get("warm_p99_ms", 0):>8.1f} '
+                f'{row["cold_queries"]:>4}/{row["warm_queries"]:<4}'
+            )
+        return results
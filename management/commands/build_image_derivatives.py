@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from supply_chain import caching, image_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Generate resized AVIF/WebP/JPEG variants for project and event images (used by {% responsive_img %}).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploads', action='store_true',
+                            help='Only uploaded event images without variants yet (catches uploads the on-save worker missed)')
+
+    def handle(self, *args, **options):
+        from supply_chain.models import Event, Project
+
+        urls = set()
+        if not options['uploads']:
+            static_prefix = '/' + settings.STATIC_URL.strip('/') + '/'
+            urls.update(
+                f'{static_prefix}img/projects/{path.name}'
+                for path in (image_derivatives.APP_STATIC_DIR / 'img' / 'projects').iterdir()
+                if path.suffix.lower() in ('.jpg', '.jpeg', '.png', '.webp', '.avif')
+            )
+            for main_image, image in Project.objects.values_list('main_image', 'image'):
+                urls.update(u for u in (main_image, image) if u)
+        for event in Event.objects.only('image', 'image_file'):
+            if event.image and not options['uploads']:
+                urls.add(event.image)
+            if event.image_file:
+                # templates look variants up by the quoted .url, not the stored name
+                urls.add(event.image_file.url)
+        if options['uploads']:
+            urls = {url for url in urls if not image_derivatives.variants_for(url)}
+
+        entries = {}
+        source_bytes = variant_bytes = 0
+        for url in sorted(urls):
+            path = image_derivatives.source_path(url)
+            if path is None:
+                continue
+            try:
+                data = path.read_bytes()
+                entry = image_derivatives.build_variants(data)
+            except Exception as e:
+                self.stderr.write(f'Skipped {url}: {e}')
+                continue
+            entries[url] = entry
+            source_bytes += len(data)
+            # what a typical card (about 640px wide, best format) now transfers instead of the original
+            widths = entry['variants'][next(iter(entry['variants']))]
+            variant_bytes += _size(widths[min(widths, key=lambda w: abs(int(w) - 640))])
+            self.stdout.write(f'{url} -> {entry["hash"]}')
+
+        if image_derivatives.update_index(entries):
+            # fragment-cached home and calendar markup embeds the srcset
+            caching.bump_version('supply_chain.event')
+            if not options['uploads']:
+                caching.bump_version('supply_chain.project')
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. {len(entries)} images indexed ({len({e["hash"] for e in entries.values()})} distinct). '
+            f'640px card: {variant_bytes / 1024:.0f} KiB vs {source_bytes / 1024:.0f} KiB originals.'
+        ))
+
+
+def _size(url):
+    name = url[len(default_storage.base_url):] if url.startswith(default_storage.base_url) else url
+    return default_storage.size(name)
@@ -1,8 +1,15 @@
 import os
-import urllib.request
+import shutil
+import tempfile
 
 from django.core.files import File
 from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from supply_chain.fetching import Fetcher
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 2 * 1024 * 1024  # typical images stay in memory; larger ones spill to a temp file
 
 
 class Command(BaseCommand):
@@ -10,39 +17,51 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('--limit', type=int, default=20, help='Maximum number of events to process')
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel downloads')
+        parser.add_argument('--per-host', type=int, default=4, help='Parallel downloads from any one host')
+        parser.add_argument('--timeout', type=float, default=15, help='Seconds before a request is abandoned')
+        parser.add_argument('--retries', type=int, default=3, help='Retries for transient failures')
+        parser.add_argument('--backoff', type=float, default=0.5, help='Initial retry delay in seconds (doubles each retry)')
+        parser.add_argument('--fallback-url', default='https://picsum.photos/1200/800?random={pk}',
+                            help='URL used for events without an image URL; {pk} is the event id')
 
     def handle(self, *args, **options):
         from supply_chain.models import Event
         limit = options.get('limit')
-        qs = Event.objects.filter(image_file__isnull=True)[:limit]
-        if not qs:
+        events = {ev.pk: ev for ev in Event.objects.filter(Q(image_file__isnull=True) | Q(image_file=''))[:limit]}
+        if not events:
             self.stdout.write('No events need images.')
             return
 
-        tmp_dir = '/tmp/event_image_downloads'
-        os.makedirs(tmp_dir, exist_ok=True)
-
-        count = 0
-        for i, ev in enumerate(qs):
-            # prefer an explicit image URL if present
-            url = ev.image if ev.image else f'https://picsum.photos/1200/800?random={ev.pk}'
-            try:
-                fname = os.path.join(tmp_dir, f'event_{ev.pk}.jpg')
-                # download to temporary file
-                urllib.request.urlretrieve(url, fname)
-                with open(fname, 'rb') as f:
-                    ev.image_file.save(os.path.basename(fname), File(f), save=True)
-                count += 1
-                self.stdout.write(self.style.SUCCESS(f'Attached image to Event {ev.pk}'))
-            except Exception as e:
-                self.stderr.write(f'Failed to fetch image for Event {ev.pk}: {e}')
-
-        # cleanup (leave files for inspection is fine, but remove to be tidy)
-        try:
-            for fn in os.listdir(tmp_dir):
-                os.remove(os.path.join(tmp_dir, fn))
-            os.rmdir(tmp_dir)
-        except Exception:
-            pass
-
-        self.stdout.write(self.style.SUCCESS(f'Completed. {count} events updated.'))
+        field = Event._meta.get_field('image_file')
+
+        def store(pk, response):
+            # read the whole body before it reaches storage, so a dropped
+            # connection (retried by the fetcher) leaves no partial file behind
+            name = field.generate_filename(events[pk], f'event_{pk}.jpg')
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as body:
+                shutil.copyfileobj(response, body, CHUNK_SIZE)
+                body.seek(0)
+                return field.storage.save(name, File(body, name=os.path.basename(name)), max_length=field.max_length)
+
+        fetcher = Fetcher(
+            concurrency=options['concurrency'],
+            per_host=options['per_host'],
+            timeout=options['timeout'],
+            retries=options['retries'],
+            backoff=options['backoff'],
+        )
+        # prefer an explicit image URL if present
+        jobs = [(pk, ev.image or options['fallback_url'].format(pk=pk)) for pk, ev in events.items()]
+        summary = fetcher.run(jobs, store)
+
+        # the downloads ran in worker threads; model updates happen here on one connection
+        for result in summary.succeeded:
+            ev = events[result.key]
+            ev.image_file.name = result.value
+            ev.save(update_fields=['image_file'])
+            self.stdout.write(self.style.SUCCESS(f'Attached image to Event {ev.pk}'))
+        for result in summary.failed:
+            self.stderr.write(f'Failed to fetch image for Event {result.key} after {result.attempts} attempt(s): {result.error}')
+
+        self.stdout.write(self.style.SUCCESS(f'Completed. {len(summary.succeeded)} events updated. {summary}'))
@@ -0,0 +1,41 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from supply_chain import importers
+
+
+class Command(BaseCommand):
+    help = 'Bulk import councils, suppliers or projects from CSV or JSON Lines (re-running is idempotent).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(importers.IMPORTERS))
+        parser.add_argument('path', help='File to read, or - for stdin')
+        parser.add_argument('--format', choices=importers.FORMATS, help='Default: from the file extension (csv for stdin)')
+        parser.add_argument('--batch-size', type=int, default=importers.BATCH_SIZE, help='Rows written per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and count without writing')
+        parser.add_argument('--rejects', help='Write rejected rows with their reasons to this JSON Lines file')
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], options['path']
+        kwargs = {'batch_size': options['batch_size'], 'dry_run': options['dry_run']}
+        try:
+            if path == '-':
+                stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+                result = importers.import_stream(kind, stream, options['format'] or 'csv', **kwargs)
+            else:
+                result = importers.import_file(kind, path, options['format'], **kwargs)
+        except (OSError, ValueError) as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(('[dry run] ' if options['dry_run'] else '') + str(result))
+        if result.rejected:
+            for number, _, reason in result.rejected[:10]:
+                self.stderr.write(f'  line {number}: {reason}')
+            if len(result.rejected) > 10:
+                self.stderr.write(f'  ... and {len(result.rejected) - 10} more')
+            if options['rejects']:
+                with open(options['rejects'], 'w', encoding='utf-8') as out:
+                    importers.write_rejects(result, out)
+                self.stderr.write(f'Rejected rows written to {options["rejects"]}.')
@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from supply_chain import loadtest
+
+
+class Command(BaseCommand):
+    help = ('Drive concurrent virtual users through scripted journeys (search, project detail, calendar, ...) '
+            'and report throughput, error rate and latency.')
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000')
+        target.add_argument('--serve', action='store_true',
+                            help="Start this project's WSGI app in-process on a free port and test that")
+        parser.add_argument('--users', type=int, default=20, help='Peak concurrent users (default: %(default)s)')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run (default: %(default)s)')
+        parser.add_argument('--ramp', type=float, default=10, help='Seconds to reach --users (default: %(default)s)')
+        parser.add_argument('--profile', choices=sorted(loadtest.PROFILES), default='linear',
+                            help='How the number of users changes over the run (default: %(default)s)')
+        parser.add_argument('--journeys', default=','.join(f'{k}:{v:g}' for k, v in loadtest.DEFAULT_MIX.items()),
+                            help=f'Weighted mix of {", ".join(loadtest.JOURNEYS)} (default: %(default)s)')
+        parser.add_argument('--think', type=float, default=1.0, help='Mean pause between steps in seconds')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+        parser.add_argument('--seed', type=int, help='Random seed for repeatable journeys')
+        parser.add_argument('--json', help='Also write the full report to this file')
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options['journeys'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        if options['users'] < 1 or options['duration'] <= 0:
+            raise CommandError('--users and --duration must be positive')
+
+        server = None
+        base_url = options['url']
+        if options['serve']:
+            server, base_url = loadtest.serve()
+        self.stdout.write(
+            f'{options["users"]} users ({options["profile"]}, ramp {options["ramp"]:g}s) for {options["duration"]:g}s '
+            f'against {base_url}'
+        )
+        try:
+            report = loadtest.run(
+                base_url, users=options['users'], duration=options['duration'], ramp=options['ramp'],
+                profile=options['profile'], mix=mix, think=options['think'], timeout=options['timeout'],
+                seed=options['seed'],
+            )
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        self.stdout.write(loadtest.format_report(report))
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=1)
+                f.write('\n')
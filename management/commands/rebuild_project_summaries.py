@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from supply_chain import caching, financials
+
+
+class Command(BaseCommand):
+    help = 'Recompute ProjectFinancialSummary rows from the supplier links, or check them for drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report summaries that disagree with the links; exit non-zero if any do')
+        parser.add_argument('--batch-size', type=int, default=financials.BATCH_SIZE, help='Projects per batch')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            problems = financials.check_summaries(batch_size=options['batch_size'])
+            for project_id, stored, expected in problems[:20]:
+                self.stdout.write(f'Project {project_id}: stored {stored}, expected {expected}')
+            if problems:
+                raise CommandError(f'{len(problems)} project summaries are out of date; run rebuild_project_summaries.')
+            self.stdout.write(self.style.SUCCESS('All project summaries match the supplier links.'))
+            return
+
+        written = financials.refresh_summaries(batch_size=options['batch_size'])
+        caching.bump_version('supply_chain.project')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} project summaries.'))
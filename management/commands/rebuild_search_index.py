@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from supply_chain import search
+
+
+class Command(BaseCommand):
+    help = 'Create (if needed) and rebuild the full-text search index over Projects.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drop', action='store_true', help='Drop and recreate the index table first')
+
+    def handle(self, *args, **options):
+        if options.get('drop'):
+            search.drop_index()
+        if not search.index_available() and not search.create_index():
+            self.stderr.write('Full-text search is not supported on this database; the icontains fallback will be used.')
+            return
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from supply_chain import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the council dashboard rollups that changes have marked stale (or all of them).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Refresh every council, stale or not')
+        parser.add_argument('--every', type=float, default=0,
+                            help='Keep running, refreshing stale councils every N seconds (instead of cron)')
+
+    def handle(self, *args, **options):
+        stale_only = not options['all']
+        while True:
+            started = time.perf_counter()
+            count = rollups.refresh_rollups(stale_only=stale_only)
+            elapsed = time.perf_counter() - started
+            if count or not options['every']:
+                self.stdout.write(self.style.SUCCESS(f'Refreshed {count} council rollups in {elapsed:.2f}s.'))
+            if not options['every']:
+                return
+            stale_only = True
+            time.sleep(options['every'])
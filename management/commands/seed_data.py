@@ -1,107 +1,149 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
+import datetime
 import random
+import time
 
 try:
     from faker import Faker
 except Exception:
     Faker = None
 
+
+SPECIALTIES = ['Heavy Machinery Rental', 'Aggregates', 'Road Paint', 'Traffic Management', 'Drainage', 'Catering', 'Temporary Fencing', 'Concrete Supplier', 'Plant Hire', 'Groundworks', 'Scaffolding', 'Electrical Supplies', 'Landscaping', 'Surveying']
+
+COUNCIL_NAMES = [
+    'Seed Council', 'Northfield Council', 'Southvale Council', 'Riverside Borough',
+    'Lakeside Council', 'Hillside District', 'Elmbridge Council', 'Greenwich Council'
+]
+
+PROJECT_TITLES = [
+    'A1 Motorway Junction Upgrade',
+    'Leeds Ring Road Roundabout Modification',
+    'New-Build Housing Phase 3',
+    'Riverbank Flood Relief Scheme',
+    'East Leeds Road Resurfacing',
+    'South Leeds Bridge Replacement',
+    'Northern Bypass Drainage Works',
+    'City Centre Tram Link Extension',
+    'High Street Pavement Renewal',
+    'Industrial Park Utilities Upgrade',
+    'Armley Road Redevelopment',
+    'Kirkstall Lane Traffic Calming',
+    'Roundhay Park Access Improvements',
+    'Headingley Stadium Access Works',
+    'Horsforth Junction Safety Scheme',
+    'Seacroft Community Facilities Build',
+    'Morley By-pass Minor Works',
+    'Beeston Bridge Maintenance',
+    'Otley Road Cycleway Extension',
+    'Guiseley Drainage Upgrade'
+]
+
+LOCATIONS = ['Leeds', 'Headingley', 'Horsforth', 'Seacroft', 'Morley', 'Beeston', 'Otley', 'Guiseley']
+BUDGETS = [50000, 100000, 250000, 500000, 750000, 1200000]
+PROJECT_IMAGE = 'https://images.unsplash.com/photo-1509395176047-4a66953fd231?auto=format&fit=crop&w=800&q=60'
+
+
 class Command(BaseCommand):
     help = 'Seed the database with suppliers, projects and project-supplier links for development'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=0,
+                            help='Also generate N synthetic projects (with 3-6 supplier links each) for load testing')
+        parser.add_argument('--suppliers', type=int, default=30, help='Number of suppliers to ensure exist')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk INSERT')
+
     def handle(self, *args, **options):
         faker = Faker() if Faker else None
+        scale = options['scale']
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+        rows = 0
 
         from supply_chain.models import Supplier, Project, ProjectSupplier, Council
         with transaction.atomic():
             self.stdout.write('Seeding suppliers...')
-            suppliers = []
-            specialties = ['Heavy Machinery Rental', 'Aggregates', 'Road Paint', 'Traffic Management', 'Drainage', 'Catering', 'Temporary Fencing', 'Concrete Supplier', 'Plant Hire', 'Groundworks', 'Scaffolding', 'Electrical Supplies', 'Landscaping', 'Surveying']
-            # create more suppliers (30) for broader data
-            for i in range(30):
+            wanted = {}
+            for i in range(options['suppliers']):
                 name = faker.company() if faker else f'Supplier {i+1}'
-                contact = faker.name() if faker else ''
-                phone = faker.phone_number() if faker else ''
-                specialty = random.choice(specialties)
-                s, created = Supplier.objects.get_or_create(
+                wanted.setdefault(name, Supplier(
                     name=name,
-                    defaults={
-                        'contact_person': contact,
-                        'phone': phone,
-                        'specialty': specialty,
-                    }
-                )
-                suppliers.append(s)
-            self.stdout.write(self.style.SUCCESS(f'Created/Loaded {len(suppliers)} suppliers'))
+                    contact_person=faker.name() if faker else '',
+                    phone=faker.phone_number() if faker else '',
+                    specialty=random.choice(SPECIALTIES),
+                ))
+            existing = set(Supplier.objects.filter(name__in=list(wanted)).values_list('name', flat=True))
+            # Supplier.name is unique, so a concurrent seeder can't create duplicates
+            Supplier.objects.bulk_create(
+                [s for name, s in wanted.items() if name not in existing],
+                batch_size=batch_size, ignore_conflicts=True,
+            )
+            rows += len(wanted) - len(existing)
+            supplier_ids = list(Supplier.objects.filter(name__in=list(wanted)).values_list('pk', flat=True))
+            self.stdout.write(self.style.SUCCESS(f'Created/Loaded {len(supplier_ids)} suppliers'))
 
             # Create multiple councils
-            council_names = [
-                'Seed Council', 'Northfield Council', 'Southvale Council', 'Riverside Borough',
-                'Lakeside Council', 'Hillside District', 'Elmbridge Council', 'Greenwich Council'
+            existing = set(Council.objects.filter(name__in=COUNCIL_NAMES).values_list('name', flat=True))
+            new_councils = [
+                Council(name=cname, contact=f'{cname} Admin', contact_email=f'admin+{idx}@example.com',
+                        slug=cname.lower().replace(' ', '-'))
+                for idx, cname in enumerate(COUNCIL_NAMES) if cname not in existing
             ]
-            councils = []
-            for idx, cname in enumerate(council_names):
-                slug = cname.lower().replace(' ', '-')
-                c, created = Council.objects.get_or_create(
-                    name=cname,
-                    defaults={'contact': f'{cname} Admin', 'contact_email': f'admin+{idx}@example.com', 'slug': slug}
-                )
-                councils.append(c)
+            Council.objects.bulk_create(new_councils)
+            rows += len(new_councils)
+            council_ids = list(Council.objects.filter(name__in=COUNCIL_NAMES).values_list('pk', flat=True))
 
             self.stdout.write('Seeding projects...')
-            project_titles = [
-                'A1 Motorway Junction Upgrade',
-                'Leeds Ring Road Roundabout Modification',
-                'New-Build Housing Phase 3',
-                'Riverbank Flood Relief Scheme',
-                'East Leeds Road Resurfacing',
-                'South Leeds Bridge Replacement',
-                'Northern Bypass Drainage Works',
-                'City Centre Tram Link Extension',
-                'High Street Pavement Renewal',
-                'Industrial Park Utilities Upgrade',
-                'Armley Road Redevelopment',
-                'Kirkstall Lane Traffic Calming',
-                'Roundhay Park Access Improvements',
-                'Headingley Stadium Access Works',
-                'Horsforth Junction Safety Scheme',
-                'Seacroft Community Facilities Build',
-                'Morley By-pass Minor Works',
-                'Beeston Bridge Maintenance',
-                'Otley Road Cycleway Extension',
-                'Guiseley Drainage Upgrade'
-            ]
-
-            projects = []
-            for title in project_titles:
-                location = 'Leeds, UK' if not faker else f"{random.choice(['Leeds','Headingley','Horsforth','Seacroft','Morley','Beeston','Otley','Guiseley'])}, Leeds"
-                description = faker.paragraph(nb_sentences=3) if faker else 'Project seed data.'
-                image = 'https://images.unsplash.com/photo-1509395176047-4a66953fd231?auto=format&fit=crop&w=800&q=60'
-                p, created = Project.objects.get_or_create(
+            existing = set(Project.objects.filter(title__in=PROJECT_TITLES).values_list('title', flat=True))
+            new_projects = [
+                Project(
                     title=title,
-                    defaults={
-                        'description': description,
-                        'image': image,
-                        'main_image': image,
-                        'budget': random.choice([50000,100000,250000,500000,750000,1200000]),
-                        'location': location,
-                        'council': random.choice(councils),
-                        'project_manager': faker.name() if faker else ''
-                    }
+                    description=faker.paragraph(nb_sentences=3) if faker else 'Project seed data.',
+                    image=PROJECT_IMAGE,
+                    main_image=PROJECT_IMAGE,
+                    budget=random.choice(BUDGETS),
+                    location=f'{random.choice(LOCATIONS)}, Leeds' if faker else 'Leeds, UK',
+                    council_id=random.choice(council_ids),
+                    project_manager=faker.name() if faker else '',
                 )
-                projects.append(p)
-            self.stdout.write(self.style.SUCCESS(f'Created/Loaded {len(projects)} projects'))
+                for title in PROJECT_TITLES if title not in existing
+            ]
+            Project.objects.bulk_create(new_projects, batch_size=batch_size)
+            rows += len(new_projects)
+            project_ids = list(Project.objects.filter(title__in=PROJECT_TITLES).values_list('pk', flat=True))
+            self.stdout.write(self.style.SUCCESS(f'Created/Loaded {len(project_ids)} projects'))
+
+            if scale:
+                self.stdout.write(f'Generating {scale} synthetic projects...')
+                for start in range(0, scale, batch_size):
+                    batch = [
+                        Project(
+                            title=f'{random.choice(PROJECT_TITLES)} #{start + i + 1}',
+                            description=f'Synthetic load-test project {start + i + 1} in {random.choice(LOCATIONS)}.',
+                            main_image=PROJECT_IMAGE,
+                            budget=random.choice(BUDGETS),
+                            location=f'{random.choice(LOCATIONS)}, Leeds',
+                            council_id=random.choice(council_ids),
+                        )
+                        for i in range(min(batch_size, scale - start))
+                    ]
+                    project_ids.extend(p.pk for p in Project.objects.bulk_create(batch))
+                rows += scale
 
             self.stdout.write('Linking suppliers to projects...')
-            link_count = 0
-            for p in projects:
-                chosen = random.sample(suppliers, k=random.randint(3,6))
-                for s in chosen:
-                    value = round(random.uniform(10000, 500000), 2)
-                    ps, created = ProjectSupplier.objects.get_or_create(project=p, supplier=s, defaults={'contract_value': value})
-                    if created:
-                        link_count += 1
+            before = ProjectSupplier.objects.count()
+            for start in range(0, len(project_ids), batch_size):
+                links = [
+                    ProjectSupplier(project_id=pid, supplier_id=sid,
+                                    contract_value=round(random.uniform(10000, 500000), 2))
+                    for pid in project_ids[start:start + batch_size]
+                    for sid in random.sample(supplier_ids, k=min(len(supplier_ids), random.randint(3, 6)))
+                ]
+                # existing (project, supplier) pairs are skipped by the unique constraint
+                ProjectSupplier.objects.bulk_create(links, ignore_conflicts=True)
+            link_count = ProjectSupplier.objects.count() - before
+            rows += link_count
             self.stdout.write(self.style.SUCCESS(f'Created {link_count} project-supplier links'))
 
             # Seed some council meetings if none exist
@@ -109,17 +151,21 @@ class Command(BaseCommand):
             existing_meetings = CouncilMeeting.objects.count()
             if existing_meetings == 0:
                 self.stdout.write('Seeding council meetings...')
-                import datetime
                 meeting_count = 8
                 locations = ['Council Chamber', 'Town Hall', 'Community Centre', 'Online (Zoom)', 'Library Meeting Room']
+                meetings = []
                 for i in range(meeting_count):
                     # random date within next 60 days
                     days = random.randint(-7, 60)
-                    date = datetime.date.today() + datetime.timedelta(days=days)
-                    time = datetime.time(hour=random.choice([9,10,11,14,15,16]), minute=0)
-                    loc = random.choice(locations)
-                    agenda = (faker.sentence(nb_words=12) if faker else f'Agenda item {i+1}: discussion and updates')
-                    CouncilMeeting.objects.create(council=random.choice(councils), date=date, time=time, location=loc, agenda=agenda)
+                    meetings.append(CouncilMeeting(
+                        council_id=random.choice(council_ids),
+                        date=datetime.date.today() + datetime.timedelta(days=days),
+                        time=datetime.time(hour=random.choice([9,10,11,14,15,16]), minute=0),
+                        location=random.choice(locations),
+                        agenda=(faker.sentence(nb_words=12) if faker else f'Agenda item {i+1}: discussion and updates'),
+                    ))
+                CouncilMeeting.objects.bulk_create(meetings)
+                rows += meeting_count
                 self.stdout.write(self.style.SUCCESS(f'Created {meeting_count} council meetings'))
 
             # Seed a few seasonal/community events if none exist
@@ -127,63 +173,69 @@ class Command(BaseCommand):
             existing_events = Event.objects.count()
             if existing_events == 0:
                 self.stdout.write('Seeding seasonal events...')
-                import datetime
-                today = datetime.date.today()
-                year = today.year
-
-                # Helper to compute US Thanksgiving (4th Thursday of November)
-                def thanksgiving_date(y):
-                    d = datetime.date(y, 11, 1)
-                    # find first Thursday
-                    first_thu = d + datetime.timedelta(days=(3 - d.weekday()) % 7)
-                    # fourth Thursday is +21 days
-                    return first_thu + datetime.timedelta(days=21)
-
-                try:
-                    tg = thanksgiving_date(year)
-                except Exception:
-                    tg = today + datetime.timedelta(days=7)
-
-                # Christmas-themed multi-week attraction (use start date)
-                christmas_start = datetime.date(year, 11, 21)
-                new_year = datetime.date(year + 1, 1, 1)
-
-                # Use a local image if available for hero visuals
-                hero_image = 'supply_chain/static/img/projects/project_13.jpg'
-
-                events_to_create = [
-                    {
-                        'title': 'Ice Cube at Christmas — festive rink & funfair',
-                        'description': 'Celebrate the holiday season with a covered ice rink, festive food & drink stalls, and a family funfair running through the season.',
-                        'date': christmas_start,
-                        'location': 'City Centre Plaza',
-                        'image': '/static/img/projects/project_13.jpg'
-                    },
-                    {
-                        'title': 'Thanksgiving Community Lunch',
-                        'description': 'Community Thanksgiving lunch and food bank drive. All welcome — bring a non-perishable donation.',
-                        'date': tg,
-                        'location': 'Community Centre',
-                        'image': '/static/img/projects/project_30.jpg'
-                    },
-                    {
-                        'title': 'New Year Celebration & Fireworks',
-                        'description': 'Ring in the new year with a family-friendly fireworks display and live music.',
-                        'date': new_year,
-                        'location': 'Riverside Park',
-                        'image': '/static/img/projects/project_42.jpg'
-                    }
-                ]
-
-                for evdata in events_to_create:
-                    Event.objects.create(
-                        title=evdata['title'],
-                        description=evdata['description'],
-                        date=evdata['date'],
-                        location=evdata['location'],
-                        council=random.choice(councils),
-                        image=evdata.get('image','')
-                    )
+                events = self.seasonal_events()
+                for ev in events:
+                    ev.council_id = random.choice(council_ids)
+                Event.objects.bulk_create(events)
+                rows += len(events)
                 self.stdout.write(self.style.SUCCESS('Created seasonal events: Christmas, Thanksgiving, New Year'))
 
-        self.stdout.write(self.style.SUCCESS('Seeding completed.'))
+        self.refresh_derived_data()
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'Seeding completed: {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec).'))
+
+    def seasonal_events(self):
+        from supply_chain.models import Event
+        today = datetime.date.today()
+        year = today.year
+
+        # Helper to compute US Thanksgiving (4th Thursday of November)
+        def thanksgiving_date(y):
+            d = datetime.date(y, 11, 1)
+            # find first Thursday
+            first_thu = d + datetime.timedelta(days=(3 - d.weekday()) % 7)
+            # fourth Thursday is +21 days
+            return first_thu + datetime.timedelta(days=21)
+
+        try:
+            tg = thanksgiving_date(year)
+        except Exception:
+            tg = today + datetime.timedelta(days=7)
+
+        # Christmas-themed multi-week attraction (use start date)
+        christmas_start = datetime.date(year, 11, 21)
+        new_year = datetime.date(year + 1, 1, 1)
+
+        return [
+            Event(
+                title='Ice Cube at Christmas — festive rink & funfair',
+                description='Celebrate the holiday season with a covered ice rink, festive food & drink stalls, and a family funfair running through the season.',
+                date=christmas_start,
+                location='City Centre Plaza',
+                image='/static/img/projects/project_13.jpg',
+            ),
+            Event(
+                title='Thanksgiving Community Lunch',
+                description='Community Thanksgiving lunch and food bank drive. All welcome — bring a non-perishable donation.',
+                date=tg,
+                location='Community Centre',
+                image='/static/img/projects/project_30.jpg',
+            ),
+            Event(
+                title='New Year Celebration & Fireworks',
+                description='Ring in the new year with a family-friendly fireworks display and live music.',
+                date=new_year,
+                location='Riverside Park',
+                image='/static/img/projects/project_42.jpg',
+            ),
+        ]
+
+    def refresh_derived_data(self):
+        """bulk_create sends no signals, so bring the search index, summaries, rollups and caches up to date."""
+        from supply_chain import caching, financials, rollups, search
+        search.rebuild_index()
+        financials.refresh_summaries()
+        rollups.refresh_rollups(stale_only=False)
+        for label in caching.TRACKED_MODELS:
+            caching.bump_version(label)
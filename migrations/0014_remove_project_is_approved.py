@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("supply_chain", "0013_project_is_approved"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="project",
+            name="is_approved",
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("supply_chain", "0015_project_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="councilmeeting",
+            index=models.Index(condition=models.Q(("archived", False)), fields=["date", "time"], name="meeting_upcoming_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["date", "time"], name="event_date_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(fields=["created_at", "id"], name="project_created_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(fields=["budget"], name="project_budget_idx"),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:14
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("supply_chain", "0017_project_end_date_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="supplier",
+            index=models.Index(django.db.models.functions.text.Lower("name"), name="supplier_name_lower_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="supplier",
+            index=models.Index(django.db.models.functions.text.Lower("specialty"), name="supplier_specialty_lower_idx"),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:29
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    Project = apps.get_model("supply_chain", "Project")
+    ProjectSupplier = apps.get_model("supply_chain", "ProjectSupplier")
+    ProjectFinancialSummary = apps.get_model("supply_chain", "ProjectFinancialSummary")
+    totals = {
+        row["project"]: row
+        for row in ProjectSupplier.objects.values("project").annotate(
+            total=models.Sum("contract_value"), links=models.Count("pk")
+        ).order_by()
+    }
+    summaries = []
+    for pk, budget in Project.objects.values_list("pk", "budget").iterator():
+        row = totals.get(pk, {})
+        committed = (row.get("total") or Decimal("0")).quantize(Decimal("0.01"))
+        summaries.append(ProjectFinancialSummary(
+            project_id=pk,
+            committed_total=committed,
+            supplier_count=row.get("links", 0),
+            remaining_budget=Decimal(budget) - committed,
+            utilisation=float(committed) / budget if budget else None,
+        ))
+    ProjectFinancialSummary.objects.bulk_create(summaries, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("supply_chain", "0018_supplier_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectFinancialSummary",
+            fields=[
+                ("project", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="financial_summary", serialize=False, to="supply_chain.project")),
+                ("committed_total", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("supplier_count", models.PositiveIntegerField(default=0)),
+                ("remaining_budget", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("utilisation", models.FloatField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["utilisation"], name="summary_utilisation_idx"), models.Index(fields=["remaining_budget"], name="summary_remaining_idx")],
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
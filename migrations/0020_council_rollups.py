@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_stale_rollups(apps, schema_editor):
+    # filled in by the first refresh_council_rollups run
+    Council = apps.get_model("supply_chain", "Council")
+    CouncilRollup = apps.get_model("supply_chain", "CouncilRollup")
+    CouncilRollup.objects.bulk_create(
+        [CouncilRollup(council_id=pk, stale=True) for pk in Council.objects.values_list("pk", flat=True)]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("supply_chain", "0019_project_financial_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CouncilRollup",
+            fields=[
+                ("council", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="rollup", serialize=False, to="supply_chain.council")),
+                ("project_count", models.PositiveIntegerField(default=0)),
+                ("total_budget", models.BigIntegerField(default=0)),
+                ("committed_total", models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ("supplier_count", models.PositiveIntegerField(default=0)),
+                ("top_supplier_share", models.FloatField(blank=True, null=True)),
+                ("supplier_hhi", models.FloatField(blank=True, null=True)),
+                ("stale", models.BooleanField(default=True)),
+                ("refreshed_at", models.DateTimeField(blank=True, null=True)),
+                ("top_supplier", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to="supply_chain.supplier")),
+            ],
+        ),
+        migrations.CreateModel(
+            name="CouncilCategoryRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("project_count", models.PositiveIntegerField(default=0)),
+                ("total_budget", models.BigIntegerField(default=0)),
+                ("category", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="+", to="supply_chain.category")),
+                ("council", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="category_rollups", to="supply_chain.council")),
+            ],
+            options={
+                "constraints": [models.UniqueConstraint(fields=("council", "category"), name="council_category_rollup_unique")],
+            },
+        ),
+        migrations.RunPython(create_stale_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("supply_chain", "0020_council_rollups"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(fields=["council", "title"], name="project_council_title_idx"),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def start_from_created_at(apps, schema_editor):
+    for name in ("Event", "CouncilMeeting"):
+        model = apps.get_model("supply_chain", name)
+        model.objects.update(updated_at=models.F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("supply_chain", "0021_project_council_title_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="councilmeeting",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(start_from_created_at, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 
 
 class Council(models.Model):
@@ -47,6 +48,16 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # newest-first listings, created_at range filters and keyset pages
+            models.Index(fields=['created_at', 'id'], name='project_created_id_idx'),
+            models.Index(fields=['budget'], name='project_budget_idx'),
+            models.Index(fields=['end_date'], name='project_end_date_idx'),
+            # the natural key bulk imports match on
+            models.Index(fields=['council', 'title'], name='project_council_title_idx'),
+        ]
+
     def __str__(self):
         return f'{self.title}'
 
@@ -87,6 +98,13 @@ class Supplier(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # case-insensitive prefix search on the supplier list
+            models.Index(Lower('name'), name='supplier_name_lower_idx'),
+            models.Index(Lower('specialty'), name='supplier_specialty_lower_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -120,6 +138,72 @@ class ProjectSupplier(models.Model):
         return f"{self.supplier.name} @ {self.project.title} — £{self.contract_value if self.contract_value else 'n/a'}"
 
 
+class ProjectFinancialSummary(models.Model):
+    """Committed spend against budget for one project, kept up to date by signals.
+
+    A denormalized copy of ``SUM(ProjectSupplier.contract_value)`` and friends
+    so lists can filter and sort on spend without aggregating the link table.
+    See financials.py; ``manage.py rebuild_project_summaries`` rebuilds or checks it.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='financial_summary')
+    committed_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    supplier_count = models.PositiveIntegerField(default=0)
+    remaining_budget = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # committed_total / budget (1.0 = fully committed); null when the budget is zero
+    utilisation = models.FloatField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['utilisation'], name='summary_utilisation_idx'),
+            models.Index(fields=['remaining_budget'], name='summary_remaining_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id}: £{self.committed_total} committed, £{self.remaining_budget} remaining"
+
+
+class CouncilRollup(models.Model):
+    """Pre-aggregated totals for one council, read by the council dashboard.
+
+    Signals only flag a row as ``stale``; ``manage.py refresh_council_rollups``
+    (run on a schedule) recomputes stale rows. See rollups.py.
+    """
+    council = models.OneToOneField(Council, on_delete=models.CASCADE, primary_key=True, related_name='rollup')
+    project_count = models.PositiveIntegerField(default=0)
+    total_budget = models.BigIntegerField(default=0)
+    committed_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    supplier_count = models.PositiveIntegerField(default=0)
+    # supplier holding the largest share of the council's contract value
+    top_supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    top_supplier_share = models.FloatField(null=True, blank=True)
+    # Herfindahl-Hirschman index of supplier shares (0-1; 1 means a single supplier holds everything)
+    supplier_hhi = models.FloatField(null=True, blank=True)
+
+    stale = models.BooleanField(default=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Rollup for {self.council}"
+
+
+class CouncilCategoryRollup(models.Model):
+    """Project count and budget per (council, category); category is null for uncategorised projects."""
+    council = models.ForeignKey(Council, on_delete=models.CASCADE, related_name='category_rollups')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    project_count = models.PositiveIntegerField(default=0)
+    total_budget = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['council', 'category'], name='council_category_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.council_id}/{self.category_id}: {self.project_count} projects"
+
+
 class CouncilMeeting(models.Model):
     """A simple model to store council meetings / events."""
     council = models.ForeignKey(Council, on_delete=models.SET_NULL, null=True, blank=True)
@@ -130,9 +214,18 @@ class CouncilMeeting(models.Model):
     archived = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['date', 'time']
+        indexes = [
+            # upcoming (non-archived) meetings on the home page and calendar
+            models.Index(
+                fields=['date', 'time'],
+                condition=models.Q(archived=False),
+                name='meeting_upcoming_idx',
+            ),
+        ]
 
     def __str__(self):
         when = self.date.isoformat()
@@ -160,9 +253,13 @@ class Event(models.Model):
     council = models.ForeignKey(Council, on_delete=models.SET_NULL, null=True, blank=True)
     project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['date', 'time']
+        indexes = [
+            models.Index(fields=['date', 'time'], name='event_date_time_idx'),
+        ]
 
     def __str__(self):
         when = self.date.isoformat()
@@ -1,65 +1,422 @@
-from http.server import HTTPServer, BaseHTTPRequestHandler
+"""Static file server for the portfolio pages.
+
+Serves files below the current directory (``/`` redirects to ``/portfolio``)
+on a ``ThreadingHTTPServer`` with HTTP/1.1 keep-alive. Responses carry an
+ETag and Last-Modified so browsers revalidate with a cheap ``304``, single
+byte ranges are answered with ``206``, and ``foo.css.br`` / ``foo.css.gz``
+next to ``foo.css`` are served to clients that accept them. File bodies go
+out with ``os.sendfile`` where the platform has it, otherwise in fixed-size
+chunks, so large files are never read into memory.
+
+Small files are kept in a bounded LRU ``FileCache`` together with their
+precomputed headers, so a repeat request costs one ``os.stat`` (to notice
+edits) and a single write. ``GET /__stats__`` reports the cache's hit and miss
+counters as JSON.
+
+    python my_test_web_server.py [--port 8080] [--cache-mb 64] [--precompress]
+"""
+import argparse
+import email.utils
+import gzip
+import json
 import os
+import re
+import stat as stat_module
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+    '.json': 'application/json',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.avif': 'image/avif',
+    '.ico': 'image/x-icon',
+}
+# precompressed siblings, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE = ('.html', '.css', '.js', '.json', '.svg')
+CHUNK_SIZE = 256 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STATS_PATH = '/__stats__'
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class StaticFile:
+    """What we need to answer a request for one file on disk."""
+
+    def __init__(self, path, content_type, stat, encoding=None, source_stat=None):
+        """``stat`` is the served file's; for an encoded variant ``source_stat`` is the original's."""
+        source_stat = source_stat or stat
+        self.path = path
+        self.content_type = content_type
+        self.size = stat.st_size
+        self.mtime = int(source_stat.st_mtime)
+        self.encoding = encoding
+        self.version = f'{source_stat.st_size:x}-{source_stat.st_mtime_ns:x}'
+        self.last_modified = email.utils.formatdate(self.mtime, usegmt=True)
+        # what the file looked like when this was built; a cached copy is stale once it differs
+        self.fingerprint = (stat.st_mtime_ns, stat.st_size, source_stat.st_mtime_ns, source_stat.st_size)
+        self.data = None
+
+    @property
+    def etag(self):
+        # each encoding is a different byte sequence, so it gets its own strong tag
+        return f'"{self.version}-{self.encoding}"' if self.encoding else f'"{self.version}"'
+
+
+class FileCache:
+    """Thread-safe LRU of ``StaticFile`` objects with their bytes, bounded by total size.
+
+    Files bigger than ``max_file_size`` are not cached (they stream with
+    sendfile instead), so one large download can't flush everything else.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, max_file_size=None):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_bytes // 8 if max_file_size is None else max_file_size
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, stat, source_stat=None):
+        """The cached ``StaticFile`` for ``path`` if it still matches ``stat``, else None."""
+        source_stat = source_stat or stat
+        fingerprint = (stat.st_mtime_ns, stat.st_size, source_stat.st_mtime_ns, source_stat.st_size)
+        with self._lock:
+            file = self.entries.get(path)
+            if file is not None and file.fingerprint == fingerprint:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return file
+            if file is not None:
+                self.invalidations += 1
+                self._discard(path)
+            self.misses += 1
+            return None
+
+    def put(self, file):
+        """Read ``file`` into memory and cache it, if it is small enough."""
+        if file.size > self.max_file_size:
+            return
+        try:
+            with open(file.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return
+        if len(data) != file.size:
+            return  # changed while we were reading; the next request will try again
+        file.data = data
+        with self._lock:
+            self._discard(file.path)
+            self.entries[file.path] = file
+            self.bytes += file.size
+            while self.bytes > self.max_bytes:
+                self._discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _discard(self, path):
+        file = self.entries.pop(path, None)
+        if file is not None:
+            self.bytes -= file.size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'max_file_size': self.max_file_size,
+            }
+
 
 class RedirectHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes; don't let Nagle hold the second one back
+    disable_nagle_algorithm = True
+    root = None  # defaults to the current directory
+
     def do_GET(self):
+        self.serve(head=False)
+
+    def do_HEAD(self):
+        self.serve(head=True)
+
+    def serve(self, head):
         # Redirect only if path is root
         if self.path == '/' or self.path == '':
-            self.send_response(302)
+            self.send_response(HTTPStatus.FOUND)
             self.send_header('Location', '/portfolio')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.split('?', 1)[0] == STATS_PATH:
+            self.send_stats(head)
+            return
+
+        file = self.lookup(self.path)
+        if file is None:
+            self.send_error(HTTPStatus.NOT_FOUND, 'File Not Found')
+            return
+
+        if self.not_modified(file):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_validators(file)
             self.end_headers()
             return
 
+        start, length = 0, file.size
+        byte_range = self.requested_range(file)
+        if byte_range == 'invalid':
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header('Content-Range', f'bytes */{file.size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{file.size}')
+        else:
+            self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', file.content_type)
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        if file.encoding:
+            self.send_header('Content-Encoding', file.encoding)
+        self.send_validators(file)
+        self.end_headers()
+        if not head:
+            self.send_body(file, start, length)
+
+    def lookup(self, url_path):
+        """The ``StaticFile`` for a request path, or None if it isn't servable."""
         # Remove query string and normalize path
-        path = self.path.split('?', 1)[0]
-        if path == '/portfolio' or path == '/portfolio/':
-            file_path = os.path.join(os.getcwd(), 'portfolio', 'index.html')
+        path = unquote(url_path.split('?', 1)[0].split('#', 1)[0])
+        if path in ('/portfolio', '/portfolio/'):
+            path = '/portfolio/index.html'
+        root = os.path.realpath(self.root or os.getcwd())
+        file_path = os.path.realpath(os.path.join(root, path.lstrip('/')))
+        if os.path.commonpath([root, file_path]) != root:
+            return None
+
+        # Serve known file types only, never show directory listings
+        content_type = CONTENT_TYPES.get(os.path.splitext(file_path)[1].lower())
+        if content_type is None:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if not stat_module.S_ISREG(stat.st_mode):
+            return None
+
+        # ranges are offsets into the identity body, so only whole-file requests get a compressed variant
+        if 'Range' not in self.headers:
+            accepted = self.accepted_encodings()
+            for encoding, suffix in ENCODINGS:
+                if encoding not in accepted:
+                    continue
+                try:
+                    variant = os.stat(file_path + suffix)
+                except OSError:
+                    continue
+                if variant.st_mtime >= stat.st_mtime:
+                    return self.load(file_path + suffix, content_type, variant, encoding, stat)
+        return self.load(file_path, content_type, stat)
+
+    def load(self, path, content_type, stat, encoding=None, source_stat=None):
+        cache = getattr(self.server, 'file_cache', None)
+        file = cache.get(path, stat, source_stat) if cache else None
+        if file is None:
+            file = StaticFile(path, content_type, stat, encoding, source_stat)
+            if cache:
+                cache.put(file)
+        return file
+
+    def accepted_encodings(self):
+        accepted = set()
+        for part in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = part.strip().partition(';')
+            if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                accepted.add(name.strip().lower())
+        return accepted
+
+    def not_modified(self, file):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            # weak comparison, as If-None-Match requires
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or file.etag in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return file.mtime <= since
+        return False
+
+    def requested_range(self, file):
+        """``(start, end)`` for a satisfiable single range, None to send everything, or ``'invalid'``."""
+        header = self.headers.get('Range')
+        if not header or file.encoding:
+            return None
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range not in (file.etag, file.last_modified):
+            return None
+        match = RANGE_RE.match(header.strip())
+        if not match or match.groups() == ('', ''):
+            # multipart ranges are legal but rare; answering with the whole file is allowed
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), file.size - 1) if last else file.size - 1
         else:
-            file_path = os.path.join(os.getcwd(), path.lstrip('/'))
-
-        # Serve HTML, CSS, JS, and image files, never show directory listings
-        if os.path.isfile(file_path):
-            if file_path.endswith('.html'):
-                self.send_response(200)
-                self.send_header('Content-type', 'text/html')
-            elif file_path.endswith('.css'):
-                self.send_response(200)
-                self.send_header('Content-type', 'text/css')
-            elif file_path.endswith('.js'):
-                self.send_response(200)
-                self.send_header('Content-type', 'application/javascript')
-            elif file_path.endswith('.png'):
-                self.send_response(200)
-                self.send_header('Content-type', 'image/png')
-            elif file_path.endswith('.svg'):
-                self.send_response(200)
-                self.send_header('Content-type', 'image/svg+xml')
-            elif file_path.endswith('.jpg') or file_path.endswith('.jpeg'):
-                self.send_response(200)
-                self.send_header('Content-type', 'image/jpeg')
-            elif file_path.endswith('.gif'):
-                self.send_response(200)
-                self.send_header('Content-type', 'image/gif')
-            elif file_path.endswith('.webp'):
-                self.send_response(200)
-                self.send_header('Content-type', 'image/webp')
-            else:
-                self.send_response(404)
-                self.send_header('Content-type', 'text/html')
-                self.end_headers()
-                self.wfile.write(b'404 File Not Found')
+            # suffix range: the final N bytes
+            start, end = max(0, file.size - int(last)), file.size - 1
+        if start >= file.size or start > end:
+            return 'invalid'
+        return start, end
+
+    def send_validators(self, file):
+        self.send_header('ETag', file.etag)
+        self.send_header('Last-Modified', file.last_modified)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Cache-Control', 'no-cache')
+
+    def send_body(self, file, start, length):
+        if file.data is not None:
+            self.wfile.write(memoryview(file.data)[start:start + length])
+            return
+        with open(file.path, 'rb') as f:
+            offset, remaining = start, length
+            if hasattr(os, 'sendfile'):
+                self.wfile.flush()
+                try:
+                    while remaining > 0:
+                        sent = os.sendfile(self.connection.fileno(), f.fileno(), offset, min(remaining, 1 << 30))
+                        if sent == 0:
+                            break
+                        offset += sent
+                        remaining -= sent
+                except OSError as exc:
+                    # a socket sendfile can't write to (e.g. TLS): fall back, unless the client went away
+                    if offset != start or isinstance(exc, ConnectionError):
+                        raise
+            if remaining <= 0:
                 return
-            self.end_headers()
-            with open(file_path, 'rb') as f:
-                self.wfile.write(f.read())
-        else:
-            self.send_response(404)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            self.wfile.write(b'404 File Not Found')
+            f.seek(offset)
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def send_stats(self, head):
+        cache = getattr(self.server, 'file_cache', None)
+        body = json.dumps({'file_cache': cache.stats() if cache else None}, indent=1).encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not getattr(self.server, 'quiet', False):
+            super().log_message(format, *args)
+
+
+def precompress(root, min_size=512):
+    """Write ``.gz`` (and ``.br`` if brotli is installed) next to text files below ``root``.
+
+    Variants that are up to date, or wouldn't save anything, are skipped.
+    Returns the number of files written.
+    """
+    compressors = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        compressors.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if not name.lower().endswith(COMPRESSIBLE):
+                continue
+            source = os.path.join(dirpath, name)
+            if os.path.getsize(source) < min_size:
+                continue
+            with open(source, 'rb') as f:
+                data = f.read()
+            for suffix, compress in compressors:
+                target = source + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                    continue
+                packed = compress(data)
+                if len(packed) < len(data):
+                    with open(target, 'wb') as out:
+                        out.write(packed)
+                    written += 1
+    return written
+
+
+def make_server(address=('', 8080), root=None, quiet=False, cache_bytes=DEFAULT_CACHE_BYTES):
+    """A ready-to-run server; ``cache_bytes=0`` turns the file cache off."""
+    handler = RedirectHandler
+    if root is not None:
+        handler = type('RedirectHandler', (RedirectHandler,), {'root': root})
+    httpd = ThreadingHTTPServer(address, handler)
+    httpd.quiet = quiet
+    httpd.file_cache = FileCache(cache_bytes) if cache_bytes else None
+    return httpd
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the portfolio pages.')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--root', default=os.getcwd(), help='Directory to serve (default: current directory)')
+    parser.add_argument('--precompress', action='store_true',
+                        help='Write .gz/.br variants of text files under the portfolio folder first')
+    parser.add_argument('--cache-mb', type=float, default=DEFAULT_CACHE_BYTES / 1024 / 1024,
+                        help='Memory ceiling for cached files in MiB (0 disables the cache)')
+    parser.add_argument('--quiet', action='store_true', help='Do not log each request')
+    args = parser.parse_args()
+
+    if args.precompress:
+        print(f"Precompressed {precompress(os.path.join(args.root, 'portfolio'))} files")
+    httpd = make_server(('', args.port), args.root, args.quiet, int(args.cache_mb * 1024 * 1024))
+    print(f"Serving on port {args.port}...")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
 
 if __name__ == '__main__':
-    server_address = ('', 8080)
-    httpd = HTTPServer(server_address, RedirectHandler)
-    print("Serving on port 8080...")
-    httpd.serve_forever()
\ No newline at end of file
+    main()
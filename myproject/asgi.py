@@ -3,6 +3,20 @@ ASGI config for myproject project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Under ASGI the home and calendar pages are served by their async views
+(``DJANGO_ROOT_URLCONF`` defaults to ``myproject.asgi_urls`` here), e.g.::
+
+    uvicorn myproject.asgi:application --workers 4
+
+The sync views remain the default under WSGI (``runserver``, gunicorn's sync
+workers). To compare the two, run the same load against each server::
+
+    manage.py loadtest --url http://127.0.0.1:8000 --users 40 --think 0.05 --journeys calendar:1,browse:1
+
+On one core the async views beat the sync ones under uvicorn, but a threaded
+WSGI server was faster than either. Set ``DJANGO_ROOT_URLCONF=myproject.urls``
+to serve the sync views under ASGI as well.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +26,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+os.environ.setdefault('DJANGO_ROOT_URLCONF', 'myproject.asgi_urls')
 
 application = get_asgi_application()
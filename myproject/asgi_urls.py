@@ -0,0 +1,27 @@
+"""URLs for the ASGI entry point (asgi.py).
+
+The same routes as urls.py, except that the home and calendar pages are
+served by their async views (``home_view_async``, ``calendar_view_async``).
+WSGI servers keep the sync views.
+"""
+from django.urls import include, path
+
+from supply_chain import urls as app_urls, views
+
+from . import urls
+
+ASYNC_VIEWS = {
+    'design-home': views.home_view_async,
+    'calendar': views.calendar_view_async,
+}
+
+app_urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name) if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in app_urls.urlpatterns
+]
+
+urlpatterns = [
+    path(str(entry.pattern), include(app_urlpatterns))
+    if getattr(entry, 'urlconf_name', None) is app_urls else entry
+    for entry in urls.urlpatterns
+]
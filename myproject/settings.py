@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # outermost app middleware, so its timings cover sessions, auth and the view
+    'supply_chain.instrumentation.InstrumentationMiddleware',
+    'supply_chain.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,11 +56,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'myproject.urls'
+# asgi.py switches to myproject.asgi_urls, which serves the async home/calendar views
+ROOT_URLCONF = os.environ.get('DJANGO_ROOT_URLCONF', 'myproject.urls')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also times renders for /__metrics__/ (see supply_chain/instrumentation.py)
+        'BACKEND': 'supply_chain.instrumentation.InstrumentedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -71,18 +78,125 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'myproject.wsgi.application'
+ASGI_APPLICATION = 'myproject.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# DJANGO_DB_ENGINE selects SQLite (default) or PostgreSQL (needs psycopg).
+# DJANGO_DB_NAME is the SQLite file or the PostgreSQL database name;
+# PostgreSQL also reads DJANGO_DB_USER, DJANGO_DB_PASSWORD, DJANGO_DB_HOST and
+# DJANGO_DB_PORT. Connections stay open for DJANGO_DB_CONN_MAX_AGE seconds
+# (0 closes them after every request) and are health-checked before reuse.
+# ASGI requests never reuse persistent connections, so ASGI deployments on
+# PostgreSQL should set DJANGO_DB_POOL=1 (psycopg's pool, needs psycopg[pool])
+# instead.
+#
+# Every SQLite connection runs in WAL mode, so readers are not locked out while
+# a write (an admin edit, import_data) is in progress. synchronous=NORMAL is
+# safe under WAL; mmap and a larger page cache (DJANGO_SQLITE_MMAP_SIZE and
+# DJANGO_SQLITE_CACHE_KB) cut read syscalls. Writers wait up to
+# DJANGO_SQLITE_TIMEOUT seconds for each other, and start transactions
+# IMMEDIATE so that two writers never deadlock upgrading a read lock.
+
+DATABASE_ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgres': 'django.db.backends.postgresql',
+}
+_db_engine = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+_db_pool = os.environ.get('DJANGO_DB_POOL', '0') == '1'
+
+_sqlite_timeout = float(os.environ.get('DJANGO_SQLITE_TIMEOUT', 20))
+_sqlite_read_pragmas = (
+    f'PRAGMA mmap_size={int(os.environ.get("DJANGO_SQLITE_MMAP_SIZE", 256 * 1024 * 1024))};'
+    f'PRAGMA cache_size=-{int(os.environ.get("DJANGO_SQLITE_CACHE_KB", 64 * 1024))};'
+    'PRAGMA temp_store=MEMORY;'
+)
+
+if _db_engine == 'sqlite':
+    _db_options = {
+        'timeout': _sqlite_timeout,
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': 'PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;' + _sqlite_read_pragmas,
+    }
+else:
+    _db_options = {'pool': True} if _db_pool else {}
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': DATABASE_ENGINES[_db_engine],
+        'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3' if _db_engine == 'sqlite' else 'supply_chain'),
+        'USER': os.environ.get('DJANGO_DB_USER', ''),
+        'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+        'HOST': os.environ.get('DJANGO_DB_HOST', ''),
+        'PORT': os.environ.get('DJANGO_DB_PORT', ''),
+        # pooled connections cannot also be persistent
+        'CONN_MAX_AGE': 0 if _db_pool else int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': _db_options,
+    }
+}
+
+# Read replicas (see supply_chain/replicas.py). DJANGO_DB_REPLICAS is a
+# comma-separated list of SQLite files copied from the primary (e.g. with
+# sqlite3 db.sqlite3 ".backup replica.sqlite3"), or of PostgreSQL host[:port]
+# addresses, which become the aliases replica1, replica2, ... GET requests
+# read from them unless one lags more than DJANGO_DB_REPLICA_MAX_LAG seconds;
+# a browser that has just written reads from the primary for
+# DJANGO_DB_REPLICA_PIN_SECONDS. SQLite replicas are opened query_only.
+
+SUPPLY_CHAIN_READ_REPLICAS = []
+for _number, _replica in enumerate(filter(None, os.environ.get('DJANGO_DB_REPLICAS', '').split(',')), 1):
+    _alias = f'replica{_number}'
+    DATABASES[_alias] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if _db_engine == 'sqlite':
+        DATABASES[_alias]['NAME'] = _replica.strip()
+        DATABASES[_alias]['OPTIONS'] = {
+            'timeout': _sqlite_timeout,
+            'init_command': 'PRAGMA query_only=ON;' + _sqlite_read_pragmas,
+        }
+    else:
+        _host, _, _port = _replica.strip().partition(':')
+        DATABASES[_alias].update(HOST=_host, PORT=_port)
+    SUPPLY_CHAIN_READ_REPLICAS.append(_alias)
+
+SUPPLY_CHAIN_REPLICA_MAX_LAG = float(os.environ.get('DJANGO_DB_REPLICA_MAX_LAG', 2))
+SUPPLY_CHAIN_REPLICA_PIN_SECONDS = int(os.environ.get('DJANGO_DB_REPLICA_PIN_SECONDS', 10))
+DATABASE_ROUTERS = ['supply_chain.replicas.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# DJANGO_CACHE_BACKEND selects local memory (default), a file-based cache
+# (DJANGO_CACHE_LOCATION is the directory) or Redis (DJANGO_CACHE_LOCATION is
+# the redis:// URL; needs the redis package).
+
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'supply-chain'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+_cache_backend, _cache_location = CACHE_BACKENDS[os.environ.get('DJANGO_CACHE_BACKEND', 'locmem')]
+
+CACHES = {
+    'default': {
+        'BACKEND': _cache_backend,
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', _cache_location),
+        'TIMEOUT': 300,
     }
 }
 
+# seconds a cached page or fragment may be served; model changes invalidate sooner
+SUPPLY_CHAIN_CACHE_TIMEOUT = int(os.environ.get('SUPPLY_CHAIN_CACHE_TIMEOUT', 300))
+
+# requests slower than this are logged by supply_chain.instrumentation
+SUPPLY_CHAIN_SLOW_REQUEST_MS = int(os.environ.get('SUPPLY_CHAIN_SLOW_REQUEST_MS', 500))
+# add a Server-Timing header (query count, DB and template time) to responses
+SUPPLY_CHAIN_SERVER_TIMING = DEBUG
+# bearer token that lets a scraper (e.g. Prometheus) read /__metrics__/ without a staff login;
+# unset, only staff can read it
+SUPPLY_CHAIN_METRICS_TOKEN = os.environ.get('SUPPLY_CHAIN_METRICS_TOKEN', '')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,148 @@
+"""Pagination helpers for the large listings.
+
+``CachedCountPaginator`` is a drop-in ``Paginator`` that memoises the (filtered)
+``COUNT(*)`` in the cache for a short while. ``KeysetPaginator`` walks a
+queryset by ``(created_at, id)`` using opaque cursor tokens, so every page
+costs the same no matter how deep it is and no count is needed at all.
+"""
+import base64
+import binascii
+import hashlib
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import models
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .caching import model_version
+
+COUNT_CACHE_TIMEOUT = 60
+
+
+def _query_models(query):
+    """Labels of the models whose tables ``query`` reads: its own and every joined one."""
+    tables = {alias.table_name for alias in query.alias_map.values()}
+    return sorted(model._meta.label_lower for model in apps.get_models() if model._meta.db_table in tables)
+
+
+def cached_count(queryset, timeout=COUNT_CACHE_TIMEOUT):
+    """``queryset.count()``, cached per distinct SQL statement.
+
+    Keyed on the cache versions of every model the query reads too (e.g.
+    the financial summaries behind ``?min_utilisation=``), so a change to
+    any of them refreshes the count straight away.
+    """
+    sql, params = queryset.query.sql_with_params()
+    version = model_version(*_query_models(queryset.query))
+    key = f'paginator-count:{version}:' + hashlib.sha1(f'{sql}|{params!r}'.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, models.QuerySet):
+            return cached_count(self.object_list)
+        return super().count
+
+
+def encode_cursor(created_at, pk, direction='n'):
+    raw = f'{direction}|{created_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return ``(direction, created_at, pk)`` or None for a malformed token."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, created_at, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        return None
+    if direction not in ('n', 'p') or created_at is None:
+        return None
+    return direction, created_at, pk
+
+
+class KeysetPage:
+    """The subset of Django's ``Page`` API the templates use, plus cursors."""
+
+    def __init__(self, object_list, has_next, has_previous, count=None):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(last.created_at, last.pk, 'n')
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        first = self.object_list[0]
+        return encode_cursor(first.created_at, first.pk, 'p')
+
+
+class KeysetPaginator:
+    """Newest-first pagination on ``(created_at, id)``.
+
+    Each page is one indexed range scan of ``per_page + 1`` rows; the extra
+    row only tells us whether there is another page in that direction.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def page(self, cursor=None, with_count=False):
+        decoded = decode_cursor(cursor) if cursor else None
+        qs = self.queryset
+        if decoded is None:
+            rows = list(qs.order_by('-created_at', '-pk')[:self.per_page + 1])
+            has_next, has_previous = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        else:
+            direction, created_at, pk = decoded
+            if direction == 'n':
+                rows = list(
+                    qs.filter(models.Q(created_at__lt=created_at) | models.Q(created_at=created_at, pk__lt=pk))
+                    .order_by('-created_at', '-pk')[:self.per_page + 1]
+                )
+                has_next, has_previous = len(rows) > self.per_page, True
+                rows = rows[:self.per_page]
+            else:
+                rows = list(
+                    qs.filter(models.Q(created_at__gt=created_at) | models.Q(created_at=created_at, pk__gt=pk))
+                    .order_by('created_at', 'pk')[:self.per_page + 1]
+                )
+                has_next, has_previous = True, len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+        count = cached_count(qs) if with_count else None
+        return KeysetPage(rows, has_next, has_previous, count=count)
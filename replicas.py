@@ -0,0 +1,198 @@
+"""Read replicas for GET traffic.
+
+``DJANGO_DB_REPLICAS`` (see settings.py) adds read-only copies of the
+primary database as ``replica1``, ``replica2``, ... and lists them in
+``SUPPLY_CHAIN_READ_REPLICAS``. ``ReplicaMiddleware`` picks one of them for
+each GET or HEAD request (list and detail pages, the API, exports), and
+``ReplicaRouter`` sends that request's reads of this app's models to it.
+Everything else uses the primary: writes, any request with an unsafe
+method, other apps' models (sessions, auth), management commands.
+
+Read-your-writes: a POST, PUT, PATCH or DELETE sets a short-lived cookie
+(``SUPPLY_CHAIN_REPLICA_PIN_SECONDS``) that keeps that browser on the
+primary, so the page it is redirected to shows its own change.
+
+A replica more than ``SUPPLY_CHAIN_REPLICA_MAX_LAG`` seconds behind the
+primary, or one that cannot be reached, is skipped until the next check
+(every ``LAG_CHECK_SECONDS``); with none left, reads go to the primary.
+PostgreSQL replicas report their replay delay; for a file-copied SQLite
+replica (``sqlite3 db.sqlite3 ".backup replica.sqlite3"``) the lag is how
+much newer the primary's files are than the copy.
+Note that a page cached from a replica within the allowed lag stays cached
+until its models change again or it times out.
+"""
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+LAG_CHECK_SECONDS = 5
+SAFE_METHODS = ('GET', 'HEAD')
+
+_replica = contextvars.ContextVar('supply_chain_read_replica', default=None)
+_lag_lock = threading.Lock()
+_lag_checked = {}  # alias -> (monotonic time of the check, lag in seconds or None when unreachable)
+
+
+def read_replicas():
+    return getattr(settings, 'SUPPLY_CHAIN_READ_REPLICAS', [])
+
+
+def max_lag():
+    return getattr(settings, 'SUPPLY_CHAIN_REPLICA_MAX_LAG', 2.0)
+
+
+def pin_seconds():
+    return getattr(settings, 'SUPPLY_CHAIN_REPLICA_PIN_SECONDS', 10)
+
+
+def pin_cookie():
+    return getattr(settings, 'SUPPLY_CHAIN_REPLICA_PIN_COOKIE', 'read_primary')
+
+
+def file_lag(primary_path, replica_path):
+    """Seconds by which ``primary_path`` (or its WAL) was written after its copy ``replica_path`` (0 if not).
+
+    Replica connections are ``query_only``, so the copy's modification time
+    stays the time it was made. An empty WAL is only a sign that the primary
+    was opened.
+    """
+    written = os.stat(primary_path).st_mtime
+    wal = f'{primary_path}-wal'
+    if os.path.exists(wal) and os.stat(wal).st_size:
+        written = max(written, os.stat(wal).st_mtime)
+    return max(0.0, written - os.stat(replica_path).st_mtime)
+
+
+def replica_lag(alias):
+    """How far ``alias`` is behind the primary in seconds; raises ``DatabaseError``/``OSError`` if unreachable."""
+    connection = connections[alias]
+    if connection.vendor == 'sqlite':
+        return file_lag(connections[DEFAULT_DB_ALIAS].settings_dict['NAME'], connection.settings_dict['NAME'])
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            # an idle primary sends nothing to replay, so a caught-up replica counts as 0
+            cursor.execute(
+                'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+            )
+            lag = cursor.fetchone()[0]
+        return float(lag or 0)
+    return 0.0
+
+
+def _checked_lag(alias):
+    now = time.monotonic()
+    checked = _lag_checked.get(alias)
+    if checked is None or now - checked[0] >= LAG_CHECK_SECONDS:
+        with _lag_lock:
+            checked = _lag_checked.get(alias)
+            if checked is None or now - checked[0] >= LAG_CHECK_SECONDS:
+                try:
+                    lag = replica_lag(alias)
+                except (DatabaseError, OSError) as exc:
+                    logger.warning('Read replica %s is unavailable: %s', alias, exc)
+                    lag = None
+                checked = _lag_checked[alias] = (now, lag)
+    return checked[1]
+
+
+def healthy_replicas():
+    """The replicas close enough to the primary to read from."""
+    limit = max_lag()
+    healthy = []
+    for alias in read_replicas():
+        lag = _checked_lag(alias)
+        if lag is not None and lag <= limit:
+            healthy.append(alias)
+    return healthy
+
+
+def reset_lag_checks():
+    with _lag_lock:
+        _lag_checked.clear()
+
+
+class ReplicaRouter:
+    """Route this app's reads to the replica chosen for the current request."""
+
+    app_label = 'supply_chain'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == self.app_label:
+            return _replica.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas are copies of the primary, never migrated themselves
+        return db not in read_replicas()
+
+
+def _stream_from(alias, chunks):
+    """Keep ``alias`` for a streaming body, which is read after the middleware has returned."""
+    token = _replica.set(alias)
+    try:
+        yield from chunks
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def choose(self, request):
+        """The replica for ``request``, or None to read from the primary."""
+        if request.method not in SAFE_METHODS or pin_cookie() in request.COOKIES:
+            return None
+        healthy = healthy_replicas()
+        return random.choice(healthy) if healthy else None
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        alias = self.choose(request)
+        token = _replica.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.finish(request, response, alias)
+
+    async def __acall__(self, request):
+        # a due lag check may query a replica
+        alias = await sync_to_async(self.choose)(request) if read_replicas() else None
+        token = _replica.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.finish(request, response, alias)
+
+    def finish(self, request, response, alias):
+        if request.method not in SAFE_METHODS and read_replicas():
+            response.set_cookie(pin_cookie(), '1', max_age=pin_seconds(), httponly=True, samesite='Lax')
+        if alias and response.streaming and not response.is_async:
+            response.streaming_content = _stream_from(alias, response.streaming_content)
+        return response
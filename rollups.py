@@ -0,0 +1,121 @@
+"""Council-level rollups: the materialized data behind the council dashboard.
+
+``CouncilRollup`` holds one row of totals per council and
+``CouncilCategoryRollup`` one row per (council, category), so the dashboard
+reads a handful of small tables whatever the number of projects and supplier
+links. Aggregating a council is a few ``GROUP BY`` queries over its projects
+and links, too slow to repeat on every save, so the signal handlers in
+``signals.py`` only flag the affected councils as ``stale`` and
+``manage.py refresh_council_rollups`` (run from cron or with ``--every``)
+recomputes the flagged rows.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+BATCH_SIZE = 100
+TOTAL_FIELDS = (
+    'project_count', 'total_budget', 'committed_total', 'supplier_count',
+    'top_supplier', 'top_supplier_share', 'supplier_hhi', 'refreshed_at',
+)
+
+
+def mark_stale(council_ids=None):
+    """Flag the rollups of ``council_ids`` (default: all) for the next refresh."""
+    from .models import CouncilRollup
+
+    rows = CouncilRollup.objects.filter(stale=False)
+    if council_ids is not None:
+        rows = rows.filter(council_id__in=[pk for pk in council_ids if pk is not None])
+    rows.update(stale=True)
+
+
+def mark_project_stale(project_id):
+    """Flag the rollup of the council that owns ``project_id``."""
+    from .models import CouncilRollup
+
+    CouncilRollup.objects.filter(council__project__pk=project_id, stale=False).update(stale=True)
+
+
+def ensure_rollups():
+    """Create (stale) rollup rows for councils that have none yet."""
+    from .models import Council, CouncilRollup
+
+    missing = Council.objects.filter(rollup__isnull=True).values_list('pk', flat=True)
+    CouncilRollup.objects.bulk_create([CouncilRollup(council_id=pk) for pk in missing], ignore_conflicts=True)
+
+
+def _concentration(values):
+    """``(top_supplier_id, top_share, hhi)`` from ``{supplier_id: contract value}``."""
+    total = sum(values.values())
+    if not total:
+        return None, None, None
+    top = max(values, key=lambda pk: (values[pk], -pk))
+    shares = [float(value / total) for value in values.values()]
+    return top, float(values[top] / total), sum(share * share for share in shares)
+
+
+def compute_rollups(council_ids):
+    """Unsaved ``(rollups, category_rollups)`` for ``council_ids``, straight from projects and links."""
+    from .models import CouncilCategoryRollup, CouncilRollup, Project, ProjectSupplier
+
+    now = timezone.now()
+    rollups = {pk: CouncilRollup(council_id=pk, refreshed_at=now, stale=False) for pk in council_ids}
+    projects = Project.objects.filter(council_id__in=council_ids)
+
+    for row in projects.values('council').annotate(n=Count('pk'), budget=Sum('budget')).order_by():
+        rollups[row['council']].project_count = row['n']
+        rollups[row['council']].total_budget = row['budget'] or 0
+
+    category_rollups = [
+        CouncilCategoryRollup(
+            council_id=row['council'], category_id=row['category'],
+            project_count=row['n'], total_budget=row['budget'] or 0,
+        )
+        for row in projects.values('council', 'category').annotate(n=Count('pk'), budget=Sum('budget')).order_by()
+    ]
+
+    values = {pk: {} for pk in council_ids}
+    links = (
+        ProjectSupplier.objects.filter(project__council_id__in=council_ids)
+        .values('project__council', 'supplier').annotate(value=Sum('contract_value')).order_by()
+    )
+    for row in links:
+        values[row['project__council']][row['supplier']] = row['value'] or Decimal('0')
+    for pk, supplier_values in values.items():
+        rollup = rollups[pk]
+        rollup.supplier_count = len(supplier_values)
+        rollup.committed_total = sum(supplier_values.values(), Decimal('0')).quantize(Decimal('0.01'))
+        rollup.top_supplier_id, rollup.top_supplier_share, rollup.supplier_hhi = _concentration(supplier_values)
+
+    return list(rollups.values()), category_rollups
+
+
+def refresh_rollups(council_ids=None, stale_only=True, batch_size=BATCH_SIZE):
+    """Recompute rollups for ``council_ids``; by default the stale ones, or all with ``stale_only=False``.
+
+    Returns the number of councils refreshed.
+    """
+    from .models import Council, CouncilCategoryRollup, CouncilRollup
+
+    ensure_rollups()
+    if council_ids is None:
+        rows = CouncilRollup.objects.filter(stale=True) if stale_only else CouncilRollup.objects.all()
+        council_ids = rows.values_list('council_id', flat=True)
+    council_ids = sorted(Council.objects.filter(pk__in=list(council_ids)).values_list('pk', flat=True))
+
+    for start in range(0, len(council_ids), batch_size):
+        ids = council_ids[start:start + batch_size]
+        with transaction.atomic():
+            # clear the flag before reading, so a change made while we aggregate flags
+            # the row again; in the same transaction, so a failed refresh keeps it set
+            CouncilRollup.objects.filter(council_id__in=ids).update(stale=False)
+            rollups, category_rollups = compute_rollups(ids)
+            CouncilRollup.objects.bulk_create(
+                rollups, update_conflicts=True, unique_fields=['council'], update_fields=TOTAL_FIELDS,
+            )
+            CouncilCategoryRollup.objects.filter(council_id__in=ids).delete()
+            CouncilCategoryRollup.objects.bulk_create(category_rollups, batch_size=1000)
+    return len(council_ids)
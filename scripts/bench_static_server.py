@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for my_test_web_server.py.
+
+Starts the previous single-threaded, read-whole-file server ("before") and the
+current threaded server without and with its in-memory file cache on free
+local ports, hammers each with the same mix of portfolio files from concurrent
+keep-alive clients, and prints requests/sec and throughput for each. Pass --url to benchmark an
+already running server instead.
+
+Run from the repo root:
+  python3 scripts/bench_static_server.py [--clients 16] [--duration 5]
+
+This script uses only the standard library.
+"""
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import quote, unquote, urlparse
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from my_test_web_server import CONTENT_TYPES, make_server  # noqa: E402
+
+
+class LegacyHandler(BaseHTTPRequestHandler):
+    """The server as it was: HTTP/1.0, one request at a time, whole file in memory."""
+    root = BASE_DIR
+
+    def do_GET(self):
+        file_path = os.path.join(self.root, unquote(self.path.split('?', 1)[0]).lstrip('/'))
+        content_type = CONTENT_TYPES.get(os.path.splitext(file_path)[1].lower())
+        if content_type and os.path.isfile(file_path):
+            self.send_response(200)
+            self.send_header('Content-type', content_type)
+            self.end_headers()
+            with open(file_path, 'rb') as f:
+                self.wfile.write(f.read())
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def portfolio_paths(root):
+    paths = []
+    for dirpath, _, filenames in os.walk(os.path.join(root, 'portfolio')):
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in CONTENT_TYPES:
+                rel = os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, '/')
+                paths.append('/' + quote(rel))
+    return sorted(paths)
+
+
+def run_load(host, port, paths, clients, duration):
+    """Request ``paths`` round-robin from ``clients`` threads for ``duration`` seconds."""
+    stats = {'requests': 0, 'bytes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        conn = http.client.HTTPConnection(host, port, timeout=10)
+        done = received = errors = 0
+        i = offset
+        while time.perf_counter() < deadline:
+            try:
+                conn.request('GET', paths[i % len(paths)])
+                response = conn.getresponse()
+                body = response.read()
+                if response.status != 200:
+                    errors += 1
+                if response.will_close:
+                    conn.close()
+                done += 1
+                received += len(body)
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+            i += 1
+        conn.close()
+        with lock:
+            stats['requests'] += done
+            stats['bytes'] += received
+            stats['errors'] += errors
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats['elapsed'] = time.perf_counter() - started
+    return stats
+
+
+def report(label, stats):
+    elapsed = stats['elapsed'] or 1e-9
+    print(f"{label:>9}: {stats['requests'] / elapsed:8.0f} req/s  "
+          f"{stats['bytes'] / elapsed / 1024 / 1024:7.1f} MiB/s  "
+          f"{stats['requests']} requests, {stats['errors']} errors in {elapsed:.1f}s")
+    return stats['requests'] / elapsed
+
+
+def bench_local(server, label, paths, args):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address[:2]
+        return report(label, run_load(host, port, paths, args.clients, args.duration))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=5, help='Seconds per server')
+    parser.add_argument('--url', help='Benchmark this running server (e.g. http://localhost:8080) only')
+    args = parser.parse_args()
+
+    paths = portfolio_paths(BASE_DIR)
+    print(f"{len(paths)} files, {args.clients} clients, {args.duration:g}s per run")
+    if args.url:
+        url = urlparse(args.url)
+        report('server', run_load(url.hostname, url.port or 80, paths, args.clients, args.duration))
+        return
+
+    before = bench_local(HTTPServer(('127.0.0.1', 0), LegacyHandler), 'before', paths, args)
+    uncached = bench_local(make_server(('127.0.0.1', 0), BASE_DIR, quiet=True, cache_bytes=0), 'no cache', paths, args)
+    after = bench_local(make_server(('127.0.0.1', 0), BASE_DIR, quiet=True), 'after', paths, args)
+    print(f"Speed-up: {uncached / before:.1f}x without the file cache, {after / before:.1f}x with it")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,20 @@
 #!/usr/bin/env python3
 """
-Download external project images into the app's static folder and update
+Mirror external project images into the app's static folder and update
 Project.main_image to point to the local static path.
 
+Images are stored once per distinct content (named by their SHA-256), shared
+URLs are fetched once, unchanged sources are skipped via ETag/Last-Modified,
+and downloads run concurrently. See supply_chain/image_mirror.py.
+
 Run from the repo root (where `manage.py` is):
-  python3 scripts/download_project_images.py
+  python3 scripts/download_project_images.py [--concurrency 8]
 
 This script uses only the standard library.
 """
+import argparse
 import os
 import sys
-import urllib.request
-from urllib.parse import urlparse
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
@@ -20,59 +23,29 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
 import django
 django.setup()
 
-from supply_chain.models import Project
-
-
-STATIC_DIR = os.path.join(BASE_DIR, 'supply_chain', 'static', 'img', 'projects')
-os.makedirs(STATIC_DIR, exist_ok=True)
+from supply_chain.fetching import Fetcher
+from supply_chain.image_mirror import mirror_project_images
 
 
-def download(url, dest_path):
-    try:
-        urllib.request.urlretrieve(url, dest_path)
-        return True
-    except Exception as e:
-        print(f"Failed to download {url}: {e}")
-        return False
+STATIC_DIR = os.path.join(BASE_DIR, 'supply_chain', 'static', 'img', 'projects', 'mirror')
+STATIC_URL_PREFIX = '/static/img/projects/mirror/'
 
 
 def main():
-    projects = Project.objects.all().order_by('pk')
-    if not projects:
-        print('No projects found.')
-        return
-
-    updated = 0
-    for project in projects:
-        src = project.main_image or project.image
-        if not src:
-            print(f"Project {project.pk} has no image source; skipping")
-            continue
-
-        # Skip if already a local static path
-        if isinstance(src, str) and src.startswith('/static/'):
-            print(f"Project {project.pk} image already local: {src}")
-            continue
-
-        parsed = urlparse(src)
-        if not parsed.scheme.startswith('http'):
-            print(f"Project {project.pk} image not downloadable: {src}")
-            continue
-
-        # Determine extension (simple fallback)
-        _, ext = os.path.splitext(parsed.path)
-        if ext.lower() not in ('.jpg', '.jpeg', '.png', '.gif', '.webp'):
-            ext = '.jpg'
-
-        filename = f'project_{project.pk}{ext}'
-        dest_path = os.path.join(STATIC_DIR, filename)
-        print(f"Downloading {src} -> {dest_path}")
-        ok = download(src, dest_path)
-        if ok:
-            project.main_image = f'/static/img/projects/{filename}'
-            project.save(update_fields=['main_image'])
-            updated += 1
-
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=8, help='Parallel downloads')
+    parser.add_argument('--per-host', type=int, default=4, help='Parallel downloads from any one host')
+    parser.add_argument('--timeout', type=float, default=15, help='Seconds before a request is abandoned')
+    parser.add_argument('--retries', type=int, default=3, help='Retries for transient failures')
+    args = parser.parse_args()
+
+    fetcher = Fetcher(concurrency=args.concurrency, per_host=args.per_host, timeout=args.timeout, retries=args.retries)
+    updated, summary = mirror_project_images(STATIC_DIR, STATIC_URL_PREFIX, fetcher=fetcher)
+
+    for result in summary.failed:
+        print(f"Failed to download {result.url}: {result.error}")
+    print(f"Fetched {len(summary.results)} distinct URLs: {summary.downloaded} downloaded, "
+          f"{summary.not_modified} unchanged, {summary.files} distinct files. {summary}")
     print(f"Done. {updated} projects updated with local images.")
 
 
@@ -0,0 +1,210 @@
+"""Full-text search over Project text fields.
+
+On SQLite the index is an FTS5 virtual table keyed by the project id; on
+PostgreSQL it is a side table holding a weighted ``tsvector`` with a GIN index.
+Both are kept in sync by the signal handlers in ``signals.py`` and can be
+rebuilt with ``manage.py rebuild_search_index``. When neither is available
+(other backends, SQLite built without FTS5, migration not applied yet) the
+search falls back to the original ``icontains`` scan.
+"""
+import re
+
+from django.db import connection as default_connection
+from django.db import connections
+from django.db import models
+
+FTS_TABLE = 'supply_chain_project_fts'
+PG_TABLE = 'supply_chain_project_search'
+
+# bm25() weights for the FTS5 columns: title, description, location, category
+FTS_WEIGHTS = (10.0, 1.0, 2.0, 4.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# per-alias cache of "is the index table present?" so we only introspect once
+_available = {}
+
+
+def _table_for(connection):
+    if connection.vendor == 'sqlite':
+        return FTS_TABLE
+    if connection.vendor == 'postgresql':
+        return PG_TABLE
+    return None
+
+
+def index_available(connection=None):
+    """Return True when the search index table exists for this connection."""
+    connection = connection or default_connection
+    table = _table_for(connection)
+    if table is None:
+        return False
+    if connection.alias not in _available:
+        with connection.cursor() as cursor:
+            tables = connection.introspection.table_names(cursor)
+        _available[connection.alias] = table in tables
+    return _available[connection.alias]
+
+
+def tokenize(q):
+    """Split a free-text query into plain word tokens (no query syntax)."""
+    return _TOKEN_RE.findall((q or '').lower())
+
+
+def _fts_match_expression(tokens):
+    # every token must match, and the last one may be a partial word typed so far
+    return ' '.join(f'"{t}"*' for t in tokens)
+
+
+def _pg_tsquery(tokens):
+    return ' & '.join(f'{t}:*' for t in tokens)
+
+
+def _document_sql(where=''):
+    """SELECT yielding (id, title, description, location, category) rows."""
+    return (
+        'SELECT p.id, p.title, p.description, p.location, COALESCE(c.name, \'\') '
+        'FROM supply_chain_project p '
+        'LEFT JOIN supply_chain_category c ON c.id = p.category_id'
+        + where
+    )
+
+
+def create_index(connection=None):
+    """Create the backend-specific index table and populate it."""
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                    'title, description, location, category, '
+                    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                )
+            except Exception:
+                # SQLite compiled without FTS5: keep using the fallback search.
+                return False
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {PG_TABLE} ('
+                'project_id bigint PRIMARY KEY REFERENCES supply_chain_project(id) ON DELETE CASCADE, '
+                'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_gin ON {PG_TABLE} USING GIN (document)'
+            )
+        else:
+            return False
+    _available.pop(connection.alias, None)
+    rebuild_index(connection=connection)
+    return True
+
+
+def drop_index(connection=None):
+    connection = connection or default_connection
+    table = _table_for(connection)
+    if table is not None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+    _available.pop(connection.alias, None)
+
+
+def _write_documents(cursor, connection, where='', params=()):
+    if connection.vendor == 'sqlite':
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, title, description, location, category) '
+            + _document_sql(where),
+            params,
+        )
+    else:
+        cursor.execute(
+            f'INSERT INTO {PG_TABLE}(project_id, document) '
+            'SELECT d.id, '
+            "setweight(to_tsvector('english', COALESCE(d.title, '')), 'A') || "
+            "setweight(to_tsvector('english', d.category), 'B') || "
+            "setweight(to_tsvector('english', COALESCE(d.location, '')), 'B') || "
+            "setweight(to_tsvector('english', COALESCE(d.description, '')), 'C') "
+            f'FROM ({_document_sql(where)}) AS d(id, title, description, location, category) '
+            'ON CONFLICT (project_id) DO UPDATE SET document = EXCLUDED.document',
+            params,
+        )
+
+
+def rebuild_index(connection=None):
+    """Re-index every project from scratch."""
+    connection = connection or default_connection
+    if not index_available(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {_table_for(connection)}')
+        _write_documents(cursor, connection)
+    return True
+
+
+def index_projects(project_ids, connection=None):
+    """(Re-)index the given projects, e.g. after a save or a category rename."""
+    connection = connection or default_connection
+    project_ids = list(project_ids)
+    if not project_ids or not index_available(connection):
+        return
+    placeholders = ', '.join(['%s'] * len(project_ids))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # FTS5 has no upsert, so replace the rows
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', project_ids)
+        _write_documents(cursor, connection, f' WHERE p.id IN ({placeholders})', project_ids)
+
+
+def remove_projects(project_ids, connection=None):
+    connection = connection or default_connection
+    project_ids = list(project_ids)
+    if not project_ids or not index_available(connection):
+        return
+    placeholders = ', '.join(['%s'] * len(project_ids))
+    column = 'rowid' if connection.vendor == 'sqlite' else 'project_id'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {_table_for(connection)} WHERE {column} IN ({placeholders})', project_ids
+        )
+
+
+def fallback_search(qs, q):
+    """The original four-way icontains scan."""
+    return qs.filter(
+        models.Q(title__icontains=q)
+        | models.Q(description__icontains=q)
+        | models.Q(location__icontains=q)
+        | models.Q(category__name__icontains=q)
+    )
+
+
+def search_projects(qs, q):
+    """Filter a Project queryset to matches for ``q``, best matches first.
+
+    Every word in ``q`` must match, and each word also matches as a prefix so
+    results refine as the user types. Matching rows are annotated with
+    ``search_rank``.
+    """
+    connection = connections[qs.db]  # a read replica during GET requests; see replicas.py
+    tokens = tokenize(q)
+    if not tokens or not index_available(connection):
+        return fallback_search(qs, q)
+
+    project_table = qs.model._meta.db_table
+    if connection.vendor == 'sqlite':
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        return qs.extra(
+            select={'search_rank': f'bm25({FTS_TABLE}, {weights})'},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {project_table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[_fts_match_expression(tokens)],
+        ).order_by('search_rank', '-created_at')
+
+    tsquery = _pg_tsquery(tokens)
+    return qs.extra(
+        select={'search_rank': f"ts_rank({PG_TABLE}.document, to_tsquery('english', %s))"},
+        select_params=[tsquery],
+        tables=[PG_TABLE],
+        where=[f'{PG_TABLE}.project_id = {project_table}.id', f"{PG_TABLE}.document @@ to_tsquery('english', %s)"],
+        params=[tsquery],
+    ).order_by('-search_rank', '-created_at')
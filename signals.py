@@ -0,0 +1,165 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import caching, financials, image_derivatives, rollups, search
+from .models import Category, Council, CouncilRollup, Event, Project, ProjectSupplier
+
+
+# Keep the project full-text search index in sync
+
+@receiver(post_save, sender=Project)
+def index_saved_project(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_projects([instance.pk])
+
+
+@receiver(post_delete, sender=Project)
+def unindex_deleted_project(sender, instance, **kwargs):
+    search.remove_projects([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_projects(sender, instance, created=False, raw=False, **kwargs):
+    # the category name is part of each project's search document
+    if raw or created:
+        return
+    search.index_projects(Project.objects.filter(category=instance).values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_projects(sender, instance, **kwargs):
+    # on_delete=SET_NULL updates projects without sending save signals
+    instance._search_project_ids = list(
+        Project.objects.filter(category=instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Category)
+def reindex_uncategorised_projects(sender, instance, **kwargs):
+    search.index_projects(getattr(instance, '_search_project_ids', []))
+
+
+# Keep ProjectFinancialSummary in step with budgets and supplier links
+
+@receiver(post_save, sender=Project)
+def refresh_project_summary(sender, instance, raw=False, **kwargs):
+    # new projects get an empty summary; a budget change moves remaining/utilisation
+    if raw:
+        return
+    financials.refresh_summaries([instance.pk])
+
+
+@receiver(pre_save, sender=ProjectSupplier)
+def remember_link_values(sender, instance, raw=False, **kwargs):
+    instance._summary_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._summary_previous = (
+        ProjectSupplier.objects.filter(pk=instance.pk).values_list('project_id', 'contract_value').first()
+    )
+
+
+@receiver(post_save, sender=ProjectSupplier)
+def apply_link_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_summary_previous', None)
+    if created or previous is None:
+        financials.apply_link_change(instance.project_id, instance.contract_value, 1)
+        return
+    old_project_id, old_value = previous
+    if old_project_id != instance.project_id:
+        financials.apply_link_change(old_project_id, -financials.money(old_value), -1)
+        financials.apply_link_change(instance.project_id, instance.contract_value, 1)
+    else:
+        delta = financials.money(instance.contract_value) - financials.money(old_value)
+        if delta:
+            financials.apply_link_change(instance.project_id, delta)
+
+
+@receiver(post_delete, sender=ProjectSupplier)
+def apply_link_deleted(sender, instance, origin=None, **kwargs):
+    # deleting the project cascades to its links and its summary; nothing to keep
+    if isinstance(origin, Project) or getattr(origin, 'model', None) is Project:
+        return
+    financials.apply_link_change(instance.project_id, -financials.money(instance.contract_value), -1)
+
+
+# Flag council rollups for the next refresh_council_rollups run
+
+@receiver(post_save, sender=Council)
+def create_council_rollup(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        CouncilRollup.objects.get_or_create(council=instance)
+
+
+@receiver(pre_save, sender=Project)
+def remember_project_council(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous_council = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._rollup_previous_council = (
+        Project.objects.filter(pk=instance.pk).values_list('council_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Project)
+def project_saved_mark_rollup(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    rollups.mark_stale([instance.council_id, getattr(instance, '_rollup_previous_council', None)])
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted_mark_rollup(sender, instance, **kwargs):
+    rollups.mark_stale([instance.council_id])
+
+
+@receiver(post_save, sender=ProjectSupplier)
+def link_saved_mark_rollup(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    rollups.mark_project_stale(instance.project_id)
+    previous = getattr(instance, '_summary_previous', None)
+    if previous and previous[0] != instance.project_id:
+        rollups.mark_project_stale(previous[0])
+
+
+@receiver(post_delete, sender=ProjectSupplier)
+def link_deleted_mark_rollup(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Project) or getattr(origin, 'model', None) is Project:
+        return  # project_deleted_mark_rollup covers it
+    rollups.mark_project_stale(instance.project_id)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted_mark_rollups(sender, instance, **kwargs):
+    # its projects become uncategorised in every council
+    rollups.mark_stale()
+
+
+# Invalidate cached pages and fragments that depend on a changed model
+
+def bump_cache_version(sender, **kwargs):
+    caching.bump_version(sender._meta.label_lower)
+
+
+for _label in caching.TRACKED_MODELS:
+    post_save.connect(bump_cache_version, sender=apps.get_model(_label), dispatch_uid=f'cache-{_label}-save')
+    post_delete.connect(bump_cache_version, sender=apps.get_model(_label), dispatch_uid=f'cache-{_label}-delete')
+
+
+# Resized/modern-format variants for uploaded event images
+
+@receiver(post_save, sender=Event)
+def queue_event_image_variants(sender, instance, raw=False, **kwargs):
+    # encoded on a worker thread after commit, never inside the request
+    if raw or not instance.image_file:
+        return
+    url, name = instance.image_file.url, instance.image_file.name
+    if image_derivatives.variants_for(url):
+        return
+    transaction.on_commit(lambda: image_derivatives.register_upload(url, name))
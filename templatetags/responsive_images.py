@@ -0,0 +1,53 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from supply_chain import image_derivatives
+
+register = template.Library()
+
+
+def _srcset(widths):
+    return ', '.join(f'{url} {width}w' for width, url in sorted(widths.items(), key=lambda kv: int(kv[0])))
+
+
+@register.simple_tag
+def responsive_img(src, alt='', sizes='100vw', **attrs):
+    """``<picture>`` with AVIF/WebP sources and a resized fallback ``<img>``.
+
+    Falls back to a plain lazy-loaded ``<img src>`` for remote images or
+    images without derivatives (see image_derivatives.py). Extra keyword
+    arguments become attributes of the ``<img>``, e.g. ``style="..."``.
+    """
+    attrs = {'loading': 'lazy', 'decoding': 'async', **attrs}
+    extra = format_html_join('', ' {}="{}"', attrs.items())
+    entry = image_derivatives.variants_for(src)
+    if not entry:
+        return format_html('<img src="{}" alt="{}"{}>', src, alt, extra)
+
+    fallback = entry['variants'][entry['fallback']]
+    largest = fallback[max(fallback, key=int)]
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (image_derivatives.MIME_TYPES[fmt], _srcset(widths), sizes)
+            for fmt, widths in entry['variants'].items() if fmt != entry['fallback']
+        ),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}"{}></picture>',
+        sources, largest, _srcset(fallback), sizes, entry['width'], entry['height'], alt, extra,
+    )
+
+
+@register.filter
+def image_variant(src, width):
+    """URL of the best derivative no wider than ``width`` (for CSS backgrounds); ``src`` if none."""
+    entry = image_derivatives.variants_for(src)
+    if not entry:
+        return src
+    for fmt in ('webp', entry['fallback']):
+        widths = entry['variants'].get(fmt)
+        if widths:
+            fitting = [int(w) for w in widths if int(w) <= int(width)] or [min(int(w) for w in widths)]
+            return widths[str(max(fitting))]
+    return src
@@ -1,3 +1,1251 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import gzip
+import http.client
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import Context, Template, engines
+from django.test import Client, LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from .cost_of_living import RentTable, load_rent_table
+from .fetching import Fetcher
+from . import benchmarking, caching, image_derivatives, loadtest, replicas, rollups, search, urls
+from .benchmarking import compare
+from .financials import check_summaries
+from .image_mirror import mirror_project_images
+from .importers import import_stream
+from .instrumentation import REGISTRY, InstrumentedTemplate, quantiles
+from .loadtest import PROFILES
+from .pagination import KeysetPaginator, cached_count, decode_cursor, encode_cursor
+from .my_test_web_server import FileCache, StaticFile, make_server
+from .filters import filter_date_range, prefix_search
+from .models import (
+    Category, Council, CouncilMeeting, CouncilRollup, Event, Project, ProjectFinancialSummary, ProjectSupplier,
+    Supplier,
+)
+from .views import SupplierDetailView, SupplierListView, calendar_view_async, home_view_async
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class HotQueryIndexTests(TestCase):
+    """The hot queries in views.py must be served by an index, not a table scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        council = Council.objects.create(name='Leeds', contact='A', contact_email='a@example.com', slug='leeds')
+        today = datetime.date.today()
+        Project.objects.bulk_create(
+            Project(title=f'Project {i}', description='', budget=i * 1000, council=council)
+            for i in range(50)
+        )
+        CouncilMeeting.objects.bulk_create(
+            CouncilMeeting(council=council, date=today + datetime.timedelta(days=i), archived=i % 3 == 0)
+            for i in range(50)
+        )
+        Event.objects.bulk_create(
+            Event(title=f'Event {i}', date=today + datetime.timedelta(days=i)) for i in range(50)
+        )
+
+    def assertUsesIndex(self, qs, index_name):
+        self.assertPlanUsesIndex(qs.explain(), index_name)
+
+    def assertPlanUsesIndex(self, plan, index_name):
+        self.assertIn(index_name, plan)
+        for line in plan.splitlines():
+            if 'SCAN' in line and 'INDEX' not in line:
+                self.fail(f'full table scan in plan:\n{plan}')
+
+    def test_recent_projects(self):
+        self.assertUsesIndex(Project.objects.order_by('-created_at')[:4], 'project_created_id_idx')
+
+    def test_project_keyset_page(self):
+        # explain the queries KeysetPaginator really runs for the next and previous pages
+        paginator = KeysetPaginator(Project.objects.select_related('council', 'category', 'financial_summary'), 20)
+        second = paginator.page(paginator.page().next_cursor)
+        for cursor in (second.next_cursor, second.previous_cursor):
+            with CaptureQueriesContext(connection) as queries:
+                paginator.page(cursor)
+            with connection.cursor() as db:
+                db.execute(f'EXPLAIN QUERY PLAN {queries[0]["sql"]}')
+                plan = '\n'.join(row[-1] for row in db.fetchall())
+            self.assertPlanUsesIndex(plan, 'project_created_id_idx')
+
+    def test_project_created_range(self):
+        today = datetime.date.today()
+        qs = filter_date_range(Project.objects.all(), 'created_at', today, today).order_by('-created_at')
+        self.assertUsesIndex(qs, 'project_created_id_idx')
+        self.assertEqual(qs.count(), Project.objects.count())
+        tomorrow = today + datetime.timedelta(days=1)
+        self.assertFalse(filter_date_range(Project.objects.all(), 'created_at', tomorrow, None).exists())
+
+    def test_project_end_date_range(self):
+        today = datetime.date.today()
+        qs = filter_date_range(Project.objects.all(), 'end_date', today, today + datetime.timedelta(days=30))
+        self.assertUsesIndex(qs, 'project_end_date_idx')
+
+    def test_project_budget_range(self):
+        self.assertUsesIndex(Project.objects.filter(budget__gte=10000, budget__lte=20000), 'project_budget_idx')
+
+    def test_upcoming_meetings(self):
+        qs = CouncilMeeting.objects.filter(archived=False, date__gte=datetime.date.today()).order_by('date', 'time')[:4]
+        self.assertUsesIndex(qs, 'meeting_upcoming_idx')
+
+    def test_upcoming_events(self):
+        qs = Event.objects.filter(date__gte=datetime.date.today()).order_by('date', 'time')
+        self.assertUsesIndex(qs, 'event_date_time_idx')
+
+    def test_supplier_prefix_search(self):
+        qs = prefix_search(Supplier.objects.all(), ['name', 'specialty'], 'Road')
+        self.assertUsesIndex(qs, 'supplier_name_lower_idx')
+        self.assertUsesIndex(qs, 'supplier_specialty_lower_idx')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite tuning')
+class SqliteTuningTests(SimpleTestCase):
+    def test_file_database_connections_are_tuned(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            default = connections['default']
+            wrapper = type(default)({**default.settings_dict, 'NAME': os.path.join(tmp, 'db.sqlite3')}, 'tuning')
+            try:
+                with wrapper.cursor() as cursor:
+                    pragmas = {}
+                    for name in ('journal_mode', 'synchronous', 'temp_store', 'busy_timeout'):
+                        cursor.execute(f'PRAGMA {name}')
+                        pragmas[name] = cursor.fetchone()[0]
+            finally:
+                wrapper.close()
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+        self.assertEqual(pragmas['synchronous'], 1)  # NORMAL
+        self.assertEqual(pragmas['temp_store'], 2)  # MEMORY
+        self.assertGreaterEqual(pragmas['busy_timeout'], 1000)
+        self.assertTrue(connection.settings_dict['CONN_HEALTH_CHECKS'])
+
+
+class SupplierDetailQueryCountTests(TestCase):
+    """The supplier portfolio must not issue a query per linked project."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Highways')
+        cls.councils = [
+            Council.objects.create(name=f'Council {i}', contact='A', contact_email='a@example.com', slug=f'c{i}')
+            for i in range(3)
+        ]
+
+    def make_supplier(self, name, project_count):
+        supplier = Supplier.objects.create(name=name)
+        for i in range(project_count):
+            project = Project.objects.create(
+                title=f'{name} project {i}', description='', budget=1000,
+                council=self.councils[i % 3], category=self.category,
+            )
+            ProjectSupplier.objects.create(project=project, supplier=supplier, contract_value=100 * (i + 1))
+        return supplier
+
+    def test_fixed_query_count(self):
+        small = self.make_supplier('Small', 1)
+        large = self.make_supplier('Large', 12)
+        for supplier in (small, large):
+            with self.assertNumQueries(4):
+                response = self.client.get(reverse('supplier-detail', args=[supplier.pk]))
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(len(response.context['portfolio']), 12)
+        self.assertEqual(response.context['portfolio_count'], 12)
+        self.assertEqual(response.context['portfolio_total'], sum(100 * (i + 1) for i in range(12)))
+        totals = list(response.context['council_totals'])
+        self.assertEqual(sum(row['project_count'] for row in totals), 12)
+        self.assertEqual(len(totals), 3)
+
+    def test_portfolio_is_paginated_largest_first(self):
+        supplier = self.make_supplier('Large', 12)
+        url = reverse('supplier-detail', args=[supplier.pk])
+        with mock.patch.object(SupplierDetailView, 'portfolio_paginate_by', 5):
+            first = self.client.get(url)
+            last = self.client.get(url + '?page=3')
+        self.assertEqual([link.contract_value for link in first.context['portfolio']], [1200, 1100, 1000, 900, 800])
+        self.assertEqual([link.contract_value for link in last.context['portfolio']], [200, 100])
+        self.assertEqual(last.context['portfolio_total'], 7800)
+        self.assertContains(first, 'Page 1 of 3')
+
+
+class ProjectFinancialSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.council = Council.objects.create(name='Leeds', contact='A', contact_email='a@example.com', slug='leeds')
+        cls.suppliers = [Supplier.objects.create(name=f'Summary Supplier {i}') for i in range(3)]
+
+    def summary(self, project):
+        return ProjectFinancialSummary.objects.get(project=project)
+
+    def test_link_changes_are_applied_incrementally(self):
+        project = Project.objects.create(title='Bridge', description='', budget=1000, council=self.council)
+        other = Project.objects.create(title='Road', description='', budget=0, council=self.council)
+        self.assertEqual((self.summary(project).committed_total, self.summary(project).remaining_budget), (0, 1000))
+
+        a = ProjectSupplier.objects.create(project=project, supplier=self.suppliers[0], contract_value=Decimal('250.50'))
+        ProjectSupplier.objects.create(project=project, supplier=self.suppliers[1])
+        summary = self.summary(project)
+        self.assertEqual((summary.committed_total, summary.supplier_count), (Decimal('250.50'), 2))
+        self.assertAlmostEqual(summary.utilisation, 0.2505)
+
+        a.contract_value = Decimal('400')
+        a.save()
+        self.assertEqual(self.summary(project).remaining_budget, Decimal('600'))
+
+        a.project = other
+        a.save()
+        self.assertEqual((self.summary(project).committed_total, self.summary(project).supplier_count), (0, 1))
+        self.assertIsNone(self.summary(other).utilisation)  # zero budget
+
+        project.budget = 2000
+        project.save()
+        self.assertEqual(self.summary(project).remaining_budget, Decimal('2000'))
+
+        self.suppliers[0].delete()  # cascades to the link on `other`
+        self.assertEqual((self.summary(other).committed_total, self.summary(other).supplier_count), (0, 0))
+        project.delete()
+        self.assertFalse(ProjectFinancialSummary.objects.filter(project_id=project.pk).exists())
+        self.assertEqual(check_summaries(), [])
+
+    def test_checker_and_rebuild_catch_bulk_writes(self):
+        project = Project.objects.create(title='Depot', description='', budget=500, council=self.council)
+        ProjectSupplier.objects.bulk_create([
+            ProjectSupplier(project=project, supplier=s, contract_value=100) for s in self.suppliers
+        ])
+        self.assertEqual([p for p, _, _ in check_summaries()], [project.pk])
+        with self.assertRaises(CommandError):
+            call_command('rebuild_project_summaries', '--check', stdout=io.StringIO())
+
+        call_command('rebuild_project_summaries', stdout=io.StringIO())
+        self.assertEqual(self.summary(project).utilisation, 0.6)
+        self.assertEqual(check_summaries(), [])
+
+        url = reverse('projects-list')
+        response = self.client.get(url, {'sort': '-utilisation', 'min_utilisation': 50})
+        self.assertEqual([p.pk for p in response.context['projects']], [project.pk])
+
+    def test_sorting_on_summary_columns_keeps_projects_without_one(self):
+        summarised = Project.objects.create(title='Summarised', description='', budget=4321, council=self.council)
+        project = Project.objects.create(title='Unsummarised', description='', budget=4321, council=self.council)
+        ProjectFinancialSummary.objects.filter(project=project).delete()
+        url = reverse('projects-list')
+        for sort in ('-utilisation', 'utilisation', '-remaining', 'committed'):
+            response = self.client.get(url, {'sort': sort, 'min_budget': 4321, 'max_budget': 4321})
+            # unknown figures sort last either way
+            self.assertEqual([p.pk for p in response.context['projects']], [summarised.pk, project.pk], sort)
+
+
+class CouncilRollupTests(TestCase):
+    def test_dashboard_reads_refreshed_rollups_in_constant_queries(self):
+        council = Council.objects.create(name='Rollup', contact='A', contact_email='a@example.com', slug='rollup')
+        roads = Category.objects.create(name='Roads')
+        big, small = Supplier.objects.create(name='Big Co'), Supplier.objects.create(name='Small Co')
+        for i in range(3):
+            project = Project.objects.create(title=f'P{i}', description='', budget=1000, council=council,
+                                             category=roads if i else None)
+            ProjectSupplier.objects.create(project=project, supplier=big, contract_value=300)
+        ProjectSupplier.objects.create(project=project, supplier=small, contract_value=100)
+        self.assertTrue(CouncilRollup.objects.get(council=council).stale)
+
+        call_command('refresh_council_rollups', stdout=io.StringIO())
+        rollup = CouncilRollup.objects.get(council=council)
+        self.assertFalse(rollup.stale)
+        self.assertEqual((rollup.project_count, rollup.total_budget, rollup.committed_total), (3, 3000, 1000))
+        self.assertEqual((rollup.supplier_count, rollup.top_supplier, rollup.top_supplier_share), (2, big, 0.9))
+        self.assertAlmostEqual(rollup.supplier_hhi, 0.82)
+        self.assertEqual({r.category_id: r.project_count for r in council.category_rollups.all()}, {None: 1, roads.pk: 2})
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('council-dashboard'))
+        self.assertContains(response, 'Big Co')
+        self.assertContains(response, 'Roads (2)')
+
+        ProjectSupplier.objects.filter(supplier=small).get().delete()
+        self.assertTrue(CouncilRollup.objects.get(council=council).stale)
+        rollups.refresh_rollups()
+        self.assertEqual(CouncilRollup.objects.get(council=council).top_supplier_share, 1.0)
+
+    def test_failed_refresh_keeps_the_stale_flag(self):
+        council = Council.objects.create(name='Failing', contact='A', contact_email='a@example.com', slug='failing')
+        Project.objects.create(title='Failing Depot', description='', budget=10, council=council)
+        with mock.patch('supply_chain.rollups.compute_rollups', side_effect=RuntimeError('database went away')):
+            with self.assertRaises(RuntimeError):
+                rollups.refresh_rollups([council.pk])
+        self.assertTrue(CouncilRollup.objects.get(council=council).stale)
+        self.assertEqual(rollups.refresh_rollups([council.pk]), 1)
+        self.assertFalse(CouncilRollup.objects.get(council=council).stale)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        council = Council.objects.create(name='Export', contact='A', contact_email='a@example.com', slug='export')
+        cls.bridge = Project.objects.create(title='Export Bridge', description='', budget=900000, council=council)
+        Project.objects.create(title='Export Kiosk', description='', budget=5, council=council)
+        supplier = Supplier.objects.create(name='Export, "Quoted" Ltd')
+        ProjectSupplier.objects.create(project=cls.bridge, supplier=supplier, contract_value=Decimal('12.50'))
+
+    def test_csv_export_streams_with_list_filters_for_staff_only(self):
+        url = reverse('export', args=['projects', 'csv'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+
+        response = self.client.get(url, {'min_budget': 800000, 'q': 'export'})
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(r['title'], r['committed_total']) for r in rows], [('Export Bridge', '12.50')])
+        self.assertEqual(self.client.get(reverse('export', args=['projects', 'xml'])).status_code, 404)
+
+    def test_command_writes_json_lines(self):
+        out = io.StringIO()
+        call_command('export_data', 'links', '--format=jsonl', f'--project={self.bridge.pk}', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['supplier'], rows[0]['contract_value']), ('Export, "Quoted" Ltd', '12.50'))
+
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.council = Council.objects.create(name='Import Council', contact='A', contact_email='a@example.com', slug='import')
+
+    def test_csv_import_is_idempotent_and_resolves_foreign_keys(self):
+        data = (
+            'title,council,category,budget,end_date\n'
+            'Imported Depot,import,Imported Works,"£1,200,000",2027-03-31\n'
+            'Imported Pool,Import Council,,500,\n'
+            'Stray Project,nowhere,,10,\n'
+            'No Budget,import,,,\n'
+        )
+        result = import_stream('projects', io.StringIO(data), 'csv')
+        self.assertEqual((result.created, result.updated, len(result.rejected)), (2, 0, 2))
+        self.assertEqual([number for number, _, _ in result.rejected], [4, 5])
+        self.assertIn('unknown council', result.rejected[0][2])
+
+        depot = Project.objects.get(title='Imported Depot')
+        self.assertEqual((depot.council, depot.category.name, depot.budget), (self.council, 'Imported Works', 1200000))
+        self.assertEqual(depot.end_date, datetime.date(2027, 3, 31))
+        self.assertEqual(depot.financial_summary.committed_total, 0)
+
+        again = import_stream('projects', io.StringIO(data), 'csv')
+        self.assertEqual((again.created, again.updated, again.unchanged), (0, 0, 2))
+
+        changed = import_stream('projects', io.StringIO(data.replace('500', '750')), 'csv')
+        self.assertEqual((changed.updated, changed.unchanged), (1, 1))
+        self.assertEqual(Project.objects.get(title='Imported Pool').budget, 750)
+
+    def test_command_imports_json_lines_and_writes_rejects(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path, rejects = os.path.join(tmp, 'suppliers.jsonl'), os.path.join(tmp, 'rejects.jsonl')
+            with open(path, 'w') as f:
+                f.write('{"name": "Import Supplies", "contact_email": "sales@example.com"}\n')
+                f.write('{"name": "Bad Mail Ltd", "contact_email": "not-an-email"}\n')
+                f.write('not json\n')
+            out = io.StringIO()
+            call_command('import_data', 'suppliers', path, f'--rejects={rejects}', stdout=out, stderr=io.StringIO())
+            self.assertIn('1 created', out.getvalue())
+            with open(rejects) as f:
+                self.assertEqual([json.loads(line)['line'] for line in f], [2, 3])
+        self.assertTrue(Supplier.objects.filter(name='Import Supplies').exists())
+        self.assertFalse(Supplier.objects.filter(name='Bad Mail Ltd').exists())
+
+    def test_every_import_invalidates_its_cached_pages(self):
+        for kind, label, data in (
+            ('councils', 'supply_chain.council', 'name\nImported Borough\n'),
+            ('suppliers', 'supply_chain.supplier', 'name\nImported Supplies\n'),
+            ('projects', 'supply_chain.project', 'title,council,budget\nImported Hall,import,10\n'),
+        ):
+            before = caching.model_version(label)
+            import_stream(kind, io.StringIO(data), 'csv')
+            written = caching.model_version(label)
+            self.assertNotEqual(written, before, kind)
+            import_stream(kind, io.StringIO(data), 'csv')  # nothing written, nothing invalidated
+            self.assertEqual(caching.model_version(label), written, kind)
+
+        self.assertContains(self.client.get(reverse('councils-list')), 'Import Council')
+        import_stream('councils', io.StringIO('slug,name\nimport,Renamed Council\n'), 'csv')
+        self.assertContains(self.client.get(reverse('councils-list')), 'Renamed Council')
+
+    def test_moving_a_project_marks_both_councils_stale(self):
+        Council.objects.create(name='Other Council', contact='B', contact_email='b@example.com', slug='other')
+        import_stream('projects', io.StringIO('title,council,budget\nMoved Depot,import,10\n'), 'csv')
+        project = Project.objects.get(title='Moved Depot')
+        CouncilRollup.objects.update(stale=False)
+
+        import_stream('projects', io.StringIO(f'id,title,council,budget\n{project.pk},Moved Depot,other,10\n'), 'csv')
+        self.assertEqual(Project.objects.get(pk=project.pk).council.slug, 'other')
+        stale = CouncilRollup.objects.filter(stale=True).values_list('council__slug', flat=True)
+        self.assertEqual(set(stale), {'import', 'other'})
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.council = Council.objects.create(name='Api Council', contact='A', contact_email='a@example.com', slug='api')
+        cls.projects = [
+            Project.objects.create(title=f'Api Project {n}', description='', budget=1000 * n, council=cls.council)
+            for n in range(1, 4)
+        ]
+        cls.url = reverse('api-list', args=['projects'])
+
+    def test_sparse_fields_and_cursor_pages(self):
+        params = {'council': self.council.pk, 'fields': 'id,title,budget', 'limit': 2}
+        first = self.client.get(self.url, params).json()
+        self.assertEqual(first['results'], [
+            {'id': p.pk, 'title': p.title, 'budget': p.budget} for p in self.projects[:2]
+        ])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in second['results']], [self.projects[2].pk])
+        self.assertIsNone(second['next'])
+
+        self.assertEqual(self.client.get(self.url, {'fields': 'id,password'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'cursor': '!!'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api-list', args=['users'])).status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    def test_etag_revalidation(self):
+        url = reverse('api-detail', args=['projects', self.projects[0].pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['council'], 'Api Council')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((cached.status_code, cached.content), (304, b''))
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        # a renamed council changes the representation even though the project row did not
+        self.council.name = 'Renamed Council'
+        self.council.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        # ...but not when only project columns are selected
+        narrow = self.client.get(url, {'fields': 'id,budget'})
+        self.assertEqual(self.client.get(url, {'fields': 'id,budget'}, HTTP_IF_NONE_MATCH=narrow['ETag']).status_code, 304)
+
+        ProjectSupplier.objects.create(
+            project=self.projects[0], supplier=Supplier.objects.create(name='Api Supplier'), contract_value=10,
+        )
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((fresh.status_code, fresh.json()['committed_total']), (200, '10.00'))
+
+    def test_last_modified_covers_renames_and_deletions(self):
+        url = reverse('api-detail', args=['projects', self.projects[0].pk])
+        since = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+        later = time.time_ns() + 5 * 10 ** 9  # HTTP dates have whole-second resolution
+        with mock.patch('supply_chain.caching.time.time_ns', return_value=later):
+            self.council.name = 'Renamed Again'
+            self.council.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+        params = {'council': self.council.pk, 'fields': 'id,title'}
+        since = self.client.get(self.url, params)['Last-Modified']
+        with mock.patch('supply_chain.caching.time.time_ns', return_value=later + 5 * 10 ** 9):
+            self.projects[2].delete()
+        page = self.client.get(self.url, params, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual(len(page.json()['results']), 2)
+
+    def test_events_and_meetings(self):
+        today = datetime.date.today()
+        Event.objects.create(title='Api Fair', date=today, council=self.council)
+        CouncilMeeting.objects.create(council=self.council, date=today, agenda='Budget')
+        events = self.client.get(reverse('api-list', args=['events']), {'from': today.isoformat()}).json()
+        self.assertEqual([row['title'] for row in events['results']], ['Api Fair'])
+        meetings = self.client.get(reverse('api-list', args=['meetings']), {'fields': 'agenda', 'council': self.council.pk})
+        self.assertEqual(meetings.json()['results'], [{'agenda': 'Budget'}])
+
+
+@override_settings(SUPPLY_CHAIN_READ_REPLICAS=['replica1'], SUPPLY_CHAIN_REPLICA_MAX_LAG=2)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        replicas.reset_lag_checks()
+        self.addCleanup(replicas.reset_lag_checks)
+
+    def route(self, method='get', lag=0.0, **cookies):
+        """``(project reads, user reads, project writes, response)`` as routed inside a request."""
+        seen = []
+
+        def view(request):
+            seen.extend([router.db_for_read(Project), router.db_for_read(User), router.db_for_write(Project)])
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies)
+        with mock.patch.object(replicas, 'replica_lag', side_effect=lambda alias: lag):
+            response = replicas.ReplicaMiddleware(view)(request)
+        return (*seen, response)
+
+    def test_reads_use_the_replica_until_the_browser_writes(self):
+        self.assertEqual(self.route()[:3], ('replica1', 'default', 'default'))
+        *aliases, response = self.route('post')
+        self.assertEqual(aliases, ['default', 'default', 'default'])
+        pin = response.cookies[replicas.pin_cookie()]
+        self.assertEqual(pin['max-age'], replicas.pin_seconds())
+        self.assertEqual(self.route(**{replicas.pin_cookie(): pin.value})[0], 'default')
+        self.assertEqual(router.db_for_read(Project), 'default')  # outside a request
+
+    def test_lagging_or_missing_replica_falls_back_to_primary(self):
+        self.assertEqual(self.route(lag=30.0)[0], 'default')
+        replicas.reset_lag_checks()
+
+        def unreachable(alias):
+            raise OSError('gone')
+
+        with mock.patch.object(replicas, 'replica_lag', side_effect=unreachable), self.assertLogs('supply_chain.replicas'):
+            self.assertIsNone(replicas.ReplicaMiddleware(HttpResponse).choose(RequestFactory().get('/')))
+
+    def test_streamed_body_reads_from_the_replica(self):
+        def view(request):
+            return StreamingHttpResponse(router.db_for_read(Project) for _ in range(2))
+
+        with mock.patch.object(replicas, 'replica_lag', return_value=0.0):
+            response = replicas.ReplicaMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(b''.join(response.streaming_content), b'replica1replica1')
+
+    def test_file_copy_lag(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            primary, replica = os.path.join(tmp, 'db.sqlite3'), os.path.join(tmp, 'replica.sqlite3')
+            for path in (primary, replica):
+                open(path, 'w').close()
+            os.utime(primary, (1000, 1000))
+            os.utime(replica, (1000, 1000))
+            open(f'{primary}-wal', 'w').close()
+            os.utime(f'{primary}-wal', (1030, 1030))
+            self.assertEqual(replicas.file_lag(primary, replica), 0)
+            with open(f'{primary}-wal', 'w') as f:
+                f.write('frame')
+            os.utime(f'{primary}-wal', (1030, 1030))
+            self.assertEqual(replicas.file_lag(primary, replica), 30)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        self.registry = REGISTRY
+        REGISTRY.reset()
+        self.addCleanup(REGISTRY.reset)
+
+    def test_quantiles_use_nearest_rank(self):
+        self.assertEqual(quantiles(range(1, 101)), {0.5: 50, 0.95: 95, 0.99: 99})
+        self.assertEqual(quantiles([7]), {0.5: 7, 0.95: 7, 0.99: 7})
+        self.assertEqual(quantiles([]), {})
+
+    @override_settings(SUPPLY_CHAIN_SERVER_TIMING=True, SUPPLY_CHAIN_SLOW_REQUEST_MS=0)
+    def test_requests_are_measured_per_url_name(self):
+        with self.assertLogs('supply_chain.instrumentation', 'WARNING') as logs:
+            response = self.client.get(reverse('projects-list'))
+            self.client.get(reverse('projects-list'))
+            self.client.get('/no-such-page/')
+        self.assertIn('projects-list', logs.output[0])
+        self.assertRegex(response['Server-Timing'], r'db;desc="\d+ queries";dur=[\d.]+, tpl;dur=[\d.]+, total;dur=')
+
+        stats = self.registry.snapshot()
+        self.assertEqual(stats['projects-list']['count'], 2)
+        self.assertGreater(stats['projects-list']['db_queries_p50'], 0)
+        self.assertGreater(stats['projects-list']['template_ms_p99'], 0)
+        self.assertEqual(stats['<unresolved>']['count'], 1)
+
+    @override_settings(ROOT_URLCONF='myproject.asgi_urls')
+    async def test_async_views_are_measured(self):
+        cache.clear()
+        await self.async_client.get(reverse('calendar'), {'start_date': '2000-01-01'})
+        stats = self.registry.snapshot()['calendar']
+        self.assertEqual(stats['count'], 1)
+        # both listing queries ran on the ORM's worker thread, outside the event loop
+        self.assertEqual(stats['db_queries_p50'], 2)
+        self.assertGreater(stats['template_ms_p50'], 0)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        self.client.get(reverse('councils-list'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)  # any address, e.g. behind a proxy
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE supply_chain_request_duration_seconds summary', text)
+        self.assertIn('supply_chain_request_db_queries_count{view="councils-list"} 1', text)
+        self.assertRegex(text, r'supply_chain_request_duration_seconds\{view="councils-list",quantile="0.99"\} [\d.e-]+')
+        self.assertIn('councils-list', self.client.get(reverse('metrics'), {'format': 'json'}).json())
+
+    @override_settings(SUPPLY_CHAIN_METRICS_TOKEN='s3cret')
+    def test_metrics_endpoint_accepts_the_token(self):
+        scraper = Client()
+        self.assertEqual(scraper.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        self.assertEqual(scraper.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        self.assertEqual(scraper.get(reverse('metrics')).status_code, 404)
+
+    def test_templates_are_timed_through_the_backend(self):
+        self.assertIsInstance(engines['django'].get_template('supply_chain/home.html'), InstrumentedTemplate)
+
+
+class BenchmarkTests(TestCase):
+    def test_every_named_url_is_benchmarked_and_responds(self):
+        council = Council.objects.create(name='Bench', contact='A', contact_email='a@example.com', slug='bench')
+        Event.objects.create(title='Bench Fair', date=datetime.date.today(), council=council)
+        CouncilMeeting.objects.create(council=council, date=datetime.date.today())
+        Supplier.objects.create(name='Bench Supplies')
+
+        cases = benchmarking.url_cases()
+        self.assertEqual({name for _, name, _ in cases}, {p.name for p in urls.urlpatterns if p.name})
+        staff = Client()
+        staff.force_login(User.objects.create_user('staff', is_staff=True))
+        results = benchmarking.measure(self.client, cases, repeat=2, staff_client=staff)
+        self.assertEqual({case: row['status'] for case, row in results.items() if row['status'] >= 400}, {})
+        self.assertEqual(results['calendar']['warm_queries'], 0)  # served from the page cache
+
+    def test_compare_flags_slowdowns_and_extra_queries(self):
+        baseline = {'1000': {'a': {'warm_p50_ms': 10.0, 'cold_queries': 3, 'warm_queries': 1}}}
+        self.assertEqual(compare(baseline, {'1000': {'a': {'warm_p50_ms': 12.0, 'cold_queries': 3, 'warm_queries': 1}}}), [])
+        # 30% slower but under the absolute floor
+        self.assertEqual(compare(baseline, {'1000': {'a': {'warm_p50_ms': 11.9, 'cold_queries': 3, 'warm_queries': 1}}}, 0.1, 2), [])
+        problems = compare(baseline, {
+            '1000': {'a': {'warm_p50_ms': 20.0, 'cold_queries': 4, 'warm_queries': 1}, 'new': {'warm_p50_ms': 99.0}},
+            '10000': {'a': {'warm_p50_ms': 99.0}},
+        })
+        self.assertEqual(len(problems), 2)
+        self.assertIn('warm p50 10.0 -> 20.0 ms', problems[0])
+        self.assertIn('cold queries 3 -> 4', problems[1])
+
+
+class LoadTestTests(LiveServerTestCase):
+    def test_profiles(self):
+        self.assertEqual([PROFILES['linear'](20, 10, 60, t) for t in (0, 5, 10, 30)], [1, 10, 20, 20])
+        self.assertEqual([PROFILES['step'](20, 8, 60, t) for t in (0, 2, 7.9, 9)], [5, 10, 20, 20])
+        self.assertEqual([PROFILES['spike'](20, 0, 60, t) for t in (0, 20, 39, 40)], [4, 20, 20, 4])
+
+    def test_journeys_run_against_a_live_server(self):
+        council = Council.objects.create(name='Load', contact='A', contact_email='a@example.com', slug='load')
+        Project.objects.create(title='Load Bridge Works', description='', budget=1000, council=council)
+        Event.objects.create(title='Load Fair', date=datetime.date.today(), council=council)
+        CouncilMeeting.objects.create(council=council, date=datetime.date.today())
+        Supplier.objects.create(name='Load Supplies')
+
+        report = loadtest.run(
+            self.live_server_url, users=3, duration=1.5, ramp=0.5, think=0,
+            mix=loadtest.parse_mix(','.join(loadtest.JOURNEYS)), seed=1,
+        )
+        self.assertGreater(report['total']['requests'], len(loadtest.JOURNEYS))
+        self.assertEqual(report['total']['errors'], 0, report['steps'])
+        self.assertEqual(sum(bucket['count'] for bucket in report['histogram']), report['total']['requests'])
+        self.assertIn('req/s', loadtest.format_report(report))
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('browse,checkout')
+
+
+class PageCachingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.council = Council.objects.create(name='Leeds', contact='A', contact_email='a@example.com', slug='leeds')
+        cls.meeting = CouncilMeeting.objects.create(
+            council=cls.council, date=datetime.date.today(), agenda='Original agenda',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_home_fragment_is_reused_until_a_model_changes(self):
+        self.client.get(reverse('design-home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('design-home'))
+        self.assertContains(response, 'Original agenda')
+
+        self.meeting.agenda = 'Revised agenda'
+        self.meeting.save()
+        self.assertContains(self.client.get(reverse('design-home')), 'Revised agenda')
+
+    def test_council_list_response_is_invalidated(self):
+        self.client.get(reverse('councils-list'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('councils-list'))
+
+        self.council.name = 'Bradford'
+        self.council.save()
+        self.assertContains(self.client.get(reverse('councils-list')), 'Bradford')
+
+
+class StubImageServer:
+    """A local HTTP server standing in for remote image hosts.
+
+    ``/ok/<name>`` returns an image body (with an ETag, honouring
+    If-None-Match), ``/flaky/<name>`` fails with 503 on the first request for
+    each name, ``/truncated/<name>`` drops the connection halfway through the
+    body the first time, anything else is a 404.
+    """
+
+    body = b'\xff\xd8 fake jpeg ' + b'x' * 4096
+
+    def __init__(self):
+        self.hits = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits[self.path] = stub.hits.get(self.path, 0) + 1
+                if self.path.startswith('/flaky/') and stub.hits[self.path] == 1:
+                    self.send_error(503)
+                    return
+                if not self.path.startswith(('/ok/', '/flaky/', '/truncated/')):
+                    self.send_error(404)
+                    return
+                if self.path.startswith('/truncated/') and stub.hits[self.path] == 1:
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(stub.body)))
+                    self.end_headers()
+                    self.wfile.write(stub.body[:len(stub.body) // 2])
+                    return
+                if self.headers.get('If-None-Match') == '"v1"':
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('ETag', '"v1"')
+                self.send_header('Content-Length', str(len(stub.body)))
+                self.end_headers()
+                self.wfile.write(stub.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FetchEventImagesTests(TestCase):
+    def setUp(self):
+        self.server = StubImageServer()
+        self.addCleanup(self.server.close)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_fetcher_retries_transient_failures_only(self):
+        fetcher = Fetcher(concurrency=4, retries=2, backoff=0.01)
+        summary = fetcher.run(
+            [(1, f'{self.server.url}/ok/a'), (2, f'{self.server.url}/flaky/b'), (3, f'{self.server.url}/missing')],
+            lambda key, response: response.read(),
+        )
+        ok, flaky, missing = summary.results
+        self.assertEqual((ok.ok, ok.attempts, ok.value), (True, 1, StubImageServer.body))
+        self.assertEqual((flaky.ok, flaky.attempts), (True, 2))
+        self.assertEqual((missing.ok, missing.attempts, missing.status), (False, 1, 404))
+        self.assertEqual(summary.bytes, 2 * len(StubImageServer.body))
+
+        truncated = fetcher.fetch(4, f'{self.server.url}/truncated/c', lambda key, response: response.read())
+        self.assertEqual((truncated.ok, truncated.attempts, truncated.value), (True, 2, StubImageServer.body))
+
+    def test_command_streams_images_into_storage(self):
+        good = Event.objects.create(title='Fair', date=datetime.date.today(), image=f'{self.server.url}/flaky/fair.jpg')
+        bad = Event.objects.create(title='Gala', date=datetime.date.today(), image=f'{self.server.url}/gone.jpg')
+
+        call_command('fetch_event_images', '--retries=1', '--backoff=0.01', stdout=io.StringIO(), stderr=io.StringIO())
+
+        good.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertTrue(good.image_file.name.startswith('events/event_'))
+        with good.image_file.open('rb') as fh:
+            self.assertEqual(fh.read(), StubImageServer.body)
+        self.assertFalse(bad.image_file)
+
+    def test_command_leaves_no_partial_file_after_a_retry(self):
+        event = Event.objects.create(title='Fete', date=datetime.date.today(), image=f'{self.server.url}/truncated/fete.jpg')
+        call_command('fetch_event_images', '--retries=1', '--backoff=0.01', stdout=io.StringIO(), stderr=io.StringIO())
+
+        event.refresh_from_db()
+        with event.image_file.open('rb') as fh:
+            self.assertEqual(fh.read(), StubImageServer.body)
+        self.assertEqual(default_storage.listdir('events')[1], [os.path.basename(event.image_file.name)])
+
+
+class ImageMirrorTests(TestCase):
+    def setUp(self):
+        self.server = StubImageServer()
+        self.addCleanup(self.server.close)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        council = Council.objects.create(name='Leeds', contact='A', contact_email='a@example.com', slug='leeds')
+        shared, other = f'{self.server.url}/ok/shared.jpg', f'{self.server.url}/ok/other.jpg'
+        self.projects = [
+            Project.objects.create(title=f'P{i}', description='', budget=1, council=council, main_image=url)
+            for i, url in enumerate([shared, shared, shared, other])
+        ]
+
+    def test_mirror_dedupes_and_revalidates(self):
+        fetcher = Fetcher(backoff=0.01)
+        pks = [p.pk for p in self.projects]
+        updated, summary = mirror_project_images(
+            self.directory, '/static/mirror/', projects=Project.objects.filter(pk__in=pks), fetcher=fetcher,
+        )
+
+        self.assertEqual(updated, 4)
+        # one request per distinct URL, and identical bodies stored once
+        self.assertEqual(len(summary.results), 2)
+        self.assertEqual(summary.files, 1)
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            sorted(['manifest.json', 'project_sources.json', summary.succeeded[0].value[0]]),
+        )
+        self.assertEqual(len({p.main_image for p in Project.objects.filter(pk__in=pks)}), 1)
+
+        # the next run reads the local paths back from the database, yet revalidates
+        # against the remote sources: 304s, nothing downloaded, nothing to update
+        updated, summary = mirror_project_images(
+            self.directory, '/static/mirror/', projects=Project.objects.filter(pk__in=pks), fetcher=fetcher,
+        )
+        self.assertEqual((summary.downloaded, summary.not_modified, updated), (0, 2, 0))
+        self.assertEqual(summary.bytes, 0)
+        self.assertEqual(self.server.hits['/ok/shared.jpg'], 2)
+
+        # a changed source is downloaded again and the project repointed
+        StubImageServer.body, original = b'\x89PNG changed ' + b'y' * 4096, StubImageServer.body
+        self.addCleanup(setattr, StubImageServer, 'body', original)
+        with open(os.path.join(self.directory, 'manifest.json'), 'r+', encoding='utf-8') as fh:
+            manifest = json.load(fh)
+            manifest[f'{self.server.url}/ok/other.jpg']['etag'] = '"v0"'  # as if the ETag had moved on
+            fh.seek(0)
+            fh.truncate()
+            json.dump(manifest, fh)
+        updated, summary = mirror_project_images(
+            self.directory, '/static/mirror/', projects=Project.objects.filter(pk__in=pks), fetcher=fetcher,
+        )
+        self.assertEqual((summary.downloaded, updated), (1, 1))
+        self.assertNotEqual(Project.objects.get(pk=pks[3]).main_image, Project.objects.get(pk=pks[0]).main_image)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def upload(self, name):
+        from PIL import Image
+
+        buf = io.BytesIO()
+        Image.new('RGB', (800, 400), 'teal').save(buf, format='JPEG')
+        return SimpleUploadedFile(name, buf.getvalue(), content_type='image/jpeg')
+
+    def test_uploaded_event_image_gets_srcset(self):
+        version = caching.view_version('calendar')
+        with self.captureOnCommitCallbacks(execute=True):
+            event = Event.objects.create(title='Fair', date=datetime.date.today(), image_file=self.upload('fête.jpg'))
+            self.assertIsNone(image_derivatives.variants_for(event.image_file.url))  # not encoded while saving
+        image_derivatives.wait_for_uploads()
+        self.assertIn('%C3%AA', event.image_file.url)  # escaped in the URL
+        self.assertIsNotNone(image_derivatives.variants_for(event.image_file.url))
+        self.assertNotEqual(caching.view_version('calendar'), version)  # cached markup picks up the srcset
+
+        html = Template('{% load responsive_images %}{% responsive_img url "Fair" sizes="50vw" %}').render(
+            Context({'url': event.image_file.url})
+        )
+        self.assertIn('<picture>', html)
+        self.assertIn('320w', html)
+        self.assertIn('800w', html)
+        self.assertNotIn('960w', html)  # never upscaled
+        self.assertIn('sizes="50vw"', html)
+
+        plain = Template('{% load responsive_images %}{% responsive_img "https://example.com/a.jpg" "A" %}').render(Context())
+        self.assertEqual(plain, '<img src="https://example.com/a.jpg" alt="A" loading="lazy" decoding="async">')
+
+    def test_uploads_command_catches_missed_uploads(self):
+        event = Event.objects.create(title='Gala', date=datetime.date.today(), image_file=self.upload('galà.jpg'))
+        version = caching.view_version('calendar')
+        call_command('build_image_derivatives', uploads=True, stdout=io.StringIO())
+        self.assertIsNotNone(image_derivatives.variants_for(event.image_file.url))
+        self.assertNotEqual(caching.view_version('calendar'), version)
+
+    def test_index_is_replaced_whole(self):
+        image_derivatives.update_index({'/media/a.jpg': {'hash': 'a'}})
+        with mock.patch('supply_chain.image_derivatives.os.replace', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                image_derivatives.update_index({'/media/b.jpg': {'hash': 'b'}})
+        # a failed write leaves the previous index in place, and no temporary file behind
+        self.assertEqual(image_derivatives.load_index(), {'/media/a.jpg': {'hash': 'a'}})
+        self.assertEqual(os.listdir(default_storage.path(image_derivatives.DERIVATIVES_DIR)), ['index.json'])
+        image_derivatives.update_index({'/media/b.jpg': {'hash': 'b'}})
+        self.assertEqual(set(image_derivatives.load_index()), {'/media/a.jpg', '/media/b.jpg'})
+
+
+class StaticServerTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        os.makedirs(os.path.join(self.root, 'portfolio'))
+        self.body = b'body { color: teal; }\n' * 200
+        with open(os.path.join(self.root, 'portfolio', 'site.css'), 'wb') as fh:
+            fh.write(self.body)
+        self.server = make_server(('127.0.0.1', 0), self.root, quiet=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.conn = http.client.HTTPConnection(*self.server.server_address[:2], timeout=5)
+        self.addCleanup(self.conn.close)
+
+    def get(self, path, **headers):
+        self.conn.request('GET', path, headers=headers)
+        response = self.conn.getresponse()
+        return response, response.read()
+
+    def test_full_range_and_conditional_requests_share_one_connection(self):
+        response, body = self.get('/portfolio/site.css')
+        self.assertEqual((response.status, body), (200, self.body))
+        self.assertEqual(response.getheader('Content-Type'), 'text/css; charset=utf-8')
+        etag = response.getheader('ETag')
+
+        response, body = self.get('/portfolio/site.css', Range='bytes=5-9')
+        self.assertEqual((response.status, body), (206, self.body[5:10]))
+        self.assertEqual(response.getheader('Content-Range'), f'bytes 5-9/{len(self.body)}')
+        response, body = self.get('/portfolio/site.css', Range='bytes=-4')
+        self.assertEqual(body, self.body[-4:])
+        response, _ = self.get('/portfolio/site.css', Range=f'bytes={len(self.body)}-')
+        self.assertEqual(response.status, 416)
+
+        response, body = self.get('/portfolio/site.css', **{'If-None-Match': etag})
+        self.assertEqual((response.status, body), (304, b''))
+        response, _ = self.get('/portfolio/site.css', **{'If-Modified-Since': response.getheader('Last-Modified')})
+        self.assertEqual(response.status, 304)
+        self.assertFalse(response.will_close)
+
+    def test_precompressed_variant_and_path_safety(self):
+        with open(os.path.join(self.root, 'portfolio', 'site.css.gz'), 'wb') as fh:
+            fh.write(gzip.compress(self.body))
+        response, body = self.get('/portfolio/site.css', **{'Accept-Encoding': 'gzip, br;q=0'})
+        self.assertEqual(response.getheader('Content-Encoding'), 'gzip')
+        self.assertEqual(gzip.decompress(body), self.body)
+        response, body = self.get('/portfolio/site.css')
+        self.assertEqual((response.getheader('Content-Encoding'), body), (None, self.body))
+
+        self.assertEqual(self.get('/portfolio/../../etc/passwd')[0].status, 404)
+        self.assertEqual(self.get('/portfolio/')[0].status, 404)  # no index.html in this root
+        self.assertEqual(self.get('/')[0].getheader('Location'), '/portfolio')
+
+    def test_file_cache_counts_hits_and_notices_edits(self):
+        self.get('/portfolio/site.css')
+        self.get('/portfolio/site.css')
+        stats = json.loads(self.get('/__stats__')[1])['file_cache']
+        self.assertEqual((stats['hits'], stats['misses'], stats['bytes']), (1, 1, len(self.body)))
+
+        path = os.path.join(self.root, 'portfolio', 'site.css')
+        with open(path, 'wb') as fh:
+            fh.write(b'p {}')
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.get('/portfolio/site.css')[1], b'p {}')
+        stats = json.loads(self.get('/__stats__')[1])['file_cache']
+        self.assertEqual((stats['invalidations'], stats['bytes']), (1, 4))
+
+    def test_file_cache_evicts_least_recently_used(self):
+        cache = FileCache(max_bytes=3000, max_file_size=2000)
+        files = {}
+        for name in ('a', 'b', 'c'):
+            path = os.path.join(self.root, name)
+            with open(path, 'wb') as fh:
+                fh.write(name.encode() * 1200)
+            files[name] = os.stat(path)
+            self.assertIsNone(cache.get(path, files[name]))
+            cache.put(StaticFile(path, 'text/plain', files[name]))
+            if name == 'b':
+                self.assertIsNotNone(cache.get(os.path.join(self.root, 'a'), files['a']))
+        # a was used after b was added, so b goes when c no longer fits
+        self.assertEqual([os.path.basename(p) for p in cache.entries], ['a', 'c'])
+        self.assertEqual((cache.bytes, cache.evictions), (2400, 1))
+
+
+class DateRangeFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        council = Council.objects.create(name='Leeds', contact='A', contact_email='a@example.com', slug='leeds')
+        Project.objects.create(title='Bridge', description='', budget=1000, council=council)
+
+    def test_last_representable_end_date(self):
+        qs = filter_date_range(Project.objects.all(), 'created_at', None, datetime.date.max)
+        self.assertEqual(qs.count(), Project.objects.count())
+        qs = filter_date_range(Project.objects.all(), 'end_date', None, datetime.date.max)
+        self.assertEqual(qs.count(), Project.objects.filter(end_date__isnull=False).count())
+
+        cache.clear()
+        self.assertContains(self.client.get(reverse('projects-list') + '?end_date=9999-12-31'), 'Bridge')
+        response = self.client.get(reverse('api-list', args=['projects']) + '?end_date=9999-12-31')
+        self.assertEqual(response.status_code, 200)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get(reverse('export', args=['projects', 'csv']) + '?end_date=9999-12-31')
+        self.assertIn(b'Bridge', b''.join(response.streaming_content))
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.council = Council.objects.create(name='Leeds', contact='A', contact_email='a@example.com', slug='leeds')
+        cls.category = Category.objects.create(name='Waterways')
+        cls.in_title = Project.objects.create(
+            title='Zanzibar footbridge', description='', budget=1000, council=cls.council,
+        )
+        cls.in_description = Project.objects.create(
+            title='Towpath works', description='Resurfacing near the zanzibar quay', budget=1000,
+            council=cls.council, category=cls.category, location='Kirkstall',
+        )
+
+    def setUp(self):
+        if not search.index_available():
+            self.skipTest('the full-text index needs SQLite FTS5 or PostgreSQL')
+
+    def search(self, q):
+        return list(search.search_projects(Project.objects.all(), q))
+
+    def test_words_match_as_prefixes_in_every_field(self):
+        self.assertEqual(self.search('zanz'), [self.in_title, self.in_description])  # title ranks first
+        self.assertEqual(self.search('towpath kirk'), [self.in_description])
+        self.assertEqual(self.search('waterway'), [self.in_description])
+        self.assertEqual(self.search('zanzibar footbridge quay'), [])  # every word must match
+        self.assertEqual(self.search('ootbridge'), [])  # prefixes, not substrings
+
+    def test_falls_back_to_icontains_without_the_index(self):
+        with mock.patch.object(search, 'index_available', return_value=False):
+            self.assertEqual(self.search('ootbridge'), [self.in_title])
+            self.assertContains(self.client.get(reverse('projects-list') + '?q=ootbridge'), 'Zanzibar footbridge')
+
+    def test_index_follows_project_and_category_changes(self):
+        project = Project.objects.create(title='Quokka lane', description='', budget=1, council=self.council)
+        self.assertEqual(self.search('quokka'), [project])
+        project.title = 'Wombat lane'
+        project.save()
+        self.assertEqual((self.search('quokka'), self.search('wombat')), ([], [project]))
+        project.delete()
+        self.assertEqual(self.search('wombat'), [])
+
+        self.category.name = 'Canals'
+        self.category.save()
+        self.assertEqual((self.search('waterways'), self.search('canals')), ([], [self.in_description]))
+        self.category.delete()
+        self.assertEqual(self.search('canals'), [])
+        self.assertEqual(self.search('towpath'), [self.in_description])
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.council = Council.objects.create(name='Leeds', contact='A', contact_email='a@example.com', slug='leeds')
+        cls.projects = [
+            Project.objects.create(title=f'Tied {i}', description='', budget=1000, council=cls.council) for i in range(5)
+        ]
+        # every project shares one created_at, so only the id orders them
+        cls.created_at = cls.projects[0].created_at
+        Project.objects.filter(council=cls.council).update(created_at=cls.created_at)
+
+    def test_cursor_round_trip_and_bad_tokens(self):
+        token = encode_cursor(self.created_at, 42, 'p')
+        self.assertEqual(decode_cursor(token), ('p', self.created_at, 42))
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        for bad in ('', '!!!', 'bm90IGEgY3Vyc29y', token[:-3],
+                    base64.urlsafe_b64encode(('x' + raw[1:]).encode()).decode(),
+                    base64.urlsafe_b64encode(raw.replace('|42', '|forty-two').encode()).decode(),
+                    base64.urlsafe_b64encode(b'n|yesterday|1').decode(), base64.urlsafe_b64encode(b'\xff\xfe').decode()):
+            self.assertIsNone(decode_cursor(bad), bad)
+
+        response = self.client.get(reverse('projects-list') + '?cursor=!!!')
+        self.assertEqual(response.status_code, 200)  # a bad cursor restarts at the first page
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_walks_ties_both_ways_to_the_last_page(self):
+        paginator = KeysetPaginator(Project.objects.filter(council=self.council), 2)
+        newest_first = sorted(self.projects, key=lambda p: -p.pk)
+        pages = [paginator.page()]
+        while pages[-1].next_cursor:
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([list(page) for page in pages], [newest_first[0:2], newest_first[2:4], newest_first[4:]])
+        last = pages[-1]
+        self.assertEqual((last.has_next(), last.has_previous(), last.next_cursor), (False, True, None))
+
+        back = paginator.page(last.previous_cursor)
+        self.assertEqual(list(back), newest_first[2:4])
+        self.assertEqual(list(paginator.page(back.previous_cursor)), newest_first[0:2])
+        self.assertFalse(paginator.page(back.previous_cursor).has_previous())
+
+    def test_cached_count_follows_projects_and_contracts(self):
+        cache.clear()
+        mine = Project.objects.filter(council=self.council)
+        self.assertEqual(cached_count(mine), 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_count(mine), 5)
+        self.projects[0].delete()
+        self.assertEqual(cached_count(mine), 4)
+
+        busy = mine.filter(financial_summary__utilisation__gte=0.5)
+        self.assertEqual(cached_count(busy), 0)
+        supplier = Supplier.objects.create(name='Acme')
+        ProjectSupplier.objects.create(project=self.projects[1], supplier=supplier, contract_value=800)
+        self.assertEqual(cached_count(busy), 1)
+
+
+class SupplierListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        council = Council.objects.create(name='Leeds', contact='A', contact_email='a@example.com', slug='leeds')
+        projects = [
+            Project.objects.create(title=f'Job {i}', description='', budget=1000, council=council) for i in range(3)
+        ]
+        cls.busy = Supplier.objects.create(name='Zeta Roads', specialty='Resurfacing')
+        cls.quiet = Supplier.objects.create(name='Zulu Drains', specialty='Roadside drainage')
+        cls.accented = Supplier.objects.create(name='Église Builders')
+        for project, value in zip(projects, (100, 200, None)):
+            ProjectSupplier.objects.create(project=project, supplier=cls.busy, contract_value=value)
+        ProjectSupplier.objects.create(project=projects[0], supplier=cls.quiet, contract_value=50)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, **params):
+        return self.client.get(reverse('supplier-list'), params)
+
+    def test_prefix_search(self):
+        def names(q):
+            return set(prefix_search(Supplier.objects.all(), ['name', 'specialty'], q).values_list('name', flat=True))
+
+        self.assertEqual(names('z'), {'Zeta Roads', 'Zulu Drains'})
+        self.assertEqual(names('ROAD'), {'Zulu Drains'})  # specialty, case-insensitive
+        self.assertEqual(names('Égl'), {'Église Builders'})
+        self.assertEqual(names('\U0010ffff'), set())
+        self.assertEqual(self.get(q='\U0010ffff').status_code, 200)
+
+    def test_counts_sorting_and_pagination(self):
+        response = self.get(q='z', sort='-projects')
+        suppliers = list(response.context['suppliers'])
+        self.assertEqual(suppliers, [self.busy, self.quiet])
+        self.assertEqual((suppliers[0].project_count, suppliers[0].total_contract_value), (3, 300))
+        self.assertEqual((suppliers[1].project_count, suppliers[1].total_contract_value), (1, 50))
+
+        self.assertEqual(list(self.get(q='z', sort='value').context['suppliers']), [self.quiet, self.busy])
+        # unknown sort keys fall back to the name instead of reaching order_by()
+        response = self.get(q='z', sort='password')
+        self.assertEqual((response.context['sort'], list(response.context['suppliers'])), ('name', [self.busy, self.quiet]))
+
+        with mock.patch.object(SupplierListView, 'paginate_by', 1):
+            response = self.get(q='z', page=2)
+        self.assertEqual(list(response.context['suppliers']), [self.quiet])
+        self.assertContains(response, 'Page 2 of 2')
+
+
+class RentTableTests(SimpleTestCase):
+    def write(self, path, body, mtime_ns):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('area,avg_rent_1br_gbp,avg_rent_2br_gbp,supermarket_index\n' + body)
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_parse_sort_and_reload(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'rents.csv')
+            self.write(path, 'Headingley,700,900,1.1\nGipton,500,,abc\nArmley,x,99999999999999999999999,0.9\n', 10**18)
+            table = load_rent_table(path)
+            self.assertEqual(table.rows(), [
+                {'area': 'Headingley', 'avg_rent_1br_gbp': 700, 'avg_rent_2br_gbp': 900, 'supermarket_index': 1.1},
+                # blank and malformed cells are unknown, not zero
+                {'area': 'Gipton', 'avg_rent_1br_gbp': 500, 'avg_rent_2br_gbp': None, 'supermarket_index': None},
+                {'area': 'Armley', 'avg_rent_1br_gbp': None, 'avg_rent_2br_gbp': 99999999999999991611392,
+                 'supermarket_index': 0.9},
+            ])
+            self.assertEqual([table.areas[i] for i in table.sorted_indices('area')], ['Armley', 'Gipton', 'Headingley'])
+            # unknown values sort last in either direction
+            for reverse, expected in ((False, ['Gipton', 'Headingley', 'Armley']), (True, ['Headingley', 'Gipton', 'Armley'])):
+                self.assertEqual([table.areas[i] for i in table.sorted_indices('avg_rent_1br_gbp', reverse)], expected)
+            self.assertEqual(table.cheapest()['area'], 'Gipton')  # Armley's rent is unknown, not £0
+            self.assertEqual(table.cheapest('supermarket_index')['area'], 'Armley')
+            self.assertEqual(table.mean('avg_rent_1br_gbp'), 600)
+
+            self.assertIs(load_rent_table(path), table)  # unchanged file: parsed once
+            self.write(path, 'Seacroft,520,670,0.88\n', 10**18 + 1)
+            reloaded = load_rent_table(path)
+            self.assertEqual((reloaded.areas, reloaded.cheapest()['area']), (('Seacroft',), 'Seacroft'))
+
+        missing = load_rent_table(path)
+        self.assertEqual((len(missing), missing.cheapest(), missing.mean('avg_rent_1br_gbp')), (0, None, None))
+
+    def test_filters_and_rent_to_index_ratios(self):
+        table = RentTable.from_csv(io.StringIO(
+            'area,avg_rent_1br_gbp,avg_rent_2br_gbp,supermarket_index\n'
+            'Seacroft,520,670,0.8\nGipton,500,650,1.0\nHarehills,,620,0.87\nBeeston,540,700,0\n'
+        ))
+        self.assertEqual([table.areas[i] for i in table.filter_indices(max_rent_1br=520)], ['Seacroft', 'Gipton'])
+        self.assertEqual([table.areas[i] for i in table.filter_indices(max_rent_2br=670, max_index=0.9)], ['Seacroft', 'Harehills'])
+        self.assertEqual(table.filter_indices(max_rent_1br=0), [])
+        self.assertEqual(table.rent_to_index_ratios(), [650.0, 500.0, None, None])  # unknown rent, zero index
+        self.assertEqual(
+            [table.areas[i] for i in table.sorted_indices('rent_to_index')], ['Gipton', 'Seacroft', 'Harehills', 'Beeston'],
+        )
+
+    def test_page_filters_and_sorts(self):
+        table = RentTable.from_csv(io.StringIO(
+            'area,avg_rent_1br_gbp,avg_rent_2br_gbp,supermarket_index\n'
+            'Seacroft,520,670,0.8\nGipton,500,650,1.0\nArmley,x,610,0.9\n'
+        ))
+        with mock.patch('supply_chain.views.load_rent_table', return_value=table):
+            response = self.client.get(reverse('cost-of-living'), {'max_rent_1br': '600', 'sort': '-rent_to_index'})
+            self.assertEqual([a['area'] for a in response.context['areas']], ['Seacroft', 'Gipton'])
+            self.assertEqual(response.context['areas'][0]['rent_to_index'], 650.0)
+            self.assertContains(response, 'Cheapest for a 1-bed: <strong>Gipton</strong> (£500 vs £510 average)')
+            self.assertContains(response, 'href="?sort=area&amp;max_rent_1br=600#details"')
+
+            response = self.client.get(reverse('cost-of-living'), {'max_rent_1br': 'nan', 'sort': 'avg_rent_1br_gbp'})
+            self.assertEqual([a['area'] for a in response.context['areas']], ['Gipton', 'Seacroft', 'Armley'])
+            self.assertContains(response, '<td style="padding:0.5rem;text-align:right;border-bottom:1px solid rgba(0,0,0,0.04)">—</td>')
+
+
+@override_settings(ROOT_URLCONF='myproject.asgi_urls')
+class AsgiViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.council = Council.objects.create(name='Leeds', contact='A', contact_email='a@example.com', slug='leeds')
+        cls.meeting = CouncilMeeting.objects.create(
+            council=cls.council, date=datetime.date.today(), agenda='Original agenda',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_asgi_urls_swap_in_the_async_views(self):
+        self.assertIs(resolve('/').func, home_view_async)
+        self.assertIs(resolve('/calendar/').func, calendar_view_async)
+        self.assertIs(resolve(reverse('calendar')).func, calendar_view_async)
+        self.assertEqual(resolve('/projects/').url_name, 'projects-list')
+
+    @override_settings(SUPPLY_CHAIN_SERVER_TIMING=True)
+    async def test_async_calendar_fragment_is_reused_until_a_model_changes(self):
+        url = reverse('calendar')
+        await self.async_client.get(url)
+        response = await self.async_client.get(url)
+        self.assertContains(response, 'Original agenda')
+        self.assertIn('db;desc="0 queries"', response['Server-Timing'])
+
+        self.meeting.agenda = 'Revised agenda'
+        await self.meeting.asave()
+        self.assertContains(await self.async_client.get(url), 'Revised agenda')
+        self.assertContains(await self.async_client.get(url + '?start_date=2000-01-01'), 'Revised agenda')
+
+    async def test_async_home_renders_the_same_listings(self):
+        response = await self.async_client.get(reverse('design-home'))
+        self.assertContains(response, 'Original agenda')
+        self.assertContains(response, 'Featured projects')
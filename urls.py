@@ -11,6 +11,8 @@ urlpatterns = [
     path('projects/<int:pk>/edit/', views.ProjectUpdateView.as_view(), name='project-update'),
     path('projects/<int:pk>/delete/', views.ProjectDeleteView.as_view(), name='project-delete'),
     path('about/', views.about_view, name='design-about'),
+    path('councils/', views.all_councils, name='councils-list'),
+    path('councils/dashboard/', views.council_dashboard, name='council-dashboard'),
     # Calendar and events
     path('calendar/', views.calendar_view, name='calendar'),
     path('events/add/', views.event_create_view, name='event-create'),
@@ -26,6 +28,13 @@ urlpatterns = [
     path('events/<int:pk>/', views.event_detail_view, name='event-detail'),
     path('meetings/<int:pk>/', views.meeting_detail_view, name='meeting-detail'),
     path('cost-of-living/', views.cost_of_living_view, name='cost-of-living'),
+    # CSV / JSON Lines exports (staff only)
+    path('exports/<slug:kind>.<slug:fmt>', views.export_view, name='export'),
+    # Read-only JSON API (see api.py)
+    path('api/<slug:resource>/', views.api_list, name='api-list'),
+    path('api/<slug:resource>/<int:pk>/', views.api_detail, name='api-detail'),
+    # Per-view latency and query metrics (staff or SUPPLY_CHAIN_METRICS_TOKEN only)
+    path('__metrics__/', views.metrics_view, name='metrics'),
     # Supplier CRUD
     path('suppliers/', views.SupplierListView.as_view(), name='supplier-list'),
     path('suppliers/add/', views.SupplierCreateView.as_view(), name='supplier-create'),
@@ -1,13 +1,25 @@
-from django.http import HttpResponse
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse_lazy
 from django.views import generic
+from django.views.decorators.http import require_safe
 from django.contrib import messages
 from django.contrib.messages.views import SuccessMessageMixin
 
-from .models import Council, Project, Supplier, ProjectSupplier, CouncilMeeting, Event
-from django.db.models import Prefetch
+from .models import (
+    Council, CouncilCategoryRollup, CouncilMeeting, CouncilRollup, Event, Project, ProjectSupplier, Supplier,
+)
+from django.db.models import Count, F, Sum
 from .forms import ContactForm, SupplierForm, ProjectForm, EventForm
+from . import api, caching, exports, instrumentation
+from .cost_of_living import NUMERIC_COLUMNS, load_rent_table
+from .filters import filter_date_range, filter_projects, parse_date_param, prefix_search
+from .pagination import CachedCountPaginator, KeysetPaginator
 
 
 def hello_world_index(request):
@@ -32,11 +44,49 @@ def home_view(request):
     context = {
         'projects': projects,
         'meetings': meetings,
+        # the querysets above only run when the cached fragment is missing
+        **caching.cache_context('design-home', today),
     }
 
     return render(request, 'supply_chain/home.html', context)
 
 
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+async def home_view_async(request):
+    """``home_view`` for the ASGI entry point (see myproject/asgi_urls.py).
+
+    The listings fragment is looked up through the cache's async API and, on
+    a miss, the recent-projects and upcoming-meetings queries are awaited
+    together. The page around it is rendered on a worker thread, as
+    base.html may read flash messages from the session.
+    """
+    import datetime
+
+    today = datetime.date.today()
+
+    async def listings():
+        projects, meetings = await asyncio.gather(
+            _alist(Project.objects.select_related('council', 'category').order_by('-created_at')[:4]),
+            # upcoming: only non-archived meetings with date >= today
+            _alist(
+                CouncilMeeting.objects.filter(archived=False, date__gte=today)
+                .select_related('council')
+                .order_by('date', 'time')[:4]
+            ),
+        )
+        return {'projects': projects, 'meetings': meetings}
+
+    context = {
+        'listings': await caching.acached_fragment(
+            'design-home', 'supply_chain/partials/home_listings.html', listings, today,
+        ),
+    }
+    return await sync_to_async(render)(request, 'supply_chain/home.html', context)
+
+
 def about_view(request):
     """Render the about template."""
     return render(request, 'supply_chain/about.html')
@@ -103,6 +153,7 @@ def service_request_view(request):
     return render(request, 'supply_chain/service_request_form.html', {'form': form})
 
 
+@caching.cache_response('councils-list')
 def all_councils(request):
     councils = Council.objects.all()
 
@@ -113,6 +164,107 @@ def all_councils(request):
     return render(request, 'supply_chain/all_councils_list.html', context)
 
 
+def council_dashboard(request):
+    """Per-council budgets, category mix, supplier concentration and upcoming meetings.
+
+    Reads only the rollup tables (see rollups.py) plus the next few meetings:
+    three queries whatever the number of projects and supplier links.
+    """
+    rollups = list(
+        CouncilRollup.objects.select_related('council', 'top_supplier').order_by('-total_budget', 'council__name')
+    )
+    categories = {}
+    for row in CouncilCategoryRollup.objects.select_related('category').order_by('-project_count', 'category__name'):
+        categories.setdefault(row.council_id, []).append(row)
+    for rollup in rollups:
+        rollup.categories = categories.get(rollup.council_id, [])
+
+    import datetime
+
+    meetings = (
+        CouncilMeeting.objects.filter(archived=False, date__gte=datetime.date.today())
+        .select_related('council').order_by('date', 'time')[:8]
+    )
+    refreshed = [r.refreshed_at for r in rollups if r.refreshed_at]
+
+    context = {
+        'rollups': rollups,
+        'meetings': meetings,
+        'total_projects': sum(r.project_count for r in rollups),
+        'total_budget': sum(r.total_budget for r in rollups),
+        'total_committed': sum(r.committed_total for r in rollups),
+        'stale_count': sum(1 for r in rollups if r.stale),
+        'refreshed_at': min(refreshed) if refreshed else None,
+    }
+    return render(request, 'supply_chain/council_dashboard.html', context)
+
+
+@staff_member_required
+def export_view(request, kind, fmt):
+    """Stream projects, suppliers or supplier links as CSV or JSON Lines.
+
+    ``/exports/projects.csv?q=bridge&min_budget=100000`` takes the same
+    filters as the project list; see exports.py.
+    """
+    import datetime
+
+    try:
+        chunks = exports.stream_export(kind, fmt, request.GET)
+    except ValueError:
+        raise Http404('No such export')
+    response = StreamingHttpResponse(chunks, content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}-{datetime.date.today().isoformat()}.{fmt}"'
+    return response
+
+
+@require_safe
+def api_list(request, resource):
+    """One page of an API collection: ``{"results": [...], "next": url or null}``. See api.py."""
+    spec = api.RESOURCES.get(resource)
+    if spec is None:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    try:
+        names, rows, validators, next_cursor = api.list_page(spec, request.GET)
+    except api.BadRequest as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_url = request.build_absolute_uri('?' + params.urlencode())
+    etag, last_modified = api.validators_for(spec, names, validators, extra=next_cursor or '')
+    return api.respond(request, {'results': rows, 'next': next_url}, etag, last_modified)
+
+
+@require_safe
+def api_detail(request, resource, pk):
+    spec = api.RESOURCES.get(resource)
+    if spec is None:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    try:
+        names = api.selected_fields(spec, request.GET)
+    except api.BadRequest as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    rows, validators = api.fetch(spec, names, spec.queryset({}).filter(pk=pk))
+    if not rows:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    etag, last_modified = api.validators_for(spec, names, validators)
+    return api.respond(request, rows[0], etag, last_modified)
+
+
+@require_safe
+def metrics_view(request):
+    """Request metrics per URL name, as Prometheus text or ``?format=json``; see instrumentation.py.
+
+    Staff only, or a scraper sending ``Authorization: Bearer <SUPPLY_CHAIN_METRICS_TOKEN>``.
+    """
+    if not (request.user.is_staff or instrumentation.metrics_token_matches(request)):
+        raise Http404
+    if request.GET.get('format') == 'json':
+        return JsonResponse(instrumentation.REGISTRY.snapshot())
+    return HttpResponse(instrumentation.REGISTRY.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def project_detail(request, id):
     project = get_object_or_404(Project.objects.select_related('council'), pk=id)
 
@@ -144,21 +296,52 @@ def calendar_view(request):
     """Display a simple calendar-like list of Events and CouncilMeetings.
 
     For now this shows Events (community & project milestones) and upcoming
-    CouncilMeetings ordered by date.
+    CouncilMeetings ordered by date. Optional ``start_date``/``end_date``
+    (YYYY-MM-DD, inclusive) narrow the window, which starts today by default.
     """
     import datetime
 
-    today = datetime.date.today()
-    events = Event.objects.filter(date__gte=today).select_related('council', 'project').order_by('date', 'time')
-    meetings = CouncilMeeting.objects.filter(archived=False, date__gte=today).select_related('council').order_by('date', 'time')
+    start = parse_date_param(request.GET.get('start_date')) or datetime.date.today()
+    end = parse_date_param(request.GET.get('end_date'))
+    events = filter_date_range(Event.objects.all(), 'date', start, end).select_related('council', 'project').order_by('date', 'time')
+    meetings = filter_date_range(CouncilMeeting.objects.filter(archived=False), 'date', start, end).select_related('council').order_by('date', 'time')
 
     context = {
         'events': events,
         'meetings': meetings,
+        **caching.cache_context('calendar', start, end),
     }
     return render(request, 'supply_chain/calendar.html', context)
 
 
+async def calendar_view_async(request):
+    """``calendar_view`` for the ASGI entry point, async in the same way as ``home_view_async``."""
+    import datetime
+
+    start = parse_date_param(request.GET.get('start_date')) or datetime.date.today()
+    end = parse_date_param(request.GET.get('end_date'))
+
+    async def listings():
+        events, meetings = await asyncio.gather(
+            _alist(
+                filter_date_range(Event.objects.all(), 'date', start, end)
+                .select_related('council', 'project').order_by('date', 'time')
+            ),
+            _alist(
+                filter_date_range(CouncilMeeting.objects.filter(archived=False), 'date', start, end)
+                .select_related('council').order_by('date', 'time')
+            ),
+        )
+        return {'events': events, 'meetings': meetings}
+
+    context = {
+        'listings': await caching.acached_fragment(
+            'calendar', 'supply_chain/partials/calendar_listings.html', listings, start, end,
+        ),
+    }
+    return await sync_to_async(render)(request, 'supply_chain/calendar.html', context)
+
+
 def event_create_view(request):
     """Simple form to create an Event. If a Project is selected, and the event
     looks like a project end milestone, we also set the project's `end_date`.
@@ -192,47 +375,140 @@ def meeting_detail_view(request, pk):
 
 
 def cost_of_living_view(request):
-    """Render the cost of living guidance page."""
-    # Load local CSV data for average rents and supermarket index
-    import csv
-    from pathlib import Path
+    """Render the cost of living guidance page.
 
-    data_file = Path(__file__).resolve().parent / 'data' / 'cost_of_living_rents.csv'
-    areas = []
-    try:
-        with open(data_file, newline='', encoding='utf-8') as fh:
-            reader = csv.DictReader(fh)
-            for row in reader:
-                # coerce numeric fields
-                try:
-                    row['avg_rent_1br_gbp'] = int(row.get('avg_rent_1br_gbp') or 0)
-                except Exception:
-                    row['avg_rent_1br_gbp'] = 0
-                try:
-                    row['avg_rent_2br_gbp'] = int(row.get('avg_rent_2br_gbp') or 0)
-                except Exception:
-                    row['avg_rent_2br_gbp'] = 0
-                try:
-                    row['supermarket_index'] = float(row.get('supermarket_index') or 1.0)
-                except Exception:
-                    row['supermarket_index'] = 1.0
-                areas.append(row)
-    except FileNotFoundError:
-        areas = []
-
-    return render(request, 'supply_chain/cost_of_living.html', {'areas': areas})
+    The rent table is parsed once and cached in memory (see cost_of_living.py);
+    ``?max_rent_1br=``, ``?max_rent_2br=`` and ``?max_index=`` keep the areas
+    within those limits, and ``?sort=`` orders them by one of the table's
+    columns or ``rent_to_index`` (1-bed rent per unit of the supermarket index;
+    prefix ``-`` for descending).
+    """
+    import math
+    from urllib.parse import urlencode
+
+    table = load_rent_table()
+    limits = {}
+    for param in ('max_rent_1br', 'max_rent_2br', 'max_index'):
+        try:
+            value = float(request.GET.get(param) or '')
+        except ValueError:
+            continue
+        if math.isfinite(value):
+            limits[param] = value
+    indices = table.filter_indices(**limits)
+
+    sort = request.GET.get('sort', '')
+    column = sort.lstrip('-')
+    if column in ('area', 'rent_to_index') or column in NUMERIC_COLUMNS:
+        indices = table.sorted_indices(column, reverse=sort.startswith('-'), indices=indices)
+    ratios = table.rent_to_index_ratios()
+    areas = table.rows(indices)
+    for area, i in zip(areas, indices):
+        area['rent_to_index'] = ratios[i]
+
+    context = {
+        'has_rent_data': bool(table),
+        'areas': areas,
+        'max_rent_1br': request.GET.get('max_rent_1br', '') if 'max_rent_1br' in limits else '',
+        'filter_query': urlencode({param: request.GET[param] for param in limits}),
+        'cheapest_area': table.cheapest('avg_rent_1br_gbp'),
+        'average_rent_1br': table.mean('avg_rent_1br_gbp'),
+    }
+    return render(request, 'supply_chain/cost_of_living.html', context)
 
 
 # Supplier CRUD (class-based views)
 class SupplierListView(generic.ListView):
+    """Paginated supplier list with per-supplier project totals.
+
+    ``?q=`` matches the start of the name or specialty; ``?sort=`` takes one of
+    ``SORT_OPTIONS`` (prefix with ``-`` for descending).
+    """
     model = Supplier
     template_name = 'supply_chain/suppliers/supplier_list.html'
     context_object_name = 'suppliers'
+    paginate_by = 25
+    paginator_class = CachedCountPaginator
+
+    SORT_OPTIONS = {
+        'name': 'name',
+        'specialty': 'specialty',
+        'projects': 'project_count',
+        'value': 'total_contract_value',
+        'created': 'created_at',
+    }
+
+    def get_sort(self):
+        sort = self.request.GET.get('sort', 'name')
+        if sort.lstrip('-') not in self.SORT_OPTIONS:
+            sort = 'name'
+        return sort
+
+    def get_queryset(self):
+        qs = prefix_search(Supplier.objects.all(), ['name', 'specialty'], self.request.GET.get('q'))
+        # both totals come from one GROUP BY over the ProjectSupplier join
+        qs = qs.annotate(
+            project_count=Count('supplier_projects'),
+            total_contract_value=Sum('supplier_projects__contract_value'),
+        )
+        sort = self.get_sort()
+        field = self.SORT_OPTIONS[sort.lstrip('-')]
+        if sort.startswith('-'):
+            return qs.order_by(F(field).desc(nulls_last=True), 'pk')
+        return qs.order_by(F(field).asc(nulls_last=True), 'pk')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        sort = context['sort'] = self.get_sort()
+        # a header link sorts by that column, or flips the direction if already sorted by it;
+        # totals and dates start descending, text ascending
+        context['sort_links'] = {
+            key: (key if sort == f'-{key}' else f'-{key}') if key in ('projects', 'value', 'created')
+            else (f'-{key}' if sort == key else key)
+            for key in self.SORT_OPTIONS
+        }
+        context['q'] = self.request.GET.get('q', '')
+        return context
 
 
 class SupplierDetailView(generic.DetailView):
+    """Supplier details with its project portfolio.
+
+    The portfolio is paginated (largest contracts first), so the page costs
+    the same for a supplier with thousands of projects: the supplier, the
+    portfolio count and total, one page of ProjectSupplier links joined to
+    project/council/category, and the per-council totals.
+    """
     model = Supplier
     template_name = 'supply_chain/suppliers/supplier_detail.html'
+    portfolio_paginate_by = 50
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        links = (
+            ProjectSupplier.objects.filter(supplier=self.object)
+            .select_related('project__council', 'project__category')
+            .order_by(F('contract_value').desc(nulls_last=True), 'project__title', 'pk')
+        )
+        summary = links.aggregate(count=Count('id'), total=Sum('contract_value'))
+        paginator = Paginator(links, self.portfolio_paginate_by)
+        paginator.count = summary['count']  # already counted alongside the total
+        page = paginator.get_page(self.request.GET.get('page'))
+        context.update({
+            'portfolio': page.object_list,
+            'portfolio_count': summary['count'],
+            'portfolio_total': summary['total'] or 0,
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages(),
+        })
+        context['council_totals'] = (
+            ProjectSupplier.objects.filter(supplier=self.object)
+            .values('project__council_id', 'project__council__name')
+            .annotate(project_count=Count('id'), total_value=Sum('contract_value'))
+            .order_by(F('total_value').desc(nulls_last=True), 'project__council__name')
+        )
+        return context
 
 
 class SupplierCreateView(SuccessMessageMixin, generic.CreateView):
@@ -264,85 +540,88 @@ class SupplierDeleteView(generic.DeleteView):
 
 # Project CRUD (class-based views)
 class ProjectListView(generic.ListView):
+    """Project catalogue with search, budget and date filters.
+
+    Pages with ``?page=N`` by default (the total count is cached briefly).
+    Passing ``?cursor=`` (empty for the first page) switches to keyset
+    pagination on ``(created_at, id)``: constant cost per page, newest first,
+    and the total is only counted when ``?count=1`` is also given.
+
+    ``?sort=`` takes one of ``SORT_OPTIONS`` (prefix with ``-`` for
+    descending) and ``?min_utilisation=``/``?max_utilisation=`` filter on the
+    committed share of the budget in percent; both read the stored
+    ``ProjectFinancialSummary`` rather than aggregating supplier links.
+    """
     model = Project
     template_name = 'supply_chain/projects/project_list.html'
     context_object_name = 'projects'
     paginate_by = 20
+    paginator_class = CachedCountPaginator
+
+    SORT_OPTIONS = {
+        'created': 'created_at',
+        'budget': 'budget',
+        'committed': 'financial_summary__committed_total',
+        'remaining': 'financial_summary__remaining_budget',
+        'utilisation': 'financial_summary__utilisation',
+    }
 
-    def get_queryset(self):
-        from django.db import models as dj_models
-        from django.utils.dateparse import parse_date
-
-        qs = Project.objects.select_related('council', 'category').order_by('-created_at')
-
-        # text search
-        q = self.request.GET.get('q')
-        if q:
-            qs = qs.filter(
-                dj_models.Q(title__icontains=q)
-                | dj_models.Q(description__icontains=q)
-                | dj_models.Q(location__icontains=q)
-                | dj_models.Q(category__name__icontains=q)
-            )
-
-        # budget filters
-        min_budget = self.request.GET.get('min_budget')
-        max_budget = self.request.GET.get('max_budget')
-        try:
-            if min_budget:
-                qs = qs.filter(budget__gte=int(min_budget))
-        except (ValueError, TypeError):
-            pass
-        try:
-            if max_budget:
-                qs = qs.filter(budget__lte=int(max_budget))
-        except (ValueError, TypeError):
-            pass
-
-        # created_at date range filters (dates in YYYY-MM-DD)
-        start_date = self.request.GET.get('start_date')
-        end_date = self.request.GET.get('end_date')
-        try:
-            if start_date:
-                sd = parse_date(start_date)
-                if sd:
-                    qs = qs.filter(created_at__date__gte=sd)
-        except Exception:
-            pass
-        try:
-            if end_date:
-                ed = parse_date(end_date)
-                if ed:
-                    qs = qs.filter(created_at__date__lte=ed)
-        except Exception:
-            pass
+    def get_sort(self):
+        sort = self.request.GET.get('sort', '')
+        return sort if sort.lstrip('-') in self.SORT_OPTIONS else None
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get('cursor')
+        # keyset pages only follow the default newest-first order
+        if cursor is None or self.get_sort() not in (None, '-created'):
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size)
+        page = paginator.page(cursor, with_count=self.request.GET.get('count') == '1')
+        return (paginator, page, page.object_list, page.has_other_pages())
 
+    def get_queryset(self):
+        qs = Project.objects.select_related('council', 'category', 'financial_summary').order_by('-created_at')
+
+        qs = filter_projects(qs, self.request.GET)
+
+        sort = self.get_sort()
+        if sort:
+            field = self.SORT_OPTIONS[sort.lstrip('-')]
+            # projects without a summary row (e.g. bulk-created ones) sort last rather than drop out
+            if sort.startswith('-'):
+                qs = qs.order_by(F(field).desc(nulls_last=True), '-pk')
+            else:
+                qs = qs.order_by(F(field).asc(nulls_last=True), 'pk')
         return qs
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['sort'] = self.get_sort() or '-created'
+        context['sort_choices'] = [
+            ('-created', 'Newest'),
+            ('-budget', 'Largest budget'),
+            ('-utilisation', 'Most committed'),
+            ('utilisation', 'Least committed'),
+            ('-remaining', 'Most budget remaining'),
+        ]
+        return context
+
 
 class ProjectDetailView(generic.DetailView):
     model = Project
     template_name = 'supply_chain/projects/project_detail.html'
 
     def get_queryset(self):
-        # Select related fields for the project itself, and prefetch related
-        # ProjectSupplier rows with their supplier to avoid N+1 queries.
-        ps_qs = ProjectSupplier.objects.select_related('supplier')
-        return (
-            super()
-            .get_queryset()
-            .select_related('council', 'category')
-            .prefetch_related(Prefetch('project_suppliers', queryset=ps_qs))
-        )
+        # Select related fields for the project itself; the supplier links are
+        # loaded separately below so a cached page body skips that query.
+        return super().get_queryset().select_related('council', 'category')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # The project instance is available as `self.object` (or context['object']).
-        # Use the prefetched related name `project_suppliers` to access the link rows.
-        project = self.object
-        project_suppliers = getattr(project, 'project_suppliers', None)
-        # Ensure we pass an iterable (QuerySet) to the template (may be None for empty)
-        context['project_suppliers'] = project_suppliers.all() if project_suppliers is not None else []
+        # Lazy queryset of ProjectSupplier rows with their supplier joined in (no
+        # N+1); it is only evaluated when the cached fragment has to be rendered.
+        context['project_suppliers'] = self.object.project_suppliers.select_related('supplier')
+        context.update(caching.cache_context('project-detail'))
         return context
 
 